@@ -19,11 +19,13 @@ def create_app(config_class=Config):
     # Set SQLAlchemy engine options for faster startup
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         'pool_pre_ping': True,
-        'pool_recycle': 300,
-        'connect_args': {
+        'pool_recycle': 300
+    }
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # connect_timeout is a PostgreSQL driver option (SQLite is used by the test scripts)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {
             'connect_timeout': 10
         }
-    }
 
     # Initialize extensions
     db.init_app(app)
@@ -36,6 +38,7 @@ def create_app(config_class=Config):
             "origins": "*",
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["X-Total-Count"],
             "supports_credentials": False
         }
     })
@@ -43,12 +46,13 @@ def create_app(config_class=Config):
     jwt.init_app(app)
 
     # Register blueprints
-    from app.routes import auth, student, teacher, admin, order
+    from app.routes import auth, student, teacher, admin, order, jobs
     app.register_blueprint(auth.bp)
     app.register_blueprint(student.bp)
     app.register_blueprint(teacher.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(order.bp)
+    app.register_blueprint(jobs.bp)
 
     # Create upload folder
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
@@ -0,0 +1,47 @@
+from app import db
+from datetime import datetime
+import uuid
+
+class Job(db.Model):
+    """Background job (export, bulk delete, import) run outside the request"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    job_type = db.Column(db.String(50), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    params = db.Column(db.JSON, nullable=True)
+    input_data = db.Column(db.LargeBinary, nullable=True)  # Uploaded file for import jobs
+    progress = db.Column(db.Integer, default=0)  # 0-100
+
+    # Result: JSON and/or a file (exports)
+    result = db.Column(db.JSON, nullable=True)
+    result_data = db.Column(db.LargeBinary, nullable=True)
+    result_filename = db.Column(db.String(255), nullable=True)
+    result_mimetype = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def set_result_file(self, data, filename, mimetype):
+        """Attach a generated file (e.g. an export) as the job result"""
+        self.result_data = data
+        self.result_filename = filename
+        self.result_mimetype = mimetype
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'has_file': self.result_filename is not None,
+            'result_filename': self.result_filename,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -1,6 +1,8 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from app.utils.upsert import conflict_insert
 import random
+import re
 
 class Module(db.Model):
     __tablename__ = 'modules'
@@ -14,6 +16,8 @@ class Module(db.Model):
     case_sensitive = db.Column(db.Boolean, default=False)  # Whether answers must match case
     version = db.Column(db.Integer, default=1)  # For tracking module updates
     display_order = db.Column(db.Integer, default=0)  # For custom ordering in UI
+    word_count = db.Column(db.Integer, nullable=False, default=0)  # Denormalized, maintained by ModuleService
+    battery_count = db.Column(db.Integer, nullable=False, default=0)  # Denormalized, maintained by ModuleService
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -21,6 +25,19 @@ class Module(db.Model):
     words = db.relationship('Word', backref='module', lazy='dynamic', cascade='all, delete-orphan')
     batteries = db.relationship('Battery', backref='module', lazy='dynamic', cascade='all, delete-orphan')
 
+    @staticmethod
+    def catalog_fingerprint(query):
+        """
+        Cheap aggregate over a module query that changes whenever a matching
+        module is added, removed or edited (used for ETags)
+        """
+        return tuple(query.order_by(None).with_entities(
+            db.func.count(Module.id),
+            db.func.sum(Module.id),
+            db.func.sum(Module.version),
+            db.func.max(Module.updated_at)
+        ).first())
+
     def to_dict(self, include_words=False):
         data = {
             'id': self.id,
@@ -32,8 +49,8 @@ class Module(db.Model):
             'case_sensitive': self.case_sensitive,
             'version': self.version,
             'display_order': self.display_order,
-            'word_count': self.words.count(),
-            'battery_count': self.batteries.count(),
+            'word_count': self.word_count or 0,
+            'battery_count': self.battery_count or 0,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -47,6 +64,9 @@ class Module(db.Model):
 
 class Word(db.Model):
     __tablename__ = 'words'
+    __table_args__ = (
+        db.Index('ix_words_module_position', 'module_id', 'position_in_module'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=False)
@@ -54,6 +74,19 @@ class Word(db.Model):
     meaning = db.Column(db.Text, nullable=False)
     example_sentence = db.Column(db.Text, nullable=False)
     position_in_module = db.Column(db.Integer, nullable=False)  # Original position in the module
+    inflected_forms = db.Column(db.JSON, nullable=True)  # Forms marked with *asterisks* in the example sentence
+
+    @staticmethod
+    def extract_inflected_forms(example_sentence):
+        """
+        Extract every form marked with asterisks from an example sentence.
+        E.g. "Hij reageerde *apathisch* en *lusteloos*" -> ['apathisch', 'lusteloos']
+        """
+        forms = []
+        for match in re.findall(r'\*([^*]+)\*', example_sentence or ''):
+            if match not in forms:
+                forms.append(match)
+        return forms
 
     def to_dict(self):
         return {
@@ -84,9 +117,9 @@ class Battery(db.Model):
         }
 
     @staticmethod
-    def create_batteries_for_module(module_id, word_ids):
+    def split_word_ids(word_ids):
         """
-        Creates batteries for a module following the algorithm:
+        Splits word IDs into battery groups following the algorithm:
         - Prefer batteries of 5 words, then 4 words, then 3 words
         - Avoid batteries of 1 or 2 words
         - Maximize the size of battery groups
@@ -96,9 +129,10 @@ class Battery(db.Model):
         - 12 words: 4+4+4 (better than 5+5+2)
         - 11 words: 4+4+3
         - 8 words: 4+4 (better than 5+3)
+
+        Returns a list of word ID lists (one per battery, in order).
         """
         total_words = len(word_ids)
-        batteries = []
 
         # Special cases for small numbers
         if total_words <= 5:
@@ -158,44 +192,173 @@ class Battery(db.Model):
                 # 5n+4: just add a 4
                 battery_sizes = [5] * fives + [4]
 
-        # Create batteries
+        # Split word IDs into groups
+        groups = []
         start_idx = 0
-        for i, size in enumerate(battery_sizes):
-            battery_word_ids = word_ids[start_idx:start_idx + size]
-            battery = Battery(
+        for size in battery_sizes:
+            groups.append(word_ids[start_idx:start_idx + size])
+            start_idx += size
+
+        return groups
+
+    @staticmethod
+    def create_batteries_for_module(module_id, word_ids):
+        """Creates Battery objects for a module (see split_word_ids for the layout)"""
+        return [
+            Battery(
                 module_id=module_id,
                 battery_number=i + 1,
                 word_ids=battery_word_ids
             )
-            batteries.append(battery)
-            start_idx += size
-
-        return batteries
+            for i, battery_word_ids in enumerate(Battery.split_word_ids(word_ids))
+        ]
 
 
 class DifficultWord(db.Model):
-    """Personal module for each student containing words they got wrong in final rounds"""
+    """
+    Personal module for each student containing words they got wrong in final rounds.
+
+    Each word is scheduled for review SM-2 style: a correct review moves due_at
+    1 day, then 6 days, then interval * ease ahead; a wrong answer (in a review
+    or in a module) is a lapse that makes the word due again and lowers its ease.
+    """
     __tablename__ = 'difficult_words'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'word_id', name='uq_difficult_words_user_word'),
+        db.Index('ix_difficult_words_user_due', 'user_id', 'due_at'),
+    )
+
+    DEFAULT_EASE = 2.5
+    MIN_EASE = 1.3
+    LAPSE_EASE_PENALTY = 0.2
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     word_id = db.Column(db.Integer, db.ForeignKey('words.id'), nullable=False)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Review schedule
+    ease = db.Column(db.Float, nullable=False, default=DEFAULT_EASE)
+    interval_days = db.Column(db.Integer, nullable=False, default=0)
+    repetitions = db.Column(db.Integer, nullable=False, default=0)  # Correct reviews in a row
+    lapses = db.Column(db.Integer, nullable=False, default=0)
+    due_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_reviewed_at = db.Column(db.DateTime, nullable=True)
+
     # Relationships
     word = db.relationship('Word', backref='difficult_for_users')
 
-    def to_dict(self):
+    @staticmethod
+    def add(user_id, word_ids, lapse=False):
+        """
+        Add words to a student's difficult words, skipping words already there.
+
+        One INSERT ... ON CONFLICT (PostgreSQL and SQLite), so there is no lookup
+        first and concurrent answers cannot create duplicates. With lapse=True,
+        words already there are rescheduled as a lapse instead of skipped, at
+        most once per word per day: further misses that day change nothing.
+        Accepts a single word ID or a list. Does not commit.
+        """
+        if not isinstance(word_ids, (list, tuple, set)):
+            word_ids = [word_ids]
+
+        word_ids = list(dict.fromkeys(word_ids))
+        if not word_ids:
+            return
+
+        user_id = int(user_id)
+        now = datetime.utcnow()
+        rows = [{'user_id': user_id, 'word_id': word_id, 'added_at': now, 'due_at': now} for word_id in word_ids]
+
+        statement = conflict_insert(DifficultWord)
+        if statement is not None:
+            if lapse:
+                statement = statement.on_conflict_do_update(
+                    index_elements=['user_id', 'word_id'],
+                    set_=DifficultWord._lapse_values(now),
+                    where=DifficultWord._lapse_allowed(now)
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=['user_id', 'word_id'])
+            db.session.execute(statement, rows)
+            return
+
+        # Other databases: look up the existing words first
+        existing = {
+            difficult_word.word_id: difficult_word for difficult_word in DifficultWord.query.filter(
+                DifficultWord.user_id == user_id,
+                DifficultWord.word_id.in_(word_ids)
+            )
+        }
+        db.session.add_all([DifficultWord(**row) for row in rows if row['word_id'] not in existing])
+        if lapse:
+            start_of_day = DifficultWord._start_of_day(now)
+            for difficult_word in existing.values():
+                if (difficult_word.last_reviewed_at or difficult_word.added_at or now) < start_of_day:
+                    difficult_word.record_review(False, now)
+
+    @staticmethod
+    def _start_of_day(now):
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _lapse_allowed(now):
+        """SQL condition: the word was not added or reviewed yet today (one lapse per day)"""
+        last_seen_at = db.func.coalesce(DifficultWord.last_reviewed_at, DifficultWord.added_at)
+        return db.or_(last_seen_at.is_(None), last_seen_at < DifficultWord._start_of_day(now))
+
+    @staticmethod
+    def _lapse_values(now):
+        """Column updates of a lapse, as SQL expressions (same rules as record_review)"""
+        lowered_ease = DifficultWord.ease - DifficultWord.LAPSE_EASE_PENALTY
+        return {
+            'ease': db.case((lowered_ease < DifficultWord.MIN_EASE, DifficultWord.MIN_EASE), else_=lowered_ease),
+            'interval_days': 0,
+            'repetitions': 0,
+            'lapses': DifficultWord.lapses + 1,
+            'due_at': now,
+            'last_reviewed_at': now
+        }
+
+    def record_review(self, is_correct, now=None):
+        """Schedule the next review after a correct or wrong answer"""
+        now = now or datetime.utcnow()
+
+        if is_correct:
+            self.repetitions = (self.repetitions or 0) + 1
+            if self.repetitions == 1:
+                self.interval_days = 1
+            elif self.repetitions == 2:
+                self.interval_days = 6
+            else:
+                self.interval_days = max(round((self.interval_days or 1) * self.ease), 1)
+        else:
+            self.repetitions = 0
+            self.interval_days = 0
+            self.lapses = (self.lapses or 0) + 1
+            self.ease = max((self.ease or self.DEFAULT_EASE) - self.LAPSE_EASE_PENALTY, self.MIN_EASE)
+
+        self.due_at = now + timedelta(days=self.interval_days)
+        self.last_reviewed_at = now
+
+    def to_dict(self, case_sensitive=None):
         word_dict = self.word.to_dict() if self.word else None
-        # Add case_sensitive setting from the word's module
+        # Add case_sensitive setting from the word's module (looked up unless passed in)
         if word_dict and self.word:
-            module = Module.query.get(self.word.module_id)
-            word_dict['case_sensitive'] = module.case_sensitive if module else False
+            if case_sensitive is None:
+                module = Module.query.get(self.word.module_id)
+                case_sensitive = module.case_sensitive if module else False
+            word_dict['case_sensitive'] = case_sensitive
 
         return {
             'id': self.id,
             'user_id': self.user_id,
             'word_id': self.word_id,
             'word': word_dict,
-            'added_at': self.added_at.isoformat() if self.added_at else None
+            'added_at': self.added_at.isoformat() if self.added_at else None,
+            'ease': self.ease,
+            'interval_days': self.interval_days,
+            'repetitions': self.repetitions,
+            'lapses': self.lapses,
+            'due_at': self.due_at.isoformat() if self.due_at else None
         }
@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+
+class OutboxEmail(db.Model):
+    """Email waiting to be sent by the MailDispatcher (survives worker restarts)"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.JSON, nullable=True)  # "addr" or ["Name", "addr"]
+    recipients = db.Column(db.JSON, nullable=False)
+    reply_to = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    html = db.Column(db.Text, nullable=True)
+
+    # Optional single attachment (e.g. the quote PDF)
+    attachment_filename = db.Column(db.String(255), nullable=True)
+    attachment_mimetype = db.Column(db.String(100), nullable=True)
+    attachment_data = db.Column(db.LargeBinary, nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'subject': self.subject,
+            'recipients': self.recipients,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
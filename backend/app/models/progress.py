@@ -4,6 +4,9 @@ from datetime import datetime
 class StudentProgress(db.Model):
     """Tracks overall progress for a student on a module"""
     __tablename__ = 'student_progress'
+    __table_args__ = (
+        db.Index('ix_student_progress_user_module', 'user_id', 'module_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -57,6 +60,9 @@ class StudentProgress(db.Model):
 class BatteryProgress(db.Model):
     """Tracks progress within a specific battery"""
     __tablename__ = 'battery_progress'
+    __table_args__ = (
+        db.Index('ix_battery_progress_student_progress_battery', 'student_progress_id', 'battery_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_progress_id = db.Column(db.Integer, db.ForeignKey('student_progress.id'), nullable=False)
@@ -95,9 +101,12 @@ class BatteryProgress(db.Model):
 class QuestionProgress(db.Model):
     """Tracks individual question attempts"""
     __tablename__ = 'question_progress'
+    __table_args__ = (
+        db.Index('ix_question_progress_word_correct_answered', 'word_id', 'is_correct', 'answered_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    battery_progress_id = db.Column(db.Integer, db.ForeignKey('battery_progress.id'), nullable=False)
+    battery_progress_id = db.Column(db.Integer, db.ForeignKey('battery_progress.id'), nullable=False, index=True)
     word_id = db.Column(db.Integer, db.ForeignKey('words.id'), nullable=False)
 
     phase = db.Column(db.Integer, nullable=False)  # 1, 2, or 3
@@ -121,3 +130,42 @@ class QuestionProgress(db.Model):
             'attempt_number': self.attempt_number,
             'answered_at': self.answered_at.isoformat() if self.answered_at else None
         }
+
+
+class ProgressSummary(db.Model):
+    """Materialized answer statistics per student per module, updated on every answer"""
+    __tablename__ = 'progress_summaries'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'module_id', name='uq_progress_summaries_user_module'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=False)
+
+    answered_word_ids = db.Column(db.JSON, default=list)  # Unique word IDs answered at least once
+    answered_words = db.Column(db.Integer, default=0)
+    correct_questions = db.Column(db.Integer, default=0)
+    total_questions = db.Column(db.Integer, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = db.relationship('User', backref=db.backref('progress_summaries', lazy='dynamic', cascade='all, delete-orphan'))
+
+    def to_dict(self, total_words):
+        answered_words = self.answered_words or 0
+        correct_questions = self.correct_questions or 0
+        total_questions = self.total_questions or 0
+
+        score = (correct_questions / total_questions * 100) if total_questions > 0 else 0
+        completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
+
+        return {
+            'completion_percentage': completion_percentage,
+            'answered_words': answered_words,
+            'total_words': total_words,
+            'score': score,
+            'correct_questions': correct_questions,
+            'total_questions': total_questions
+        }
@@ -1,6 +1,8 @@
 from app import db
+from flask import current_app
 from datetime import datetime
 import random
+import time
 
 class Quote(db.Model):
     """Motivational quotes or video links shown after module completion"""
@@ -12,15 +14,61 @@ class Quote(db.Model):
     video_url = db.Column(db.String(500), nullable=True)  # YouTube or other video URL
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Process-local cache of active quote IDs: (ids, loaded_at)
+    _active_ids_cache = None
+
+    @classmethod
+    def get_active_ids(cls):
+        """
+        IDs of all active quotes, cached per worker for QUOTE_CACHE_SECONDS.
+        Admin quote CRUD clears the cache of the worker handling it.
+        """
+        ttl = current_app.config.get('QUOTE_CACHE_SECONDS', 300)
+        cached = cls._active_ids_cache
+        if cached and time.monotonic() - cached[1] < ttl:
+            return cached[0]
+
+        ids = [quote_id for (quote_id,) in db.session.query(Quote.id).filter_by(is_active=True).all()]
+        cls._active_ids_cache = (ids, time.monotonic())
+        return ids
+
+    @classmethod
+    def clear_cache(cls):
+        """Forget the cached active quote IDs (call after creating, editing or deleting quotes)"""
+        cls._active_ids_cache = None
+
+    @classmethod
+    def get_random_quote(cls):
+        """Get a random active quote (picked by primary key from the cached ID list)"""
+        for _ in range(2):
+            ids = cls.get_active_ids()
+            if not ids:
+                return None
+
+            quote = Quote.query.get(random.choice(ids))
+            if quote and quote.is_active:
+                return quote
+
+            # Changed by another worker since the IDs were cached: reload once
+            cls.clear_cache()
 
-    @staticmethod
-    def get_random_quote():
-        """Get a random active quote"""
-        quotes = Quote.query.filter_by(is_active=True).all()
-        if quotes:
-            return random.choice(quotes)
         return None
 
+    @staticmethod
+    def fingerprint(query):
+        """
+        Cheap aggregate over a quote query that changes whenever a matching
+        quote is added, removed or edited (used for ETags)
+        """
+        return tuple(query.order_by(None).with_entities(
+            db.func.count(Quote.id),
+            db.func.sum(Quote.id),
+            db.func.max(Quote.created_at),
+            db.func.max(Quote.updated_at)
+        ).first())
+
     def to_dict(self):
         return {
             'id': self.id,
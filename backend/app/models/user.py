@@ -1,5 +1,5 @@
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.services.password_service import PasswordService
 from datetime import datetime
 
 class User(db.Model):
@@ -14,7 +14,7 @@ class User(db.Model):
 
     # Student specific
     class_code = db.Column(db.String(9), db.ForeignKey('class_codes.code'), nullable=True)
-    classroom_id = db.Column(db.Integer, db.ForeignKey('classrooms.id'), nullable=True)
+    classroom_id = db.Column(db.Integer, db.ForeignKey('classrooms.id'), nullable=True, index=True)
 
     # Teacher specific
     teacher_code = db.Column(db.String(9), db.ForeignKey('teacher_codes.code'), nullable=True)
@@ -39,10 +39,17 @@ class User(db.Model):
     difficult_words = db.relationship('DifficultWord', backref='user', lazy='dynamic', cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = PasswordService.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return PasswordService.verify(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        """Re-hash a just verified password when PASSWORD_HASH_METHOD has changed"""
+        if PasswordService.needs_rehash(self.password_hash):
+            self.set_password(password)
+            return True
+        return False
 
     def to_dict(self):
         classroom_name = None
@@ -54,13 +61,11 @@ class User(db.Model):
             classroom_name = self.classroom.name
             school_id = self.classroom.school_id
 
-            # Get school information if available
-            if self.classroom.school_id:
-                from app.models.school import School
-                school = School.query.get(self.classroom.school_id)
-                if school:
-                    school_name = school.school_name
-                    school_code = school.school_code
+            # Get school information if available (no query when loaded with joinedload)
+            school = self.classroom.school if self.classroom.school_id else None
+            if school:
+                school_name = school.school_name
+                school_code = school.school_code
 
         return {
             'id': self.id,
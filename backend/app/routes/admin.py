@@ -1,18 +1,26 @@
 from flask import Blueprint, request, jsonify, current_app, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_mail import Message
 from app import db
 from app.models.user import User
-from app.models.module import Module, Word, Battery
+from app.models.module import Module, Word
 from app.models.code import ClassCode, TeacherCode
 from app.models.classroom import Classroom
 from app.models.school import School
 from app.models.quote import Quote
-from app.models.progress import QuestionProgress, StudentProgress, BatteryProgress
-from app.models.module import DifficultWord
+from app.models.outbox import OutboxEmail
+from app.models.progress import QuestionProgress, StudentProgress
 from app.services.module_service import ModuleService
+from app.services.module_cache import ModuleCache
 from app.services.email_service import EmailService
+from app.services.mail_dispatcher import MailDispatcher
 from app.services.export_service import ExportService
-from datetime import datetime, timedelta
+from app.services.progress_service import ProgressService
+from app.services.user_service import UserService
+from app.services.job_service import JobService
+from app.utils.http_cache import make_etag, conditional_json
+from app.utils.jobs import async_requested, job_accepted
+from datetime import datetime
 from sqlalchemy import func
 from werkzeug.utils import secure_filename
 import os
@@ -41,8 +49,9 @@ def get_all_modules():
     if error:
         return error
 
-    modules = Module.query.order_by(Module.display_order, Module.id).all()
-    return jsonify([m.to_dict(include_words=False) for m in modules]), 200
+    query = Module.query.order_by(Module.display_order, Module.id)
+    etag = make_etag('admin-modules', *Module.catalog_fingerprint(query))
+    return conditional_json(etag, lambda: [m.to_dict(include_words=False) for m in query.all()], public=False)
 
 
 @bp.route('/module/<int:module_id>', methods=['GET'])
@@ -98,7 +107,7 @@ def get_module_csv(module_id):
 @bp.route('/module/upload', methods=['POST'])
 @jwt_required()
 def upload_module():
-    """Create module from Excel file"""
+    """Create module from Excel file (or one module per sheet with all_sheets=true)"""
     print("=== Upload module endpoint hit ===")
     print(f"Files in request: {list(request.files.keys())}")
     print(f"Form data: {dict(request.form)}")
@@ -118,6 +127,25 @@ def upload_module():
     if not file.filename.endswith('.xlsx'):
         return jsonify({'error': 'File must be .xlsx format'}), 400
 
+    try:
+        level = int(request.form.get('level', '1'))
+    except ValueError:
+        return jsonify({'error': 'level must be an integer between 1 and 6'}), 400
+
+    if not 1 <= level <= 6:
+        return jsonify({'error': 'level must be an integer between 1 and 6'}), 400
+
+    # Large workbooks: import in the background, the client polls the job
+    if async_requested():
+        job = JobService.submit('import_module_excel', params={
+            'name': request.form.get('name', secure_filename(file.filename).replace('.xlsx', '')),
+            'difficulty': request.form.get('difficulty', ''),
+            'level': level,
+            'is_free': request.form.get('is_free', 'false').lower() == 'true',
+            'all_sheets': request.form.get('all_sheets', 'false').lower() == 'true'
+        }, user_id=get_jwt_identity(), input_data=file.read())
+        return job_accepted(job)
+
     # Save file temporarily
     filename = secure_filename(file.filename)
     filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
@@ -127,8 +155,25 @@ def upload_module():
     try:
         name = request.form.get('name', filename.replace('.xlsx', ''))
         difficulty = request.form.get('difficulty', '')
-        level = int(request.form.get('level', '1'))
         is_free = request.form.get('is_free', 'false').lower() == 'true'
+        all_sheets = request.form.get('all_sheets', 'false').lower() == 'true'
+
+        # Multi-sheet workbook: one module per worksheet
+        if all_sheets:
+            modules = ModuleService.create_modules_from_excel(
+                filepath,
+                difficulty=difficulty,
+                level=level,
+                is_free=is_free
+            )
+
+            # Clean up temp file
+            os.remove(filepath)
+
+            return jsonify({
+                'message': f'{len(modules)} modules created successfully',
+                'modules': [m.to_dict() for m in modules]
+            }), 201
 
         module = ModuleService.create_module_from_excel(
             filepath,
@@ -204,6 +249,45 @@ def upload_module_csv():
         return jsonify({'error': f'Error creating module: {str(e)}'}), 500
 
 
+@bp.route('/module/validate', methods=['POST'])
+@jwt_required()
+def validate_module_upload():
+    """Dry-run validation of CSV data (JSON) or an Excel file (form) without saving anything"""
+    error = admin_required()
+    if error:
+        return error
+
+    # Excel upload
+    if 'file' in request.files:
+        file = request.files['file']
+        if not file.filename.endswith('.xlsx'):
+            return jsonify({'error': 'File must be .xlsx format'}), 400
+
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f'validate_{filename}')
+        file.save(filepath)
+
+        try:
+            all_sheets = request.form.get('all_sheets', 'false').lower() == 'true'
+            return jsonify(ModuleService.validate_excel(filepath, all_sheets=all_sheets)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 422
+        finally:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    # CSV paste
+    data = request.get_json(silent=True) or {}
+    csv_data = data.get('csv_data')
+    if not csv_data:
+        return jsonify({'error': 'CSV data or Excel file required'}), 400
+
+    try:
+        return jsonify(ModuleService.validate_csv(csv_data)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+
+
 @bp.route('/module/<int:module_id>', methods=['PUT'])
 @jwt_required()
 def update_module(module_id):
@@ -269,6 +353,7 @@ def update_module(module_id):
     module.version += 1
 
     db.session.commit()
+    ModuleCache.invalidate(module_id)
 
     return jsonify(module.to_dict()), 200
 
@@ -285,43 +370,11 @@ def delete_module(module_id):
     if not module:
         return jsonify({'error': 'Module not found'}), 404
 
-    try:
-        # Step 1: Get all word IDs for this module
-        word_ids = [w.id for w in Word.query.filter_by(module_id=module_id).all()]
+    if async_requested():
+        return job_accepted(JobService.submit('delete_module', {'module_id': module_id}, get_jwt_identity()))
 
-        # Step 2: Delete all DifficultWord records that reference these words
-        if word_ids:
-            DifficultWord.query.filter(DifficultWord.word_id.in_(word_ids)).delete(synchronize_session=False)
-
-        # Step 3: Get all StudentProgress records for this module
-        student_progress_records = StudentProgress.query.filter_by(module_id=module_id).all()
-
-        # Step 4: Delete all related progress records
-        for sp in student_progress_records:
-            # Get all BatteryProgress IDs for this StudentProgress
-            battery_progress_ids = [bp.id for bp in sp.battery_progress]
-
-            # Delete all QuestionProgress records for these BatteryProgress records
-            if battery_progress_ids:
-                QuestionProgress.query.filter(
-                    QuestionProgress.battery_progress_id.in_(battery_progress_ids)
-                ).delete(synchronize_session=False)
-
-            # Delete all BatteryProgress records
-            BatteryProgress.query.filter_by(student_progress_id=sp.id).delete(synchronize_session=False)
-
-        # Step 5: Delete all StudentProgress records for this module
-        StudentProgress.query.filter_by(module_id=module_id).delete(synchronize_session=False)
-
-        # Step 6: Delete all Word records
-        Word.query.filter_by(module_id=module_id).delete(synchronize_session=False)
-
-        # Step 7: Delete all Battery records
-        Battery.query.filter_by(module_id=module_id).delete(synchronize_session=False)
-
-        # Step 8: Finally delete the module itself
-        db.session.delete(module)
-        db.session.commit()
+    try:
+        ModuleService.delete_module(module_id)
 
         return jsonify({'message': 'Module permanently deleted'}), 200
     except Exception as e:
@@ -674,6 +727,7 @@ def create_quote():
     quote = Quote(text=text, author=author, video_url=video_url)
     db.session.add(quote)
     db.session.commit()
+    Quote.clear_cache()
 
     return jsonify(quote.to_dict()), 201
 
@@ -702,6 +756,7 @@ def update_quote(quote_id):
         quote.is_active = data['is_active']
 
     db.session.commit()
+    Quote.clear_cache()
 
     return jsonify(quote.to_dict()), 200
 
@@ -720,6 +775,7 @@ def delete_quote(quote_id):
 
     db.session.delete(quote)
     db.session.commit()
+    Quote.clear_cache()
 
     return jsonify({'message': 'Quote deleted'}), 200
 
@@ -777,19 +833,10 @@ def cleanup_inactive_users():
     if error:
         return error
 
-    cutoff_date = datetime.utcnow() - timedelta(days=730)
+    if async_requested():
+        return job_accepted(JobService.submit('cleanup_inactive_users', user_id=get_jwt_identity()))
 
-    inactive_users = User.query.filter(
-        User.last_activity < cutoff_date,
-        User.role != 'admin'
-    ).all()
-
-    count = len(inactive_users)
-
-    for user in inactive_users:
-        db.session.delete(user)
-
-    db.session.commit()
+    count = UserService.delete_inactive_users()
 
     return jsonify({
         'message': f'{count} inactive users deleted',
@@ -835,16 +882,42 @@ def update_email_template():
 @bp.route('/email/compose', methods=['POST'])
 @jwt_required()
 def compose_email():
-    """Generate Gmail compose link"""
+    """
+    Generate Gmail compose link, or with send=true queue the email(s) in the outbox.
+    For bulk sends pass recipients: [{"recipient": ..., "context": {...}}, ...].
+    """
     error = admin_required()
     if error:
         return error
 
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     recipient = data.get('recipient')
     template_type = data.get('template_type', 'teacher_instruction')
     context = data.get('context', {})
 
+    if data.get('send'):
+        entries = data.get('recipients') or [{'recipient': recipient, 'context': context}]
+        if not isinstance(entries, list) or not isinstance(context, dict):
+            return jsonify({'error': 'recipients must be a list and context an object'}), 400
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get('context') or {}, dict):
+                return jsonify({'error': 'Every recipient must be an object with a recipient and optional context'}), 400
+            if not isinstance(entry.get('recipient'), str) or not entry['recipient'].strip():
+                return jsonify({'error': 'Every email needs a recipient'}), 400
+
+        messages = []
+        for entry in entries:
+            entry_context = {**context, **(entry.get('context') or {})}
+            messages.append(Message(
+                subject=entry_context.get('subject', 'Octovoc - Je lerarencode'),
+                recipients=[entry['recipient']],
+                body=EmailService.generate_email_content(template_type, entry_context),
+                sender=current_app.config.get('MAIL_DEFAULT_SENDER')
+            ))
+
+        count = MailDispatcher.enqueue_many(messages)
+        return jsonify({'message': f'{count} emails queued', 'count': count}), 202
+
     gmail_link = EmailService.generate_gmail_compose_link(
         recipient=recipient,
         template_type=template_type,
@@ -854,6 +927,23 @@ def compose_email():
     return jsonify({'gmail_link': gmail_link}), 200
 
 
+@bp.route('/email/outbox', methods=['GET'])
+@jwt_required()
+def get_email_outbox():
+    """Outbox status: counts per status and the most recent failures"""
+    error = admin_required()
+    if error:
+        return error
+
+    counts = dict(db.session.query(OutboxEmail.status, func.count(OutboxEmail.id)).group_by(OutboxEmail.status).all())
+    failed = OutboxEmail.query.filter_by(status='failed').order_by(OutboxEmail.id.desc()).limit(20).all()
+
+    return jsonify({
+        'counts': counts,
+        'failed': [email.to_dict() for email in failed]
+    }), 200
+
+
 @bp.route('/users', methods=['GET'])
 @jwt_required()
 def get_all_users():
@@ -926,36 +1016,23 @@ def get_student_module_detail(student_id, module_id):
         return jsonify({'error': 'No progress found for this student and module'}), 404
 
     # Get total words in module
-    total_words = Word.query.filter_by(module_id=module_id).count()
-
-    # Get all question attempts for this progress
-    question_progress = []
-    answered_word_ids = set()
-    for bp in progress.battery_progress:
-        questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-        for q in questions:
-            question_progress.append(q.to_dict())
-            if q.word_id:
-                answered_word_ids.add(q.word_id)
-
-    answered_words = len(answered_word_ids)
-
-    # Calculate statistics
-    total_questions = len(question_progress)
-    correct_questions = sum(1 for q in question_progress if q['is_correct'])
-    score = (correct_questions / total_questions * 100) if total_questions > 0 else 0
-    completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
+    total_words = module.word_count or 0
+
+    # Statistics come from the materialized summary, attempts from one joined query
+    summary = ProgressService.get_summary(student_id, module_id)
+    stats = summary.to_dict(total_words)
+    question_progress = ProgressService.get_question_progress(progress.id)
 
     return jsonify({
         'student': student.to_dict(),
         'module': module.to_dict(),
         'progress': {
-            'completion_percentage': round(completion_percentage, 1),
-            'answered_words': answered_words,
+            'completion_percentage': round(stats['completion_percentage'], 1),
+            'answered_words': stats['answered_words'],
             'total_words': total_words,
-            'score': round(score, 2),
-            'correct_questions': correct_questions,
-            'total_questions': total_questions,
+            'score': round(stats['score'], 2),
+            'correct_questions': stats['correct_questions'],
+            'total_questions': stats['total_questions'],
             'is_completed': progress.is_completed,
             'completion_date': progress.completion_date.isoformat() if progress.completion_date else None,
             'time_spent': progress.total_time_spent
@@ -990,10 +1067,7 @@ def get_student_detail(student_id):
             continue
 
         # Get all question attempts
-        question_progress = []
-        for bp in progress.battery_progress:
-            questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-            question_progress.extend([q.to_dict() for q in questions])
+        question_progress = ProgressService.get_question_progress(progress.id)
 
         result['modules'].append({
             'module': module.to_dict(),
@@ -1016,64 +1090,8 @@ def get_classroom_progress(classroom_id):
     if not classroom:
         return jsonify({'error': 'Classroom not found'}), 404
 
-    # Get all students in classroom (sorted alphabetically by email)
-    students = User.query.filter_by(classroom_id=classroom_id).order_by(User.email).all()
-
-    # Get all active modules (sorted by display_order)
-    modules = Module.query.filter_by(is_active=True).order_by(Module.display_order).all()
-
-    # Build matrix data structure
-    matrix = []
-    for student in students:
-        student_row = {
-            'student_id': student.id,
-            'student_email': student.email,
-            'student_first_name': student.first_name,
-            'student_last_name': student.last_name,
-            'modules': {}
-        }
-
-        # Get all progress records for this student
-        progress_records = StudentProgress.query.filter_by(user_id=student.id).all()
-
-        # Create a lookup dictionary for quick access
-        progress_by_module = {p.module_id: p for p in progress_records}
-
-        # For each module, add progress data
-        for module in modules:
-            if module.id in progress_by_module:
-                progress = progress_by_module[module.id]
-
-                # Get total words in module
-                total_words = Word.query.filter_by(module_id=module.id).count()
-
-                # Count unique words answered
-                answered_word_ids = set()
-                for bp in progress.battery_progress:
-                    questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-                    for q in questions:
-                        if q.word_id:
-                            answered_word_ids.add(q.word_id)
-
-                answered_words = len(answered_word_ids)
-
-                # Calculate completion percentage
-                completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
-
-                student_row['modules'][module.id] = {
-                    'completion_percentage': round(completion_percentage, 1),
-                    'answered_words': answered_words,
-                    'total_words': total_words
-                }
-            # If module not started, modules[module.id] will not exist (empty cell)
-
-        matrix.append(student_row)
-
-    # Return matrix with module info
-    return jsonify({
-        'students': matrix,
-        'modules': [{'id': m.id, 'name': m.name} for m in modules]
-    }), 200
+    # Matrix is computed with aggregate queries (constant query count)
+    return jsonify(ProgressService.get_classroom_matrix(classroom_id)), 200
 
 
 # ===== School Management Endpoints =====
@@ -1325,14 +1343,11 @@ def bulk_delete_users():
     if not user_ids:
         return jsonify({'error': 'No user IDs provided'}), 400
 
-    # Don't allow deleting admins
-    users = User.query.filter(User.id.in_(user_ids), User.role != 'admin').all()
-    deleted_count = len(users)
+    if async_requested():
+        return job_accepted(JobService.submit('bulk_delete_users', {'user_ids': user_ids}, get_jwt_identity()))
 
-    for user in users:
-        db.session.delete(user)
-
-    db.session.commit()
+    # Don't allow deleting admins
+    deleted_count = UserService.bulk_delete_users(user_ids)
 
     return jsonify({
         'message': f'{deleted_count} users deleted',
@@ -1354,10 +1369,49 @@ def export_classroom_excel(classroom_id):
     if not classroom:
         return jsonify({'error': 'Classroom not found'}), 404
 
-    # Generate Excel file
-    file_path = ExportService.export_classroom_to_excel(classroom_id)
+    if async_requested():
+        return job_accepted(JobService.submit('export_classroom_excel', {'classroom_id': classroom_id}, get_jwt_identity()))
 
-    return send_file(file_path, as_attachment=True, download_name=f'classroom_{classroom_id}_progress.xlsx')
+    # Generate the whole Excel file first (in memory, or an anonymous temp file when large), then send it
+    output = ExportService.export_classroom_to_excel(classroom_id)
+
+    return send_file(output, as_attachment=True, download_name=f'classroom_{classroom_id}_progress.xlsx')
+
+
+@bp.route('/classrooms/export', methods=['GET'])
+@jwt_required()
+def export_all_classrooms():
+    """Export all classrooms (or those of ?school_id=) to one multi-sheet workbook, or a ZIP (?format=zip)"""
+    error = admin_required()
+    if error:
+        return error
+
+    export_format = request.args.get('format', 'xlsx')
+    if export_format not in ('xlsx', 'zip'):
+        return jsonify({'error': 'Format must be xlsx or zip'}), 400
+
+    query = Classroom.query
+    school_id = request.args.get('school_id', type=int)
+    if school_id:
+        query = query.filter_by(school_id=school_id)
+
+    classrooms = query.order_by(Classroom.id).all()
+    if not classrooms:
+        return jsonify({'error': 'No classrooms found'}), 404
+
+    if async_requested():
+        return job_accepted(JobService.submit('export_classrooms', {
+            'classroom_ids': [c.id for c in classrooms],
+            'format': export_format
+        }, get_jwt_identity()))
+
+    if export_format == 'zip':
+        output = ExportService.export_classrooms_to_zip(classrooms)
+    else:
+        output = ExportService.export_classrooms_to_excel(classrooms)
+
+    name = f'school_{school_id}_progress' if school_id else 'classrooms_progress'
+    return send_file(output, as_attachment=True, download_name=f'{name}.{export_format}')
 
 
 @bp.route('/student/<int:student_id>/export/pdf', methods=['GET'])
@@ -1372,10 +1426,40 @@ def export_student_pdf(student_id):
     if not student:
         return jsonify({'error': 'Student not found'}), 404
 
-    # Generate PDF file
-    file_path = ExportService.export_student_to_pdf(student_id)
+    if async_requested():
+        return job_accepted(JobService.submit('export_student_pdf', {'student_id': student_id}, get_jwt_identity()))
+
+    # Generate PDF file (rendered in the PDF process pool, nothing is kept on disk)
+    output = ExportService.export_student_to_pdf(student_id)
+
+    return send_file(output, as_attachment=True, download_name=f'student_{student_id}_report.pdf')
+
+
+@bp.route('/classroom/<int:classroom_id>/export/pdf', methods=['GET'])
+@jwt_required()
+def export_classroom_pdf(classroom_id):
+    """Export the reports of all students in a classroom: one PDF, or a ZIP per student (?format=zip)"""
+    error = admin_required()
+    if error:
+        return error
+
+    classroom = Classroom.query.get(classroom_id)
+    if not classroom:
+        return jsonify({'error': 'Classroom not found'}), 404
+
+    export_format = request.args.get('format', 'pdf')
+    if export_format not in ('pdf', 'zip'):
+        return jsonify({'error': 'Format must be pdf or zip'}), 400
+
+    if async_requested():
+        return job_accepted(JobService.submit('export_classroom_pdf', {
+            'classroom_id': classroom_id,
+            'format': export_format
+        }, get_jwt_identity()))
+
+    output = ExportService.export_classroom_to_pdf(classroom_id, as_zip=export_format == 'zip')
 
-    return send_file(file_path, as_attachment=True, download_name=f'student_{student_id}_report.pdf')
+    return send_file(output, as_attachment=True, download_name=f'classroom_{classroom_id}_reports.{export_format}')
 
 
 @bp.route('/student/<int:student_id>/export/excel', methods=['GET'])
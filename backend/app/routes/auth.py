@@ -4,7 +4,9 @@ from app import db
 from app.models.user import User
 from app.models.code import ClassCode, TeacherCode
 from app.models.classroom import Classroom
+from app.services.user_service import UserService
 from app.utils.email import send_password_reset_email
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import secrets
 
@@ -110,7 +112,10 @@ def login():
     if not email or not password:
         return jsonify({'error': 'E-mail en wachtwoord zijn verplicht'}), 400
 
-    user = User.query.filter_by(email=email).first()
+    # Classroom and school come along for the response (one query)
+    user = User.query.options(
+        joinedload(User.classroom).joinedload(Classroom.school)
+    ).filter_by(email=email).first()
 
     if not user or not user.check_password(password):
         return jsonify({'error': 'Ongeldig e-mailadres of wachtwoord'}), 401
@@ -126,9 +131,14 @@ def login():
     if user.role != 'admin' and not user.class_code and not user.teacher_code:
         return jsonify({'error': 'Je account heeft geen klas- of lerarencode. Registreer opnieuw met een geldige code.'}), 401
 
-    # Update last activity
-    user.last_activity = db.func.now()
-    db.session.commit()
+    # Upgrade the stored hash to the current hashing parameters
+    rehashed = user.rehash_password_if_needed(password)
+
+    # Update last activity (coalesced: most logins write nothing)
+    touched = UserService.touch_activity(user)
+
+    if rehashed or touched:
+        db.session.commit()
 
     # Create access token
     access_token = create_access_token(identity=str(user.id))
@@ -0,0 +1,55 @@
+from flask import Blueprint, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.models.user import User
+from app.models.job import Job
+import io
+
+bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+
+def get_job_for_user(job_id):
+    """Load a job the current user may see (its creator or an admin); returns (job, error_response)"""
+    user = User.query.get(int(get_jwt_identity()))
+    job = db.session.get(Job, job_id)
+
+    if not user or not job or (job.created_by != user.id and user.role != 'admin'):
+        return None, (jsonify({'error': 'Job not found'}), 404)
+
+    return job, None
+
+
+@bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Job status and progress; the frontend polls this after a 202 response"""
+    job, error = get_job_for_user(job_id)
+    if error:
+        return error
+
+    return jsonify(job.to_dict()), 200
+
+
+@bp.route('/<job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    """Download the generated file, or the JSON result of a finished job"""
+    job, error = get_job_for_user(job_id)
+    if error:
+        return error
+
+    if job.status == 'failed':
+        return jsonify({'error': job.error or 'Job failed'}), 500
+
+    if job.status != 'succeeded':
+        return jsonify({'error': 'Job is not finished yet', 'status': job.status}), 409
+
+    if job.result_filename:
+        return send_file(
+            io.BytesIO(job.result_data),
+            as_attachment=True,
+            download_name=job.result_filename,
+            mimetype=job.result_mimetype
+        )
+
+    return jsonify(job.result or {}), 200
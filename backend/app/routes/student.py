@@ -5,19 +5,17 @@ from app.models.user import User
 from app.models.module import Module, Word, Battery, DifficultWord
 from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress
 from app.models.quote import Quote
+from app.services.exercise_session import ExerciseSession
+from app.services.module_cache import ModuleCache
+from app.services.progress_service import ProgressService
+from app.utils.http_cache import make_etag, conditional_json
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
 import random
-import re
 
 bp = Blueprint('student', __name__, url_prefix='/api/student')
 
 
-def extract_inflected_form(example_sentence):
-    """Extract the word between asterisks from the example sentence."""
-    match = re.search(r'\*([^*]+)\*', example_sentence)
-    return match.group(1) if match else None
-
-
 @bp.route('/allowed-levels', methods=['GET'])
 @jwt_required(optional=True)
 def get_allowed_levels():
@@ -85,7 +83,26 @@ def get_modules():
             # Filter by allowed levels
             query = query.filter(Module.level.in_(allowed_levels))
 
-        modules = query.order_by(Module.display_order, Module.id).all()
+        query = query.order_by(Module.display_order, Module.id)
+
+        # Anonymous catalog is the same for every guest: serve it with an ETag
+        # derived from the module rows, so unchanged catalogs return 304
+        if not user_id:
+            etag = make_etag('student-modules', level, allowed_levels, *Module.catalog_fingerprint(query))
+            return conditional_json(etag, lambda: [m.to_dict() for m in query.all()])
+
+        modules = query.all()
+
+        # Batch-load progress for all listed modules
+        module_ids = [m.id for m in modules]
+        progress_by_module = {}
+        if user_id and module_ids:
+            progress_by_module = {
+                p.module_id: p for p in StudentProgress.query.filter(
+                    StudentProgress.user_id == user_id,
+                    StudentProgress.module_id.in_(module_ids)
+                ).all()
+            }
 
         # Get progress for each module
         result = []
@@ -94,10 +111,7 @@ def get_modules():
                 module_data = module.to_dict()
 
                 if user_id:
-                    progress = StudentProgress.query.filter_by(
-                        user_id=user_id,
-                        module_id=module.id
-                    ).first()
+                    progress = progress_by_module.get(module.id)
 
                     if progress:
                         module_data['progress'] = progress.to_dict()
@@ -143,16 +157,9 @@ def get_module(module_id):
             module_data['progress'] = progress.to_dict()
 
             # Calculate completion percentage
-            total_words = Word.query.filter_by(module_id=module_id).count()
-            answered_word_ids = set()
-
-            for bp in progress.battery_progress:
-                questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-                for q in questions:
-                    if q.word_id:
-                        answered_word_ids.add(q.word_id)
-
-            answered_words = len(answered_word_ids)
+            total_words = module.word_count or 0
+            summary = ProgressService.get_summary(user_id, module_id)
+            answered_words = summary.answered_words if summary else 0
             completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
 
             module_data['completion_percentage'] = completion_percentage
@@ -166,29 +173,31 @@ def get_module(module_id):
 def start_module(module_id):
     """Start or resume a module"""
     user_id = get_jwt_identity()
-    module = Module.query.get(module_id)
-
-    if not module or not module.is_active:
-        return jsonify({'error': 'Module not found'}), 404
 
-    # For anonymous users with free modules, return basic module info
+    # For anonymous users with free modules: cached content and a signed session token
     if not user_id:
-        if not module.is_free:
+        content = ModuleCache.get_module(module_id)
+        if not content or not content.is_active:
+            return jsonify({'error': 'Module not found'}), 404
+        if not content.is_free:
             return jsonify({'error': 'Authentication required for this module'}), 401
 
-        # Return batteries for anonymous users
-        batteries = Battery.query.filter_by(module_id=module_id).all()
-        battery_ids = [b.id for b in batteries]
-        random.shuffle(battery_ids)
+        session = ExerciseSession.start(content)
 
         return jsonify({
             'anonymous': True,
             'module_id': module_id,
-            'current_battery_id': battery_ids[0] if battery_ids else None,
-            'battery_order': battery_ids,
-            'current_phase': 1
+            'current_battery_id': session.current_battery_id,
+            'battery_order': session.battery_order,
+            'current_phase': 1,
+            'session_token': session.to_token()
         }), 200
 
+    module = Module.query.get(module_id)
+
+    if not module or not module.is_active:
+        return jsonify({'error': 'Module not found'}), 404
+
     # Authenticated user flow
     user = User.query.get(user_id)
 
@@ -219,6 +228,7 @@ def start_module(module_id):
             final_round_word_ids=[]
         )
         db.session.add(progress)
+        ProgressService.ensure_summary(user_id, module_id)
         db.session.commit()
 
     return jsonify(progress.to_dict()), 200
@@ -229,24 +239,22 @@ def start_module(module_id):
 def start_battery(battery_id):
     """Start or resume a battery"""
     user_id = get_jwt_identity()
-    battery = Battery.query.get(battery_id)
-
-    if not battery:
-        return jsonify({'error': 'Battery not found'}), 404
 
-    # Anonymous user flow - just return battery words
+    # Anonymous user flow - battery words from the cache, queue kept in the session token
     if not user_id:
-        # Check if module is free
-        module = Module.query.get(battery.module_id)
-        if not module or not module.is_free:
+        content = ModuleCache.get_module_for_battery(battery_id)
+        if not content or not content.is_free:
             return jsonify({'error': 'Authentication required'}), 401
 
-        # Get all words in battery
-        battery_words = Word.query.filter(Word.id.in_(battery.word_ids)).all()
-        word_ids_shuffled = battery.word_ids.copy()
-        random.shuffle(word_ids_shuffled)
+        session = ExerciseSession.from_token((request.get_json(silent=True) or {}).get('session_token'))
+        if not session or not session.matches(content) or session.current_battery_id != battery_id:
+            return jsonify({'error': 'Invalid exercise session'}), 400
+
+        session.start_battery(content)
+        if not session.queue:
+            return jsonify({'error': 'No questions in queue'}), 400
 
-        first_word = Word.query.get(word_ids_shuffled[0])
+        battery_word_ids = content.batteries[battery_id]
 
         return jsonify({
             'anonymous': True,
@@ -254,13 +262,19 @@ def start_battery(battery_id):
                 'id': None,
                 'battery_id': battery_id,
                 'current_phase': 1,
-                'current_question_queue': word_ids_shuffled
+                'current_question_queue': session.queue
             },
-            'current_word': first_word.to_dict(),
-            'battery_words': [w.to_dict() for w in battery_words],
-            'phase': 1
+            'current_word': content.words[session.queue[0]],
+            'battery_words': [content.words[word_id] for word_id in sorted(battery_word_ids)],
+            'phase': 1,
+            'session_token': session.to_token()
         }), 200
 
+    battery = Battery.query.get(battery_id)
+
+    if not battery:
+        return jsonify({'error': 'Battery not found'}), 404
+
     # Authenticated user flow
     # Get or create battery progress
     student_progress = StudentProgress.query.filter_by(
@@ -316,43 +330,36 @@ def answer_question():
     user_answer = data.get('answer')
     phase = data.get('phase')
 
-    word = Word.query.get(word_id)
-    if not word:
+    # Module content (words, batteries, case sensitivity) comes from the
+    # process-local cache, so only the progress write touches the database
+    content = ModuleCache.get_module_for_word(word_id)
+    if not content:
         return jsonify({'error': 'Word not found'}), 404
 
-    # Get module to check case sensitivity setting
-    module = Module.query.get(word.module_id)
-    case_sensitive = module.case_sensitive if module else False
+    # Phase 1: match meaning, phase 2: match word,
+    # phase 3: type the word - accept both base form and inflected form
+    is_correct = content.check_answer(word_id, phase, user_answer)
+    correct_answer = content.correct_answer(word_id, phase)
 
-    # Determine if answer is correct based on phase
-    is_correct = False
+    # Anonymous user - progress lives in the signed session token, nothing is written
+    if not user_id:
+        session = ExerciseSession.from_token(data.get('session_token'))
+        if (not session or not session.matches(content) or not session.queue
+                or session.queue[0] != word_id or session.phase != phase):
+            return jsonify({'error': 'Invalid exercise session'}), 400
 
-    if phase == 1:
-        # Phase 1: Match meaning
-        if case_sensitive:
-            is_correct = user_answer.strip() == word.meaning.strip()
-        else:
-            is_correct = user_answer.strip().lower() == word.meaning.strip().lower()
-    elif phase == 2:
-        # Phase 2: Match word
-        if case_sensitive:
-            is_correct = user_answer.strip() == word.word.strip()
-        else:
-            is_correct = user_answer.strip().lower() == word.word.strip().lower()
-    elif phase == 3:
-        # Phase 3: Type the word - accept both base form and inflected form
-        inflected_form = extract_inflected_form(word.example_sentence)
-        if case_sensitive:
-            is_correct = user_answer == word.word or (inflected_form and user_answer == inflected_form)
-        else:
-            is_correct = user_answer.lower() == word.word.lower() or (inflected_form and user_answer.lower() == inflected_form.lower())
+        phase_complete, battery_complete = session.record_answer(is_correct, content)
 
-    # Anonymous user - just check answer, no progress tracking
-    if not user_id:
         return jsonify({
             'is_correct': is_correct,
-            'correct_answer': word.word if phase in [2, 3] else word.meaning,
-            'anonymous': True
+            'correct_answer': correct_answer,
+            'anonymous': True,
+            'phase': session.phase,
+            'phase_complete': phase_complete,
+            'battery_complete': battery_complete,
+            'next_battery_id': session.current_battery_id if battery_complete else None,
+            'next_word': content.words[session.queue[0]] if session.queue and not battery_complete else None,
+            'session_token': session.to_token()
         }), 200
 
     # Authenticated user - full progress tracking
@@ -370,6 +377,7 @@ def answer_question():
         is_correct=is_correct
     )
     db.session.add(question_progress)
+    ProgressService.record_answer(user_id, content.id, word_id, is_correct)
 
     # Update question queue
     queue = battery_progress.current_question_queue.copy()
@@ -390,18 +398,8 @@ def answer_question():
                 student_progress.final_round_word_ids = final_words
                 db.session.add(student_progress)
 
-            # Also add to difficult words immediately for practice
-            existing_difficult = DifficultWord.query.filter_by(
-                user_id=user_id,
-                word_id=word_id
-            ).first()
-
-            if not existing_difficult:
-                difficult_word = DifficultWord(
-                    user_id=user_id,
-                    word_id=word_id
-                )
-                db.session.add(difficult_word)
+            # Also add to difficult words immediately for practice (due again if already there)
+            DifficultWord.add(user_id, word_id, lapse=True)
 
     battery_progress.current_question_queue = queue
     db.session.add(battery_progress)
@@ -410,18 +408,23 @@ def answer_question():
     phase_just_completed = False
     if not battery_progress.current_question_queue:
         phase_just_completed = True
+        if phase in (1, 2):
+            # Next phase asks all battery words again
+            next_queue = ModuleCache.get_battery_word_ids(battery_progress.battery_id)
+            if next_queue is None:
+                # Battery deleted or module replaced since the battery was started
+                db.session.rollback()
+                return jsonify({'error': 'Battery no longer exists, restart the module'}), 409
+            random.shuffle(next_queue)
+
         if phase == 1:
             battery_progress.phase1_completed = True
             battery_progress.current_phase = 2
-            battery = Battery.query.get(battery_progress.battery_id)
-            battery_progress.current_question_queue = battery.word_ids.copy()
-            random.shuffle(battery_progress.current_question_queue)
+            battery_progress.current_question_queue = next_queue
         elif phase == 2:
             battery_progress.phase2_completed = True
             battery_progress.current_phase = 3
-            battery = Battery.query.get(battery_progress.battery_id)
-            battery_progress.current_question_queue = battery.word_ids.copy()
-            random.shuffle(battery_progress.current_question_queue)
+            battery_progress.current_question_queue = next_queue
         elif phase == 3:
             battery_progress.phase3_completed = True
             battery_progress.is_completed = True
@@ -450,21 +453,24 @@ def answer_question():
                 # Start final round
                 student_progress.in_final_round = True
 
-    db.session.commit()
-
     # Get next question if available
     next_word = None
     if battery_progress.current_question_queue:
         next_word_id = battery_progress.current_question_queue[0]
-        next_word = Word.query.get(next_word_id).to_dict()
+        next_word = ModuleCache.get_word(next_word_id)
+
+    # Serialize before commit so the response doesn't reload the expired row
+    battery_progress_data = battery_progress.to_dict()
+
+    db.session.commit()
 
     return jsonify({
         'is_correct': is_correct,
-        'correct_answer': word.word if phase in [2, 3] else word.meaning,
-        'battery_progress': battery_progress.to_dict(),
+        'correct_answer': correct_answer,
+        'battery_progress': battery_progress_data,
         'next_word': next_word,
         'phase_complete': phase_just_completed and phase < 3,
-        'battery_complete': battery_progress.is_completed
+        'battery_complete': battery_progress_data['is_completed']
     }), 200
 
 
@@ -523,20 +529,13 @@ def answer_final_round(module_id):
     if not student_progress or not student_progress.in_final_round:
         return jsonify({'error': 'Final round not available'}), 404
 
-    word = Word.query.get(word_id)
-    if not word:
+    content = ModuleCache.get_module_for_word(word_id)
+    if not content:
         return jsonify({'error': 'Word not found'}), 404
 
-    # Get module to check case sensitivity setting
-    module = Module.query.get(word.module_id)
-    case_sensitive = module.case_sensitive if module else False
-
-    # Check answer - accept both base form and inflected form
-    inflected_form = extract_inflected_form(word.example_sentence)
-    if case_sensitive:
-        is_correct = user_answer == word.word or (inflected_form and user_answer == inflected_form)
-    else:
-        is_correct = user_answer.lower() == word.word.lower() or (inflected_form and user_answer.lower() == inflected_form.lower())
+    # Check answer - accept both base form and inflected form (same rules as phase 3)
+    is_correct = content.check_answer(word_id, 3, user_answer)
+    correct_answer = content.correct_answer(word_id, 3)
 
     # Update word list
     word_ids = student_progress.final_round_word_ids.copy()
@@ -549,18 +548,8 @@ def answer_final_round(module_id):
         word_ids.remove(word_id)
         word_ids.append(word_id)
 
-        # Add to difficult words if not already there
-        existing_difficult = DifficultWord.query.filter_by(
-            user_id=user_id,
-            word_id=word_id
-        ).first()
-
-        if not existing_difficult:
-            difficult_word = DifficultWord(
-                user_id=user_id,
-                word_id=word_id
-            )
-            db.session.add(difficult_word)
+        # Add to difficult words, or make it due again if already there
+        DifficultWord.add(user_id, word_id, lapse=True)
 
     student_progress.final_round_word_ids = word_ids
     db.session.add(student_progress)
@@ -573,19 +562,19 @@ def answer_final_round(module_id):
 
         return jsonify({
             'is_correct': is_correct,
-            'correct_answer': word.word,
+            'correct_answer': correct_answer,
             'final_round_complete': True
         }), 200
 
     # Get next word
-    next_word = Word.query.get(word_ids[0])
+    next_word = ModuleCache.get_word(word_ids[0])
 
     db.session.commit()
 
     return jsonify({
         'is_correct': is_correct,
-        'correct_answer': word.word,
-        'next_word': next_word.to_dict(),
+        'correct_answer': correct_answer,
+        'next_word': next_word,
         'remaining': len(word_ids),
         'final_round_complete': False
     }), 200
@@ -622,12 +611,122 @@ def complete_module(module_id):
 @bp.route('/difficult-words', methods=['GET'])
 @jwt_required()
 def get_difficult_words():
-    """Get student's difficult words module"""
+    """
+    Get student's difficult words module
+
+    Optional query params:
+    - module_id: only words of this module
+    - page, per_page: return one page (total in the X-Total-Count header)
+    """
     user_id = get_jwt_identity()
+    module_id = request.args.get('module_id', type=int)
+    page = request.args.get('page', type=int)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+
+    # Words and their module's case setting in the same query
+    query = DifficultWord.query.outerjoin(
+        Word, Word.id == DifficultWord.word_id
+    ).outerjoin(
+        Module, Module.id == Word.module_id
+    ).options(
+        contains_eager(DifficultWord.word)
+    ).add_columns(
+        Module.case_sensitive
+    ).filter(
+        DifficultWord.user_id == user_id
+    ).order_by(
+        DifficultWord.id
+    )
+
+    if module_id:
+        query = query.filter(Word.module_id == module_id)
+
+    total = None
+    if page:
+        total = query.order_by(None).count()
+        query = query.limit(per_page).offset((max(page, 1) - 1) * per_page)
+
+    rows = query.all()
+    response = jsonify([dw.to_dict(case_sensitive=bool(case_sensitive)) for dw, case_sensitive in rows])
+
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+
+    return response, 200
+
+
+@bp.route('/difficult-words/due', methods=['GET'])
+@jwt_required()
+def get_due_difficult_words():
+    """
+    Get the next difficult words due for review, most overdue first
+
+    Optional query params:
+    - limit: number of words (default 20, at most 100)
+    - module_id: only words of this module
+    The number of due words is in the X-Total-Count header.
+    """
+    user_id = get_jwt_identity()
+    module_id = request.args.get('module_id', type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    now = datetime.utcnow()
+
+    # Range scan on ix_difficult_words_user_due, words joined in
+    query = DifficultWord.query.join(
+        Word, Word.id == DifficultWord.word_id
+    ).outerjoin(
+        Module, Module.id == Word.module_id
+    ).options(
+        contains_eager(DifficultWord.word)
+    ).add_columns(
+        Module.case_sensitive
+    ).filter(
+        DifficultWord.user_id == user_id,
+        DifficultWord.due_at <= now
+    )
+
+    if module_id:
+        query = query.filter(Word.module_id == module_id)
+
+    due_count = query.order_by(None).count()
+    rows = query.order_by(DifficultWord.due_at, DifficultWord.id).limit(limit).all()
 
-    difficult_words = DifficultWord.query.filter_by(user_id=user_id).all()
+    response = jsonify([dw.to_dict(case_sensitive=bool(case_sensitive)) for dw, case_sensitive in rows])
+    response.headers['X-Total-Count'] = str(due_count)
+    return response, 200
 
-    return jsonify([dw.to_dict() for dw in difficult_words]), 200
+
+@bp.route('/difficult-words/<int:word_id>/review', methods=['POST'])
+@jwt_required()
+def review_difficult_word(word_id):
+    """Answer a difficult word in a review session and schedule its next review"""
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    user_answer = data.get('answer')
+
+    difficult_word = DifficultWord.query.filter_by(
+        user_id=user_id,
+        word_id=word_id
+    ).first()
+
+    if not difficult_word:
+        return jsonify({'error': 'Word not found in difficult words'}), 404
+
+    content = ModuleCache.get_module_for_word(word_id)
+    if not content:
+        return jsonify({'error': 'Word not found'}), 404
+
+    # Same rules as phase 3: base form and inflected forms are accepted
+    is_correct = content.check_answer(word_id, 3, user_answer)
+    difficult_word.record_review(is_correct)
+    db.session.commit()
+
+    return jsonify({
+        'is_correct': is_correct,
+        'correct_answer': content.correct_answer(word_id, 3),
+        'interval_days': difficult_word.interval_days,
+        'due_at': difficult_word.due_at.isoformat()
+    }), 200
 
 
 @bp.route('/difficult-words/<int:word_id>', methods=['DELETE'])
@@ -664,5 +763,6 @@ def get_random_quote():
 @bp.route('/quotes', methods=['GET'])
 def get_all_quotes():
     """Get all quotes - available for anonymous users"""
-    quotes = Quote.query.filter_by(is_active=True).all()
-    return jsonify({'quotes': [q.to_dict() for q in quotes]}), 200
+    query = Quote.query.filter_by(is_active=True)
+    etag = make_etag('student-quotes', *Quote.fingerprint(query))
+    return conditional_json(etag, lambda: {'quotes': [q.to_dict() for q in query.all()]})
@@ -6,25 +6,19 @@ from app.models.classroom import Classroom
 from app.models.module import Module, Word
 from app.models.progress import StudentProgress, QuestionProgress, BatteryProgress
 from app.services.export_service import ExportService
+from app.services.progress_service import ProgressService
+from app.services.job_service import JobService
+from app.utils.jobs import async_requested, job_accepted
 from datetime import datetime
 from sqlalchemy import func
-from sqlalchemy.orm import joinedload
 
 bp = Blueprint('teacher', __name__, url_prefix='/api/teacher')
 
 
-@bp.route('/classrooms', methods=['GET'])
-@jwt_required()
-def get_classrooms():
-    """Get all classrooms for the teacher"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-
-    if not user or user.role != 'teacher':
-        return jsonify({'error': 'Access denied'}), 403
-
+def get_accessible_classrooms(user):
+    """Classrooms of the teacher: directly assigned ones plus all classrooms of their school"""
     # Get classrooms where user is directly assigned as teacher
-    classrooms = Classroom.query.filter_by(teacher_id=user_id).all()
+    classrooms = Classroom.query.filter_by(teacher_id=user.id).all()
 
     # If teacher has a teacher code, get ALL classrooms from that school
     if user.teacher_code:
@@ -39,6 +33,26 @@ def get_classrooms():
                 if classroom.id not in classroom_ids:
                     classrooms.append(classroom)
 
+    return classrooms
+
+
+def has_classroom_access(user, classroom):
+    """Whether the teacher may see the classroom: directly assigned or in their school"""
+    return any(accessible.id == classroom.id for accessible in get_accessible_classrooms(user))
+
+
+@bp.route('/classrooms', methods=['GET'])
+@jwt_required()
+def get_classrooms():
+    """Get all classrooms for the teacher"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+
+    if not user or user.role != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+
+    classrooms = get_accessible_classrooms(user)
+
     # Add student count to classroom dict
     result = []
     for classroom in classrooms:
@@ -76,81 +90,8 @@ def get_classroom_progress(classroom_id):
     if not has_access:
         return jsonify({'error': 'Access denied to this classroom'}), 403
 
-    # Get all students in classroom (sorted alphabetically by email)
-    students = User.query.filter_by(classroom_id=classroom_id).order_by(User.email).all()
-
-    # Get all active modules (sorted by display_order)
-    modules = Module.query.filter_by(is_active=True).order_by(Module.display_order).all()
-
-    # Pre-fetch word counts for all modules (single query)
-    module_word_counts = {}
-    for module in modules:
-        count = Word.query.filter_by(module_id=module.id).count()
-        module_word_counts[module.id] = count
-
-    # Get all student IDs
-    student_ids = [s.id for s in students]
-
-    # Pre-fetch all progress records with eager loading (single query with joins)
-    all_progress = StudentProgress.query.options(
-        joinedload(StudentProgress.battery_progress).joinedload(BatteryProgress.question_progress)
-    ).filter(
-        StudentProgress.user_id.in_(student_ids)
-    ).all()
-
-    # Organize progress by student_id and module_id
-    progress_lookup = {}
-    for progress in all_progress:
-        if progress.user_id not in progress_lookup:
-            progress_lookup[progress.user_id] = {}
-        progress_lookup[progress.user_id][progress.module_id] = progress
-
-    # Build matrix data structure
-    matrix = []
-    for student in students:
-        student_row = {
-            'student_id': student.id,
-            'student_email': student.email,
-            'student_first_name': student.first_name,
-            'student_last_name': student.last_name,
-            'modules': {}
-        }
-
-        # Get progress records for this student from pre-fetched data
-        student_progress = progress_lookup.get(student.id, {})
-
-        # For each module, add progress data
-        for module in modules:
-            if module.id in student_progress:
-                progress = student_progress[module.id]
-                total_words = module_word_counts[module.id]
-
-                # Count unique words answered (data already loaded via eager loading)
-                answered_word_ids = set()
-                for bp in progress.battery_progress:
-                    for q in bp.question_progress:
-                        if q.word_id:
-                            answered_word_ids.add(q.word_id)
-
-                answered_words = len(answered_word_ids)
-
-                # Calculate completion percentage
-                completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
-
-                student_row['modules'][module.id] = {
-                    'completion_percentage': round(completion_percentage, 1),
-                    'answered_words': answered_words,
-                    'total_words': total_words
-                }
-            # If module not started, modules[module.id] will not exist (empty cell)
-
-        matrix.append(student_row)
-
-    # Return matrix with module info
-    return jsonify({
-        'students': matrix,
-        'modules': [{'id': m.id, 'name': m.name} for m in modules]
-    }), 200
+    # Matrix is computed with aggregate queries (constant query count)
+    return jsonify(ProgressService.get_classroom_matrix(classroom_id)), 200
 
 
 @bp.route('/student/<int:student_id>/module/<int:module_id>/detail', methods=['GET'])
@@ -196,37 +137,23 @@ def get_student_module_detail(student_id, module_id):
         return jsonify({'error': 'No progress found for this student and module'}), 404
 
     # Get total words in module
-    from app.models.module import Word
-    total_words = Word.query.filter_by(module_id=module_id).count()
-
-    # Get all question attempts for this progress
-    question_progress = []
-    answered_word_ids = set()
-    for bp in progress.battery_progress:
-        questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-        for q in questions:
-            question_progress.append(q.to_dict())
-            if q.word_id:
-                answered_word_ids.add(q.word_id)
-
-    answered_words = len(answered_word_ids)
-
-    # Calculate statistics
-    total_questions = len(question_progress)
-    correct_questions = sum(1 for q in question_progress if q['is_correct'])
-    score = (correct_questions / total_questions * 100) if total_questions > 0 else 0
-    completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
+    total_words = module.word_count or 0
+
+    # Statistics come from the materialized summary, attempts from one joined query
+    summary = ProgressService.get_summary(student_id, module_id)
+    stats = summary.to_dict(total_words)
+    question_progress = ProgressService.get_question_progress(progress.id)
 
     return jsonify({
         'student': student.to_dict(),
         'module': module.to_dict(),
         'progress': {
-            'completion_percentage': round(completion_percentage, 1),
-            'answered_words': answered_words,
+            'completion_percentage': round(stats['completion_percentage'], 1),
+            'answered_words': stats['answered_words'],
             'total_words': total_words,
-            'score': round(score, 2),
-            'correct_questions': correct_questions,
-            'total_questions': total_questions,
+            'score': round(stats['score'], 2),
+            'correct_questions': stats['correct_questions'],
+            'total_questions': stats['total_questions'],
             'is_completed': progress.is_completed,
             'completion_date': progress.completion_date.isoformat() if progress.completion_date else None,
             'time_spent': progress.total_time_spent
@@ -278,10 +205,7 @@ def get_student_detail(student_id):
         module = Module.query.get(progress.module_id)
 
         # Get all question attempts
-        question_progress = []
-        for bp in progress.battery_progress:
-            questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-            question_progress.extend([q.to_dict() for q in questions])
+        question_progress = ProgressService.get_question_progress(progress.id)
 
         result['modules'].append({
             'module': module.to_dict(),
@@ -499,10 +423,76 @@ def export_classroom_excel(classroom_id):
     if not has_access:
         return jsonify({'error': 'Access denied to this classroom'}), 403
 
-    # Generate Excel file
-    file_path = ExportService.export_classroom_to_excel(classroom_id)
+    if async_requested():
+        return job_accepted(JobService.submit('export_classroom_excel', {'classroom_id': classroom_id}, user_id))
+
+    # Generate the whole Excel file first (in memory, or an anonymous temp file when large), then send it
+    output = ExportService.export_classroom_to_excel(classroom_id)
 
-    return send_file(file_path, as_attachment=True, download_name=f'classroom_{classroom_id}_progress.xlsx')
+    return send_file(output, as_attachment=True, download_name=f'classroom_{classroom_id}_progress.xlsx')
+
+
+@bp.route('/classrooms/export', methods=['GET'])
+@jwt_required()
+def export_all_classrooms():
+    """Export all accessible classrooms: one workbook with a sheet per classroom, or a ZIP (?format=zip)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+
+    if not user or user.role != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+
+    export_format = request.args.get('format', 'xlsx')
+    if export_format not in ('xlsx', 'zip'):
+        return jsonify({'error': 'Format must be xlsx or zip'}), 400
+
+    classrooms = get_accessible_classrooms(user)
+    if not classrooms:
+        return jsonify({'error': 'No classrooms found'}), 404
+
+    classroom_ids = [c.id for c in classrooms]
+    if async_requested():
+        return job_accepted(JobService.submit('export_classrooms', {'classroom_ids': classroom_ids, 'format': export_format}, user_id))
+
+    if export_format == 'zip':
+        output = ExportService.export_classrooms_to_zip(classrooms)
+    else:
+        output = ExportService.export_classrooms_to_excel(classrooms)
+
+    return send_file(output, as_attachment=True, download_name=f'classrooms_progress.{export_format}')
+
+
+@bp.route('/classroom/<int:classroom_id>/export/pdf', methods=['GET'])
+@jwt_required()
+def export_classroom_pdf(classroom_id):
+    """Export the reports of all students in a classroom: one PDF, or a ZIP per student (?format=zip)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+
+    if not user or user.role != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+
+    classroom = Classroom.query.get(classroom_id)
+    if not classroom:
+        return jsonify({'error': 'Classroom not found'}), 404
+
+    # Directly assigned or via school through teacher code
+    if not has_classroom_access(user, classroom):
+        return jsonify({'error': 'Access denied to this classroom'}), 403
+
+    export_format = request.args.get('format', 'pdf')
+    if export_format not in ('pdf', 'zip'):
+        return jsonify({'error': 'Format must be pdf or zip'}), 400
+
+    if async_requested():
+        return job_accepted(JobService.submit('export_classroom_pdf', {
+            'classroom_id': classroom_id,
+            'format': export_format
+        }, user_id))
+
+    output = ExportService.export_classroom_to_pdf(classroom_id, as_zip=export_format == 'zip')
+
+    return send_file(output, as_attachment=True, download_name=f'classroom_{classroom_id}_reports.{export_format}')
 
 
 @bp.route('/student/<int:student_id>/export/pdf', methods=['GET'])
@@ -535,7 +525,10 @@ def export_student_pdf(student_id):
     if not has_access:
         return jsonify({'error': 'Access denied'}), 403
 
-    # Generate PDF file
-    file_path = ExportService.export_student_to_pdf(student_id)
+    if async_requested():
+        return job_accepted(JobService.submit('export_student_pdf', {'student_id': student_id}, user_id))
+
+    # Generate PDF file (rendered in the PDF process pool, nothing is kept on disk)
+    output = ExportService.export_student_to_pdf(student_id)
 
-    return send_file(file_path, as_attachment=True, download_name=f'student_{student_id}_report.pdf')
+    return send_file(output, as_attachment=True, download_name=f'student_{student_id}_report.pdf')
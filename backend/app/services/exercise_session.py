@@ -0,0 +1,109 @@
+"""Signed, stateless exercise sessions for anonymous play of free modules"""
+import random
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+class ExerciseSession:
+    """
+    Progress of an anonymous student through a free module.
+
+    Nothing is stored on the server: the state (module version, battery order,
+    current battery, phase and question queue) travels in a signed token that
+    the client sends back with every step. The signature stops clients from
+    skipping phases or answering words that are not next in the queue; the
+    module version makes tokens from before a content change invalid.
+
+    Accepted limitation: without server state an earlier token cannot be
+    told apart from the current one, so a client can replay the token from
+    before a wrong answer to undo it (until the token expires). Anonymous
+    play records nothing, so a replay only affects the player's own session.
+    """
+
+    SALT = 'octovoc-exercise-session'
+
+    def __init__(self, module_id, version, battery_order, battery_index=0, phase=1, queue=None):
+        self.module_id = module_id
+        self.version = version
+        self.battery_order = battery_order
+        self.battery_index = battery_index
+        self.phase = phase
+        self.queue = queue or []
+
+    @classmethod
+    def start(cls, content):
+        """New session for a CachedModule, with the batteries in random order"""
+        battery_order = list(content.batteries)
+        random.shuffle(battery_order)
+        return cls(content.id, content.version, battery_order)
+
+    @classmethod
+    def from_token(cls, token):
+        """Load a session from its token; None if it is missing, forged or expired"""
+        if not token:
+            return None
+
+        try:
+            state = cls._serializer().loads(
+                token,
+                max_age=current_app.config.get('EXERCISE_SESSION_MAX_AGE', 86400)
+            )
+            return cls(*state)
+        except (BadSignature, TypeError, ValueError):
+            return None
+
+    def to_token(self):
+        return self._serializer().dumps([
+            self.module_id,
+            self.version,
+            self.battery_order,
+            self.battery_index,
+            self.phase,
+            self.queue
+        ])
+
+    @property
+    def current_battery_id(self):
+        if self.battery_index < len(self.battery_order):
+            return self.battery_order[self.battery_index]
+        return None
+
+    def matches(self, content):
+        """Whether the session belongs to this version of the module"""
+        return content is not None and content.id == self.module_id and content.version == self.version
+
+    def start_battery(self, content):
+        """Begin phase 1 of the current battery with its words shuffled"""
+        self.phase = 1
+        self.queue = self._shuffled(content.batteries[self.current_battery_id])
+
+    def record_answer(self, is_correct, content):
+        """
+        Move the current word out of (correct) or to the back of (wrong) the queue.
+        Returns (phase_complete, battery_complete).
+        """
+        word_id = self.queue.pop(0)
+        if not is_correct:
+            self.queue.append(word_id)
+
+        if self.queue:
+            return False, False
+
+        if self.phase < 3:
+            # Next phase: all battery words again
+            self.phase += 1
+            self.queue = self._shuffled(content.batteries[self.current_battery_id])
+            return True, False
+
+        self.battery_index += 1
+        return True, True
+
+    @staticmethod
+    def _shuffled(word_ids):
+        word_ids = list(word_ids)
+        random.shuffle(word_ids)
+        return word_ids
+
+    @classmethod
+    def _serializer(cls):
+        return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=cls.SALT)
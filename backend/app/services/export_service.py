@@ -1,157 +1,432 @@
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib import colors
+from flask import current_app
+from app import db
 from app.models.user import User
 from app.models.classroom import Classroom
-from app.models.module import Module
-from app.models.progress import StudentProgress, QuestionProgress
-from datetime import datetime
-import os
+from app.models.module import Module, Word
+from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress, ProgressSummary
+from app.services.progress_service import ProgressService
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, groupby
+from operator import itemgetter
+from sqlalchemy import and_, func
+from werkzeug.utils import secure_filename
+from xml.sax.saxutils import escape
+import io
+import multiprocessing
+import re
+import tempfile
+import threading
+import zipfile
 
 
 class ExportService:
+    _render_pool = None
+    _render_pool_lock = threading.Lock()
+
+    # Exports are built completely before the response starts (openpyxl can only write the
+    # xlsx archive once every sheet is done): up to this size in memory, larger ones spill
+    # to an anonymous temp file
+    SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+    PROGRESS_HEADERS = ['Student', 'Module', 'Voortgang (%)', 'Score (%)', 'Juiste antwoorden', 'Totaal vragen', 'Voltooiingsdatum']
+
     @staticmethod
     def export_classroom_to_excel(classroom_id):
-        """Export classroom progress to Excel file"""
+        """
+        Export classroom progress to Excel.
+
+        Returns the finished workbook as a file object positioned at the start
+        (send it with send_file); nothing is left on disk once it is closed.
+        """
         classroom = Classroom.query.get(classroom_id)
         if not classroom:
             raise ValueError('Classroom not found')
 
-        # Create workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Classroom Progress'
+        wb = openpyxl.Workbook(write_only=True)
+        for _, rows in ExportService._progress_rows_by_classroom([classroom]):
+            ExportService._write_progress_sheet(wb, 'Classroom Progress', rows)
+
+        return ExportService._save_workbook(wb)
+
+    @staticmethod
+    def export_classrooms_to_excel(classrooms):
+        """Export the progress of several classrooms to one workbook, one sheet per classroom"""
+        if not classrooms:
+            raise ValueError('No classrooms to export')
+
+        wb = openpyxl.Workbook(write_only=True)
+        titles = set()
+        for classroom, rows in ExportService._progress_rows_by_classroom(classrooms):
+            ExportService._write_progress_sheet(wb, ExportService._sheet_title(classroom.name, titles), rows)
+
+        return ExportService._save_workbook(wb)
+
+    @staticmethod
+    def export_classrooms_to_zip(classrooms):
+        """Export the progress of several classrooms to a ZIP with one workbook per classroom"""
+        if not classrooms:
+            raise ValueError('No classrooms to export')
+
+        output = tempfile.SpooledTemporaryFile(max_size=ExportService.SPOOL_MAX_BYTES)
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for classroom, rows in ExportService._progress_rows_by_classroom(classrooms):
+                wb = openpyxl.Workbook(write_only=True)
+                ExportService._write_progress_sheet(wb, 'Classroom Progress', rows)
+
+                # One classroom workbook at a time is held in memory
+                with ExportService._save_workbook(wb) as workbook_file:
+                    name = secure_filename(classroom.name or '') or 'classroom'
+                    archive.writestr(f'{name}_{classroom.id}_progress.xlsx', workbook_file.read())
+
+        output.seek(0)
+        return output
+
+    @staticmethod
+    def _save_workbook(wb):
+        output = tempfile.SpooledTemporaryFile(max_size=ExportService.SPOOL_MAX_BYTES)
+        wb.save(output)
+        output.seek(0)
+        return output
 
-        # Headers
-        headers = ['Student', 'Module', 'Voortgang (%)', 'Score (%)', 'Juiste antwoorden', 'Totaal vragen', 'Voltooiingsdatum']
-        ws.append(headers)
+    @staticmethod
+    def _sheet_title(name, used_titles):
+        """Unique, valid worksheet title (max 31 characters, no []:*?/\\) for a classroom name"""
+        base = re.sub(r'[\[\]:*?/\\]', '-', name or '').strip()[:31] or 'Klas'
+        title = base
+        number = 2
+        while title.lower() in used_titles:
+            suffix = f' ({number})'
+            title = base[:31 - len(suffix)] + suffix
+            number += 1
+
+        used_titles.add(title.lower())
+        return title
 
-        # Style headers
+    @staticmethod
+    def _progress_rows_by_classroom(classrooms):
+        """
+        Yield (classroom, rows) for each classroom (by id), where rows holds one
+        progress row per (student, module) of that classroom.
+
+        All rows come from a single query over StudentProgress, User, Module and
+        ProgressSummary, read in chunks. The longest email and module name per
+        classroom ride along as window aggregates, so column widths are known
+        from the first row of a sheet before it is written. Summaries missing
+        for older progress are computed, not stored. Each rows iterator must be
+        consumed before the next classroom is requested.
+        """
+        classrooms = sorted(classrooms, key=lambda c: c.id)
+        student_filter = User.classroom_id.in_([c.id for c in classrooms])
+        missing = ProgressService.missing_summaries(student_filter)
+
+        rows = db.session.query(
+            User.classroom_id,
+            User.email,
+            Module.name,
+            Module.word_count,
+            StudentProgress.completion_date,
+            ProgressSummary.answered_words,
+            ProgressSummary.correct_questions,
+            ProgressSummary.total_questions,
+            func.max(func.length(User.email)).over(partition_by=User.classroom_id),
+            func.max(func.length(Module.name)).over(partition_by=User.classroom_id),
+            StudentProgress.user_id,
+            StudentProgress.module_id
+        ).select_from(StudentProgress).join(
+            User, User.id == StudentProgress.user_id
+        ).join(
+            Module, Module.id == StudentProgress.module_id
+        ).outerjoin(
+            ProgressSummary, and_(
+                ProgressSummary.user_id == StudentProgress.user_id,
+                ProgressSummary.module_id == StudentProgress.module_id
+            )
+        ).filter(
+            student_filter
+        ).order_by(
+            User.classroom_id, User.id, StudentProgress.id
+        ).yield_per(500)
+
+        if missing:
+            rows = ExportService._fill_missing_summaries(rows, missing)
+
+        groups = groupby(rows, key=itemgetter(0))
+        group = next(groups, None)
+
+        for classroom in classrooms:
+            if group and group[0] == classroom.id:
+                yield classroom, group[1]
+                group = next(groups, None)
+            else:
+                # Classroom without any progress: header-only sheet
+                yield classroom, iter(())
+
+    @staticmethod
+    def _fill_missing_summaries(rows, missing):
+        """Put computed summary values in progress rows without a ProgressSummary row"""
+        for row in rows:
+            summary = missing.get((row[10], row[11]))
+            if summary:
+                row = row[:5] + (summary.answered_words, summary.correct_questions, summary.total_questions) + row[8:]
+            yield row
+
+    @staticmethod
+    def _write_progress_sheet(wb, title, rows):
+        """Write progress rows (see _progress_rows_by_classroom) into a new write-only sheet as they are read"""
+        ws = wb.create_sheet(title)
+        first = next(rows, None)
+
+        # Column widths: longest value (text columns) or header, capped at 50
+        widths = [len(header) for header in ExportService.PROGRESS_HEADERS]
+        if first:
+            widths[0] = max(widths[0], first[8] or 0)
+            widths[1] = max(widths[1], first[9] or 0)
+        for index, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(index)].width = min(width + 2, 50)
+
+        # Styled header row
         header_fill = PatternFill(start_color='000000', end_color='000000', fill_type='solid')
         header_font = Font(bold=True, color='FFFFFF')
-
-        for cell in ws[1]:
+        header_cells = []
+        for header in ExportService.PROGRESS_HEADERS:
+            cell = WriteOnlyCell(ws, value=header)
             cell.fill = header_fill
             cell.font = header_font
             cell.alignment = Alignment(horizontal='center')
-
-        # Get students
-        students = User.query.filter_by(classroom_id=classroom_id).all()
-
-        for student in students:
-            progress_records = StudentProgress.query.filter_by(user_id=student.id).all()
-
-            for progress in progress_records:
-                module = Module.query.get(progress.module_id)
-
-                # Get total words in module
-                from app.models.module import Word
-                total_words = Word.query.filter_by(module_id=module.id).count()
-
-                # Calculate score and track answered words
-                total_questions = 0
-                correct_questions = 0
-                answered_word_ids = set()
-
-                for bp in progress.battery_progress:
-                    questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-                    total_questions += len(questions)
-                    correct_questions += len([q for q in questions if q.is_correct])
-
-                    # Track unique words answered
-                    for q in questions:
-                        if q.word_id:
-                            answered_word_ids.add(q.word_id)
-
-                answered_words = len(answered_word_ids)
-
-                # Calculate completion percentage (based on unique words answered)
-                completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
-
-                # Calculate score (based on correct answers)
-                score = (correct_questions / total_questions * 100) if total_questions > 0 else 0
-
-                ws.append([
-                    student.email,
-                    module.name,
-                    round(completion_percentage, 1),
-                    round(score, 1),
-                    correct_questions,
-                    total_questions,
-                    progress.completion_date.strftime('%Y-%m-%d') if progress.completion_date else 'Bezig'
-                ])
-
-        # Auto-size columns
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Save file
-        filename = f'classroom_{classroom_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-
-        filepath = os.path.join(upload_dir, filename)
-        wb.save(filepath)
-
-        return filepath
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        if not first:
+            return ws
+
+        for (_, email, module_name, word_count, completion_date,
+             answered_words, correct_questions, total_questions, _, _, _, _) in chain([first], rows):
+            # Completion (unique words answered) and score (correct answers), as in ProgressSummary.to_dict
+            answered_words = answered_words or 0
+            correct_questions = correct_questions or 0
+            total_questions = total_questions or 0
+            completion_percentage = (answered_words / word_count * 100) if word_count else 0
+            score = (correct_questions / total_questions * 100) if total_questions > 0 else 0
+
+            ws.append([
+                email,
+                module_name,
+                round(completion_percentage, 1),
+                round(score, 1),
+                correct_questions,
+                total_questions,
+                completion_date.strftime('%Y-%m-%d') if completion_date else 'Bezig'
+            ])
+
+        return ws
 
     @staticmethod
     def export_student_to_pdf(student_id):
-        """Export detailed student report to PDF"""
+        """Export detailed student report to PDF; returns a file object positioned at the start"""
         student = User.query.get(student_id)
         if not student:
             raise ValueError('Student not found')
 
-        # Create PDF
-        filename = f'student_{student_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+        reports = ExportService._student_reports([student])
+        (pdf,) = ExportService._render_pdfs([reports])
+
+        return io.BytesIO(pdf)
+
+    @staticmethod
+    def export_classroom_to_pdf(classroom_id, as_zip=False):
+        """
+        Export the reports of all students in a classroom: one multi-page PDF,
+        or a ZIP with one PDF per student (as_zip=True).
+        Returns a file object positioned at the start.
+        """
+        classroom = Classroom.query.get(classroom_id)
+        if not classroom:
+            raise ValueError('Classroom not found')
 
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
+        students = User.query.filter_by(classroom_id=classroom_id).order_by(User.id).all()
+        reports = ExportService._student_reports(students)
 
-        filepath = os.path.join(upload_dir, filename)
+        if not as_zip:
+            (pdf,) = ExportService._render_pdfs([reports])
+            return io.BytesIO(pdf)
 
-        doc = SimpleDocTemplate(filepath, pagesize=A4)
-        story = []
+        # One PDF per student, rendered in parallel by the process pool
+        pdfs = ExportService._render_pdfs([[report] for report in reports])
 
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.black,
-            spaceAfter=30,
-        )
-        heading_style = styles['Heading2']
-        normal_style = styles['Normal']
+        output = tempfile.SpooledTemporaryFile(max_size=ExportService.SPOOL_MAX_BYTES)
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for student, pdf in zip(students, pdfs):
+                archive.writestr(f'student_{student.id}_report.pdf', pdf)
+
+        output.seek(0)
+        return output
+
+    @staticmethod
+    def _student_reports(students):
+        """
+        Collect the report data of the given students as plain dicts (picklable,
+        so rendering can happen in another process).
+
+        Uses a fixed number of queries for any number of students: progress rows
+        joined with their module and summary, and the first ten incorrect
+        answers per module via a window function.
+        """
+        student_ids = [s.id for s in students]
+        if not student_ids:
+            return []
+
+        missing = ProgressService.missing_summaries(User.id.in_(student_ids))
+
+        progress_rows = db.session.query(
+            StudentProgress.id,
+            StudentProgress.user_id,
+            StudentProgress.module_id,
+            StudentProgress.is_completed,
+            StudentProgress.completion_date,
+            Module.name,
+            ProgressSummary.correct_questions,
+            ProgressSummary.total_questions
+        ).join(
+            Module, Module.id == StudentProgress.module_id
+        ).outerjoin(
+            ProgressSummary, and_(
+                ProgressSummary.user_id == StudentProgress.user_id,
+                ProgressSummary.module_id == StudentProgress.module_id
+            )
+        ).filter(
+            StudentProgress.user_id.in_(student_ids)
+        ).order_by(
+            StudentProgress.user_id, StudentProgress.id
+        ).all()
+
+        # First incorrect attempts per module (at most 10), in answer order
+        ranked = db.session.query(
+            BatteryProgress.student_progress_id.label('student_progress_id'),
+            Word.word.label('word'),
+            func.row_number().over(
+                partition_by=BatteryProgress.student_progress_id,
+                order_by=(BatteryProgress.id, QuestionProgress.id)
+            ).label('position')
+        ).select_from(QuestionProgress).join(
+            BatteryProgress, BatteryProgress.id == QuestionProgress.battery_progress_id
+        ).join(
+            StudentProgress, StudentProgress.id == BatteryProgress.student_progress_id
+        ).outerjoin(
+            Word, Word.id == QuestionProgress.word_id
+        ).filter(
+            StudentProgress.user_id.in_(student_ids),
+            QuestionProgress.is_correct == False
+        ).subquery()
+
+        incorrect_words = {}
+        for progress_id, word in db.session.query(ranked.c.student_progress_id, ranked.c.word).filter(
+            ranked.c.position <= 10
+        ).order_by(ranked.c.student_progress_id, ranked.c.position):
+            incorrect_words.setdefault(progress_id, []).append(word if word else 'Unknown')
+
+        modules_by_student = {}
+        for (progress_id, user_id, module_id, is_completed, completion_date,
+             module_name, correct_questions, total_questions) in progress_rows:
+            summary = missing.get((user_id, module_id))
+            if summary:
+                correct_questions, total_questions = summary.correct_questions, summary.total_questions
+            correct_questions = correct_questions or 0
+            total_questions = total_questions or 0
+            modules_by_student.setdefault(user_id, []).append({
+                'name': module_name,
+                'score': (correct_questions / total_questions * 100) if total_questions > 0 else 0,
+                'correct_questions': correct_questions,
+                'total_questions': total_questions,
+                'is_completed': is_completed,
+                'completion_date': completion_date.strftime('%Y-%m-%d') if completion_date else 'N/A',
+                # Unique words, first occurrence first
+                'incorrect_words': list(dict.fromkeys(incorrect_words.get(progress_id, [])))
+            })
+
+        return [{
+            'email': student.email,
+            'role': student.role,
+            'registered': student.created_at.strftime('%Y-%m-%d') if student.created_at else 'N/A',
+            'last_activity': student.last_activity.strftime('%Y-%m-%d') if student.last_activity else 'N/A',
+            'modules': modules_by_student.get(student.id, [])
+        } for student in students]
+
+    @staticmethod
+    def _render_pdfs(report_batches):
+        """
+        Render each batch of student reports to one PDF (bytes), in order.
+
+        reportlab is CPU-bound, so rendering runs in a process pool of
+        PDF_RENDER_WORKERS processes and the web worker stays responsive.
+        PDF_RENDER_WORKERS=0 renders in this process.
+        """
+        workers = current_app.config.get('PDF_RENDER_WORKERS', 1)
+        if workers <= 0:
+            return [render_student_reports(reports) for reports in report_batches]
+
+        try:
+            return list(ExportService._get_render_pool(workers).map(render_student_reports, report_batches))
+        except BrokenProcessPool:
+            # A render process died (e.g. killed for memory); start a fresh pool next time
+            print("PDF render pool broken, rendering in-process")
+            ExportService._render_pool = None
+            return [render_student_reports(reports) for reports in report_batches]
+
+    @staticmethod
+    def _get_render_pool(workers):
+        with ExportService._render_pool_lock:
+            if ExportService._render_pool is None:
+                # spawn: never fork a process holding database connections and threads
+                ExportService._render_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return ExportService._render_pool
+
+
+def render_student_reports(reports):
+    """Render student reports (see ExportService._student_reports) to PDF bytes, one or more pages per student"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.black,
+        spaceAfter=30,
+    )
+    heading_style = styles['Heading2']
+    normal_style = styles['Normal']
+
+    for index, report in enumerate(reports):
+        if index > 0:
+            story.append(PageBreak())
 
         # Title
-        title = Paragraph(f'Student Progress Report: {student.email}', title_style)
+        title = Paragraph(f'Student Progress Report: {escape(report["email"])}', title_style)
         story.append(title)
         story.append(Spacer(1, 0.5 * cm))
 
         # Student info
         info = [
-            ['Email:', student.email],
-            ['Role:', student.role],
-            ['Registered:', student.created_at.strftime('%Y-%m-%d') if student.created_at else 'N/A'],
-            ['Last Activity:', student.last_activity.strftime('%Y-%m-%d') if student.last_activity else 'N/A']
+            ['Email:', report['email']],
+            ['Role:', report['role']],
+            ['Registered:', report['registered']],
+            ['Last Activity:', report['last_activity']]
         ]
 
         info_table = Table(info, colWidths=[4 * cm, 12 * cm])
@@ -169,59 +444,44 @@ class ExportService:
         story.append(Paragraph('Module Progress', heading_style))
         story.append(Spacer(1, 0.5 * cm))
 
-        progress_records = StudentProgress.query.filter_by(user_id=student_id).all()
-
-        if not progress_records:
+        if not report['modules']:
             story.append(Paragraph('No progress records found.', normal_style))
-        else:
-            for progress in progress_records:
-                module = Module.query.get(progress.module_id)
-
-                # Module name
-                story.append(Paragraph(f'<b>{module.name}</b>', normal_style))
-
-                # Calculate statistics
-                total_questions = 0
-                correct_questions = 0
-                incorrect_words = []
-
-                for bp in progress.battery_progress:
-                    questions = QuestionProgress.query.filter_by(battery_progress_id=bp.id).all()
-                    total_questions += len(questions)
-
-                    for q in questions:
-                        if q.is_correct:
-                            correct_questions += 1
-                        else:
-                            incorrect_words.append(q.word.word if q.word else 'Unknown')
-
-                score = (correct_questions / total_questions * 100) if total_questions > 0 else 0
-
-                # Progress table
-                progress_data = [
-                    ['Score:', f'{round(score, 2)}%'],
-                    ['Questions:', f'{correct_questions}/{total_questions}'],
-                    ['Status:', 'Completed' if progress.is_completed else 'In Progress'],
-                    ['Completion Date:', progress.completion_date.strftime('%Y-%m-%d') if progress.completion_date else 'N/A']
-                ]
-
-                progress_table = Table(progress_data, colWidths=[4 * cm, 10 * cm])
-                progress_table.setStyle(TableStyle([
-                    ('FONT', (0, 0), (-1, -1), 'Helvetica', 9),
-                    ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 9),
-                    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-                ]))
-                story.append(progress_table)
-
-                # Incorrect words
-                if incorrect_words:
-                    story.append(Spacer(1, 0.3 * cm))
-                    story.append(Paragraph(f'<b>Incorrect words:</b> {", ".join(set(incorrect_words[:10]))}', normal_style))
-
-                story.append(Spacer(1, 0.7 * cm))
-
-        # Build PDF
-        doc.build(story)
-
-        return filepath
+
+        for module in report['modules']:
+            # Module name
+            story.append(Paragraph(f'<b>{escape(module["name"])}</b>', normal_style))
+
+            # Progress table
+            progress_data = [
+                ['Score:', f'{round(module["score"], 2)}%'],
+                ['Questions:', f'{module["correct_questions"]}/{module["total_questions"]}'],
+                ['Status:', 'Completed' if module['is_completed'] else 'In Progress'],
+                ['Completion Date:', module['completion_date']]
+            ]
+
+            progress_table = Table(progress_data, colWidths=[4 * cm, 10 * cm])
+            progress_table.setStyle(TableStyle([
+                ('FONT', (0, 0), (-1, -1), 'Helvetica', 9),
+                ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 9),
+                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ]))
+            story.append(progress_table)
+
+            # Incorrect words
+            if module['incorrect_words']:
+                story.append(Spacer(1, 0.3 * cm))
+                story.append(Paragraph(
+                    f'<b>Incorrect words:</b> {escape(", ".join(module["incorrect_words"]))}',
+                    normal_style
+                ))
+
+            story.append(Spacer(1, 0.7 * cm))
+
+    if not story:
+        story.append(Paragraph('No students found.', normal_style))
+
+    # Build PDF
+    doc.build(story)
+
+    return buffer.getvalue()
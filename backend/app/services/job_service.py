@@ -0,0 +1,348 @@
+"""Background jobs: a DB-backed queue run by an in-process thread pool or by run_jobs.py"""
+import os
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from app import db
+from app.models.job import Job
+
+
+class JobService:
+    """
+    Jobs are rows in the jobs table; any process can run them.
+
+    - JOB_RUNNER='thread' (default): submit() also hands the job to a small
+      ThreadPoolExecutor in the web process, so no extra service is needed.
+      A recovery thread (start()) picks up jobs left behind by a restart.
+    - JOB_RUNNER='worker': the web process only enqueues and run_jobs.py
+      picks up queued jobs.
+
+    A job is claimed with a conditional UPDATE (queued -> running), so it
+    never runs twice even when threads and a worker poll the same table.
+    """
+
+    _handlers = {}
+    _executor = None
+    _executor_lock = threading.Lock()
+    _recovery_thread = None
+    _start_lock = threading.Lock()
+
+    @classmethod
+    def handler(cls, job_type):
+        """Register a function handler(job, progress) -> result dict for a job type"""
+        def register(func):
+            cls._handlers[job_type] = func
+            return func
+        return register
+
+    @classmethod
+    def submit(cls, job_type, params=None, user_id=None, input_data=None):
+        """Queue a job (and start it in this process when JOB_RUNNER='thread')"""
+        if job_type not in cls._handlers:
+            raise ValueError(f'Unknown job type: {job_type}')
+
+        job = Job(
+            job_type=job_type,
+            status='queued',
+            params=params or {},
+            input_data=input_data,
+            progress=0,
+            created_by=int(user_id) if user_id else None
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        cls.purge_finished()
+
+        if current_app.config.get('JOB_RUNNER', 'thread') == 'thread':
+            app = current_app._get_current_object()
+            cls.start(app)
+            cls._get_executor(app).submit(cls._run_in_app, app, job.id)
+
+        return job
+
+    @classmethod
+    def start(cls, app):
+        """Start the recovery thread of this process (once, only with JOB_RUNNER='thread')"""
+        if app.config.get('JOB_RUNNER', 'thread') != 'thread':
+            return
+
+        with cls._start_lock:
+            if cls._recovery_thread:
+                return
+
+            cls._recovery_thread = threading.Thread(
+                target=cls._recover_forever,
+                args=(app,),
+                name='octovoc-job-recovery',
+                daemon=True
+            )
+            cls._recovery_thread.start()
+
+    @classmethod
+    def recover(cls, app):
+        """
+        Fail jobs left 'running' by a stopped process (after JOB_STALE_MINUTES) and
+        hand queued jobs nobody picked up to this process' executor.
+        Returns (failed, requeued).
+        """
+        stale = cls.fail_stale(app.config.get('JOB_STALE_MINUTES', 60))
+
+        # Jobs submitted moments ago are still on their way to an executor
+        cutoff = datetime.utcnow() - timedelta(seconds=app.config.get('JOB_RECOVERY_SECONDS', 60))
+        job_ids = [
+            job_id for (job_id,) in db.session.query(Job.id)
+            .filter(Job.status == 'queued', Job.created_at < cutoff)
+            .order_by(Job.created_at)
+            .all()
+        ]
+        db.session.commit()
+
+        # run_job claims the job first, so a job queued in several places still runs once
+        executor = cls._get_executor(app)
+        for job_id in job_ids:
+            executor.submit(cls._run_in_app, app, job_id)
+
+        return stale, len(job_ids)
+
+    @classmethod
+    def run_job(cls, job_id):
+        """Claim and run a queued job. Returns False if another runner already claimed it."""
+        if not cls._claim(job_id):
+            return False
+
+        job = db.session.get(Job, job_id)
+        handler = cls._handlers.get(job.job_type)
+
+        try:
+            if not handler:
+                raise ValueError(f'Unknown job type: {job.job_type}')
+
+            result = handler(job, lambda done, total: cls._report(job_id, done, total))
+
+            job = db.session.get(Job, job_id)
+            job.result = result
+            job.status = 'succeeded'
+            job.progress = 100
+        except Exception as e:
+            db.session.rollback()
+            print(f"Job {job_id} ({job.job_type}) failed: {str(e)}")
+            traceback.print_exc()
+
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+
+        job.finished_at = datetime.utcnow()
+        job.input_data = None  # Uploaded files are not needed after the run
+        db.session.commit()
+        return True
+
+    @classmethod
+    def run_pending(cls, limit=10):
+        """Run up to `limit` queued jobs, oldest first. Returns the number of jobs run."""
+        job_ids = [
+            job_id for (job_id,) in db.session.query(Job.id)
+            .filter(Job.status == 'queued')
+            .order_by(Job.created_at)
+            .limit(limit)
+            .all()
+        ]
+        db.session.commit()
+
+        return sum(1 for job_id in job_ids if cls.run_job(job_id))
+
+    @classmethod
+    def fail_stale(cls, minutes):
+        """Mark jobs stuck in 'running' (e.g. the process died) as failed"""
+        cutoff = datetime.utcnow() - timedelta(minutes=minutes)
+        result = db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', Job.started_at < cutoff)
+            .values(status='failed', error='Job did not finish (worker stopped)', finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def purge_finished(cls):
+        """Delete finished jobs (and their result files) older than JOB_RETENTION_DAYS"""
+        days = current_app.config.get('JOB_RETENTION_DAYS', 7)
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        Job.query.filter(
+            Job.status.in_(['succeeded', 'failed']),
+            Job.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def _claim(cls, job_id):
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'queued')
+            .values(status='running', started_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @classmethod
+    def _report(cls, job_id, done, total):
+        """Store job progress on its own connection, so the job's transaction stays open"""
+        # SQLite allows a single writer: the job's own transaction would block this update
+        if db.engine.dialect.name == 'sqlite':
+            return
+
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(Job).where(Job.id == job_id).values(progress=int(done * 100 / total) if total else 0)
+                )
+        except Exception as e:
+            print(f"Could not report progress of job {job_id}: {str(e)}")
+
+    @classmethod
+    def _get_executor(cls, app):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=app.config.get('JOB_WORKERS', 2),
+                    thread_name_prefix='octovoc-job'
+                )
+            return cls._executor
+
+    @classmethod
+    def _run_in_app(cls, app, job_id):
+        with app.app_context():
+            cls.run_job(job_id)
+
+    @classmethod
+    def _recover_forever(cls, app):
+        # Right away (jobs of a previous run) and then every JOB_RECOVERY_SECONDS
+        while True:
+            with app.app_context():
+                try:
+                    stale, requeued = cls.recover(app)
+                    if stale or requeued:
+                        print(f"Job recovery: {stale} stale jobs failed, {requeued} queued jobs started")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Job recovery error: {str(e)}")
+                    traceback.print_exc()
+
+            time.sleep(app.config.get('JOB_RECOVERY_SECONDS', 60))
+
+
+# ===== Job handlers =====
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+@JobService.handler('export_classroom_excel')
+def _export_classroom_excel(job, progress):
+    from app.services.export_service import ExportService
+    classroom_id = job.params['classroom_id']
+    with ExportService.export_classroom_to_excel(classroom_id) as output:
+        job.set_result_file(output.read(), f'classroom_{classroom_id}_progress.xlsx', XLSX_MIMETYPE)
+    return None
+
+
+@JobService.handler('export_classrooms')
+def _export_classrooms(job, progress):
+    from app.models.classroom import Classroom
+    from app.services.export_service import ExportService
+    classrooms = Classroom.query.filter(Classroom.id.in_(job.params['classroom_ids'])).all()
+
+    if job.params.get('format') == 'zip':
+        with ExportService.export_classrooms_to_zip(classrooms) as output:
+            job.set_result_file(output.read(), 'classrooms_progress.zip', 'application/zip')
+    else:
+        with ExportService.export_classrooms_to_excel(classrooms) as output:
+            job.set_result_file(output.read(), 'classrooms_progress.xlsx', XLSX_MIMETYPE)
+    return None
+
+
+@JobService.handler('export_student_pdf')
+def _export_student_pdf(job, progress):
+    from app.services.export_service import ExportService
+    student_id = job.params['student_id']
+    output = ExportService.export_student_to_pdf(student_id)
+    job.set_result_file(output.getvalue(), f'student_{student_id}_report.pdf', 'application/pdf')
+    return None
+
+
+@JobService.handler('export_classroom_pdf')
+def _export_classroom_pdf(job, progress):
+    from app.services.export_service import ExportService
+    classroom_id = job.params['classroom_id']
+
+    if job.params.get('format') == 'zip':
+        with ExportService.export_classroom_to_pdf(classroom_id, as_zip=True) as output:
+            job.set_result_file(output.read(), f'classroom_{classroom_id}_reports.zip', 'application/zip')
+    else:
+        output = ExportService.export_classroom_to_pdf(classroom_id)
+        job.set_result_file(output.getvalue(), f'classroom_{classroom_id}_reports.pdf', 'application/pdf')
+    return None
+
+
+@JobService.handler('delete_module')
+def _delete_module(job, progress):
+    from app.services.module_service import ModuleService
+    ModuleService.delete_module(job.params['module_id'], progress=progress)
+    return {'message': 'Module permanently deleted'}
+
+
+@JobService.handler('cleanup_inactive_users')
+def _cleanup_inactive_users(job, progress):
+    from app.services.user_service import UserService
+    count = UserService.delete_inactive_users(progress=progress)
+    return {'message': f'{count} inactive users deleted', 'count': count}
+
+
+@JobService.handler('bulk_delete_users')
+def _bulk_delete_users(job, progress):
+    from app.services.user_service import UserService
+    count = UserService.bulk_delete_users(job.params['user_ids'], progress=progress)
+    return {'message': f'{count} users deleted', 'count': count}
+
+
+@JobService.handler('import_module_excel')
+def _import_module_excel(job, progress):
+    from app.services.module_service import ModuleService
+    params = job.params
+
+    # The upload is stored on the job, so any process can run the import
+    fd, filepath = tempfile.mkstemp(suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(job.input_data)
+
+        if params.get('all_sheets'):
+            modules = ModuleService.create_modules_from_excel(
+                filepath,
+                difficulty=params.get('difficulty', ''),
+                level=params.get('level', 1),
+                is_free=params.get('is_free', False)
+            )
+            return {
+                'message': f'{len(modules)} modules created successfully',
+                'modules': [m.to_dict() for m in modules]
+            }
+
+        module = ModuleService.create_module_from_excel(
+            filepath,
+            name=params['name'],
+            difficulty=params.get('difficulty', ''),
+            level=params.get('level', 1),
+            is_free=params.get('is_free', False)
+        )
+        return {
+            'message': 'Module created successfully',
+            'module': module.to_dict()
+        }
+    finally:
+        os.remove(filepath)
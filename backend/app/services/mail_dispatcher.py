@@ -0,0 +1,258 @@
+"""Email outbox: messages are stored first, then sent by a few dispatcher threads"""
+import smtplib
+import threading
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message, sanitize_address, sanitize_addresses
+from sqlalchemy import update
+from app import db
+from app.models.outbox import OutboxEmail
+
+
+class MailDispatcher:
+    """
+    Sends queued OutboxEmail rows.
+
+    - enqueue() stores the message (so it survives a worker restart) and
+      wakes the dispatcher; callers never touch SMTP.
+    - MAIL_DISPATCH_WORKERS threads per process send due emails in batches
+      over one SMTP connection per batch (with MAIL_TIMEOUT on the socket).
+    - Failed sends are retried with exponential backoff, up to
+      MAIL_MAX_ATTEMPTS attempts.
+
+    Each email is claimed right before it is sent, with a conditional UPDATE
+    and a lease covering one send, so several processes can share the
+    outbox; a lease that expires (the process died while sending) puts the
+    email back in the queue.
+    """
+
+    # Added to the worst case of one send (see _lease_seconds)
+    LEASE_MARGIN_SECONDS = 60
+
+    _wakeup = threading.Event()
+    _threads = []
+    _start_lock = threading.Lock()
+
+    @classmethod
+    def enqueue(cls, msg):
+        """Store a flask_mail Message in the outbox and wake the dispatcher"""
+        email = cls._from_message(msg)
+        db.session.add(email)
+        db.session.commit()
+
+        cls.start(current_app._get_current_object())
+        cls._wakeup.set()
+        return email
+
+    @classmethod
+    def enqueue_many(cls, messages):
+        """Store many messages in one transaction (e.g. bulk onboarding mails)"""
+        db.session.add_all([cls._from_message(msg) for msg in messages])
+        db.session.commit()
+
+        cls.start(current_app._get_current_object())
+        cls._wakeup.set()
+        return len(messages)
+
+    @classmethod
+    def start(cls, app):
+        """Start the dispatcher threads of this process (once)"""
+        with cls._start_lock:
+            if cls._threads:
+                return
+
+            for number in range(max(app.config.get('MAIL_DISPATCH_WORKERS', 1), 1)):
+                thread = threading.Thread(
+                    target=cls._run,
+                    args=(app,),
+                    name=f'octovoc-mail-{number}',
+                    daemon=True
+                )
+                thread.start()
+                cls._threads.append(thread)
+
+    @classmethod
+    def dispatch_batch(cls):
+        """Send up to MAIL_BATCH_SIZE due emails over one SMTP connection. Returns the number handled."""
+        now = datetime.utcnow()
+        batch_size = current_app.config.get('MAIL_BATCH_SIZE', 50)
+
+        # Expired leases: the process sending them stopped
+        db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.status == 'sending', OutboxEmail.next_attempt_at < now)
+            .values(status='queued')
+        )
+
+        due_ids = [
+            email_id for (email_id,) in db.session.query(OutboxEmail.id)
+            .filter(OutboxEmail.status == 'queued', OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.id)
+            .limit(batch_size)
+            .all()
+        ]
+
+        db.session.commit()
+
+        suppress = current_app.extensions['mail'].suppress
+        connection = None
+        handled = 0
+
+        try:
+            for email_id in due_ids:
+                # Claimed one at a time, so the lease never has to cover the rest of the batch
+                lease_until = datetime.utcnow() + timedelta(seconds=cls._lease_seconds())
+                claimed = db.session.execute(
+                    update(OutboxEmail)
+                    .where(OutboxEmail.id == email_id, OutboxEmail.status == 'queued')
+                    .values(status='sending', next_attempt_at=lease_until)
+                ).rowcount == 1
+                db.session.commit()
+                if not claimed:
+                    continue
+
+                email = db.session.get(OutboxEmail, email_id)
+                email.attempts = (email.attempts or 0) + 1
+                handled += 1
+
+                try:
+                    msg = cls._to_message(email)
+                    if not suppress:
+                        if connection is None:
+                            connection = cls._connect()
+                        connection.sendmail(
+                            sanitize_address(msg.sender),
+                            list(sanitize_addresses(msg.send_to)),
+                            msg.as_bytes(),
+                            msg.mail_options,
+                            msg.rcpt_options
+                        )
+
+                    email.status = 'sent'
+                    email.sent_at = datetime.utcnow()
+                    email.last_error = None
+                    email.attachment_data = None  # Not needed once delivered
+                    print(f"Email sent to {', '.join(email.recipients)}: {email.subject}")
+                except Exception as e:
+                    print(f"Failed to send email {email.id}: {str(e)}")
+                    cls._schedule_retry(email, e)
+
+                    # Start the next message on a fresh connection
+                    cls._close(connection)
+                    connection = None
+
+                db.session.commit()
+        finally:
+            cls._close(connection)
+
+        return handled
+
+    @classmethod
+    def _lease_seconds(cls):
+        """Worst case of one send: connect, STARTTLS, login and send can each wait MAIL_TIMEOUT"""
+        return 4 * current_app.config.get('MAIL_TIMEOUT', 30) + cls.LEASE_MARGIN_SECONDS
+
+    @classmethod
+    def _schedule_retry(cls, email, error):
+        max_attempts = current_app.config.get('MAIL_MAX_ATTEMPTS', 5)
+        base_seconds = current_app.config.get('MAIL_RETRY_BASE_SECONDS', 60)
+
+        email.last_error = str(error)
+
+        # Refused recipients will not be accepted on a retry either
+        if isinstance(error, smtplib.SMTPRecipientsRefused) or email.attempts >= max_attempts:
+            email.status = 'failed'
+            return
+
+        email.status = 'queued'
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=base_seconds * 2 ** (email.attempts - 1))
+
+    @classmethod
+    def _connect(cls):
+        """Open an SMTP connection like Flask-Mail does, but with a socket timeout"""
+        state = current_app.extensions['mail']
+        timeout = current_app.config.get('MAIL_TIMEOUT', 30)
+
+        if state.use_ssl:
+            host = smtplib.SMTP_SSL(state.server, state.port, timeout=timeout)
+        else:
+            host = smtplib.SMTP(state.server, state.port, timeout=timeout)
+
+        if state.use_tls:
+            host.starttls()
+        if state.username and state.password:
+            host.login(state.username, state.password)
+
+        return host
+
+    @staticmethod
+    def _close(connection):
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except Exception:
+            pass
+
+    @classmethod
+    def _run(cls, app):
+        poll_seconds = app.config.get('MAIL_DISPATCH_POLL_SECONDS', 10)
+
+        while True:
+            handled = 0
+            with app.app_context():
+                try:
+                    handled = cls.dispatch_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Mail dispatcher error: {str(e)}")
+                    traceback.print_exc()
+
+            # Keep going while there is work, otherwise wait for enqueue() or the next retry
+            if not handled:
+                cls._wakeup.wait(poll_seconds)
+                cls._wakeup.clear()
+
+    @staticmethod
+    def _from_message(msg):
+        if len(msg.attachments) > 1:
+            raise ValueError('Outbox emails support a single attachment')
+
+        attachment = msg.attachments[0] if msg.attachments else None
+        sender = msg.sender or current_app.extensions['mail'].default_sender
+
+        return OutboxEmail(
+            subject=msg.subject,
+            sender=list(sender) if isinstance(sender, tuple) else sender,
+            recipients=list(msg.recipients),
+            reply_to=msg.reply_to,
+            body=msg.body,
+            html=msg.html,
+            attachment_filename=attachment.filename if attachment else None,
+            attachment_mimetype=attachment.content_type if attachment else None,
+            attachment_data=attachment.data if attachment else None,
+            status='queued',
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+
+    @staticmethod
+    def _to_message(email):
+        msg = Message(
+            subject=email.subject,
+            recipients=email.recipients,
+            body=email.body,
+            html=email.html,
+            sender=tuple(email.sender) if isinstance(email.sender, list) else email.sender,
+            reply_to=email.reply_to
+        )
+
+        if email.attachment_filename:
+            msg.attach(
+                filename=email.attachment_filename,
+                content_type=email.attachment_mimetype,
+                data=email.attachment_data
+            )
+
+        return msg
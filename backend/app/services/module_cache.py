@@ -0,0 +1,196 @@
+"""Process-local cache of immutable module content (words, batteries, grading data)"""
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models.module import Module, Word, Battery
+
+
+class CachedModule:
+    """
+    Read-only snapshot of one version of a module.
+
+    Holds everything needed to grade answers and pick the next word
+    without touching the database:
+    - words: word_id -> serialized word (same shape as Word.to_dict())
+    - batteries: battery_id -> list of word IDs
+    - normalized answers per phase, so grading is a lookup
+    """
+
+    def __init__(self, module, words, batteries):
+        self.id = module.id
+        self.version = module.version
+        self.case_sensitive = bool(module.case_sensitive)
+        self.is_free = bool(module.is_free)
+        self.is_active = bool(module.is_active)
+        self.checked_at = time.monotonic()
+
+        self.words = {w.id: w.to_dict() for w in words}
+        self.batteries = {b.id: list(b.word_ids or []) for b in batteries}
+
+        # Precomputed answers per word:
+        # - phase 1: meaning (stripped)
+        # - phase 2: word (stripped)
+        # - phase 3 / final round: base form and every inflected form
+        self._meanings = {}
+        self._base_forms = {}
+        self._typed_forms = {}
+        for w in words:
+            self._meanings[w.id] = self._normalize(w.meaning.strip())
+            self._base_forms[w.id] = self._normalize(w.word.strip())
+
+            # Rows imported before inflected_forms was stored fall back to parsing
+            inflected_forms = w.inflected_forms
+            if inflected_forms is None:
+                inflected_forms = Word.extract_inflected_forms(w.example_sentence)
+
+            forms = {self._normalize(w.word)}
+            forms.update(self._normalize(form) for form in inflected_forms)
+            self._typed_forms[w.id] = forms
+
+    def _normalize(self, text):
+        return text if self.case_sensitive else text.lower()
+
+    def check_answer(self, word_id, phase, user_answer):
+        """Grade an answer for the given phase (phase 3 rules also apply to the final round)"""
+        user_answer = user_answer or ''
+
+        if phase == 1:
+            return self._normalize(user_answer.strip()) == self._meanings[word_id]
+        elif phase == 2:
+            return self._normalize(user_answer.strip()) == self._base_forms[word_id]
+        elif phase == 3:
+            return self._normalize(user_answer) in self._typed_forms[word_id]
+
+        return False
+
+    def correct_answer(self, word_id, phase):
+        """The answer shown to the student after grading"""
+        word = self.words[word_id]
+        return word['word'] if phase in [2, 3] else word['meaning']
+
+
+class ModuleCache:
+    """
+    Version-keyed cache of CachedModule snapshots.
+
+    Module content only changes through ModuleService/admin routes, which bump
+    Module.version. Each worker re-checks the version of a cached module at most
+    once every MODULE_CACHE_CHECK_SECONDS, so other workers pick up edits quickly
+    while the hot answer path normally runs without content queries.
+    """
+
+    _modules = {}
+    _word_index = {}
+    _battery_index = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_module(cls, module_id):
+        """Get the cached content of a module, reloading it if its version changed"""
+        cached = cls._modules.get(module_id)
+        now = time.monotonic()
+        check_interval = current_app.config.get('MODULE_CACHE_CHECK_SECONDS', 5)
+
+        if cached and now - cached.checked_at < check_interval:
+            return cached
+
+        version = db.session.query(Module.version).filter(Module.id == module_id).scalar()
+        if version is None:
+            cls.invalidate(module_id)
+            return None
+
+        if cached and cached.version == version:
+            cached.checked_at = now
+            return cached
+
+        return cls._load(module_id)
+
+    @classmethod
+    def get_module_for_word(cls, word_id):
+        """Get the cached content of the module a word belongs to"""
+        module_id = cls._word_index.get(word_id)
+        if module_id is None:
+            module_id = db.session.query(Word.module_id).filter(Word.id == word_id).scalar()
+            if module_id is None:
+                return None
+
+        content = cls.get_module(module_id)
+        if not content or word_id not in content.words:
+            return None
+        return content
+
+    @classmethod
+    def get_module_for_battery(cls, battery_id):
+        """Get the cached content of the module a battery belongs to"""
+        module_id = cls._battery_index.get(battery_id)
+        if module_id is None:
+            module_id = db.session.query(Battery.module_id).filter(Battery.id == battery_id).scalar()
+            if module_id is None:
+                return None
+
+        content = cls.get_module(module_id)
+        if not content or battery_id not in content.batteries:
+            return None
+        return content
+
+    @classmethod
+    def get_word(cls, word_id):
+        """Get a serialized word (same shape as Word.to_dict()) or None"""
+        content = cls.get_module_for_word(word_id)
+        return dict(content.words[word_id]) if content else None
+
+    @classmethod
+    def get_battery_word_ids(cls, battery_id):
+        """Get a copy of the word IDs of a battery or None"""
+        content = cls.get_module_for_battery(battery_id)
+        return list(content.batteries[battery_id]) if content else None
+
+    @classmethod
+    def invalidate(cls, module_id):
+        """Drop a module from this worker's cache (call after changing its content)"""
+        with cls._lock:
+            cached = cls._modules.pop(module_id, None)
+            if cached:
+                cls._drop_indexes(cached)
+
+    @classmethod
+    def clear(cls):
+        """Drop all cached modules"""
+        with cls._lock:
+            cls._modules.clear()
+            cls._word_index.clear()
+            cls._battery_index.clear()
+
+    @classmethod
+    def _load(cls, module_id):
+        module = Module.query.get(module_id)
+        if not module:
+            cls.invalidate(module_id)
+            return None
+
+        words = Word.query.filter_by(module_id=module_id).all()
+        batteries = Battery.query.filter_by(module_id=module_id).all()
+        content = CachedModule(module, words, batteries)
+
+        with cls._lock:
+            previous = cls._modules.get(module_id)
+            if previous:
+                cls._drop_indexes(previous)
+
+            cls._modules[module_id] = content
+            for word_id in content.words:
+                cls._word_index[word_id] = module_id
+            for battery_id in content.batteries:
+                cls._battery_index[battery_id] = module_id
+
+        return content
+
+    @classmethod
+    def _drop_indexes(cls, cached):
+        for word_id in cached.words:
+            if cls._word_index.get(word_id) == cached.id:
+                del cls._word_index[word_id]
+        for battery_id in cached.batteries:
+            if cls._battery_index.get(battery_id) == cached.id:
+                del cls._battery_index[battery_id]
@@ -1,181 +1,349 @@
 import openpyxl
-import csv
-import io
+import zipfile
+from sqlalchemy import insert
 from app import db
-from app.models.module import Module, Word, Battery
+from app.models.module import Module, Word, Battery, DifficultWord
+from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress, ProgressSummary
+from app.services.module_cache import ModuleCache
+from app.services.progress_service import ProgressService
+from app.services.word_parser import WordParser, WordValidationError
 
 
 class ModuleService:
     @staticmethod
-    def create_module_from_excel(filepath, name, difficulty='', is_free=False, level=1):
+    def _open_workbook(filepath):
+        """Open an uploaded workbook in streaming (read-only) mode"""
+        try:
+            return openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        except (openpyxl.utils.exceptions.InvalidFileException, zipfile.BadZipFile):
+            raise ValueError('Invalid Excel file format. Please upload a valid .xlsx file.')
+
+    @staticmethod
+    def _parse_workbook(workbook):
         """
-        Create a module from an Excel file
-        Expected format:
-        - Column A: Word
-        - Column B: Meaning
-        - Column C: Example sentence (with *word* marked)
+        Validate every worksheet of a workbook in one pass.
+
+        Returns (sheets, errors): sheets is a list of (title, rows) for sheets
+        that contain words, errors the structured errors of all sheets.
         """
-        try:
-            workbook = openpyxl.load_workbook(filepath)
-            sheet = workbook.active
-
-            # Validate headers
-            if sheet.max_row < 2:
-                raise ValueError('Excel file must contain at least one word row')
-
-            # Create module
-            module = Module(
-                name=name,
-                difficulty=difficulty,
-                level=level,
-                is_free=is_free,
-                is_active=True,
-                version=1
-            )
-            db.session.add(module)
-            db.session.flush()
+        sheets = []
+        errors = []
 
-            # Parse words
-            words = []
-            errors = []
-
-            for row_idx, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-                if not row or not any(row):
-                    continue  # Skip empty rows
-
-                word_text = row[0] if len(row) > 0 else None
-                meaning = row[1] if len(row) > 1 else None
-                example_sentence = row[2] if len(row) > 2 else None
-
-                # Validation
-                if not word_text or not word_text.strip():
-                    errors.append(f'Row {row_idx}: Word is missing')
-                    continue
-
-                if not meaning or not meaning.strip():
-                    errors.append(f'Row {row_idx}: Meaning is missing')
-                    continue
-
-                if not example_sentence or not example_sentence.strip():
-                    errors.append(f'Row {row_idx}: Example sentence is missing')
-                    continue
-
-                word_text = word_text.strip()
-                meaning = meaning.strip()
-                example_sentence = example_sentence.strip()
-
-                # Check if example sentence contains ANY word marked with asterisks
-                # This allows for inflected forms (e.g., "Ambivalent" with "*ambivalente*" in sentence)
-                if '*' not in example_sentence or example_sentence.count('*') < 2:
-                    errors.append(
-                        f'Row {row_idx}: Example sentence must contain a word marked with asterisks (e.g., *word*)'
-                    )
-                    continue
-
-                # Create word
-                word = Word(
-                    module_id=module.id,
-                    word=word_text,
-                    meaning=meaning,
-                    example_sentence=example_sentence,
-                    position_in_module=len(words) + 1
-                )
-                words.append(word)
+        for sheet in workbook.worksheets:
+            rows, sheet_errors = WordParser.collect(WordParser.iter_excel_sheet(sheet), sheet=sheet.title)
+            errors.extend(sheet_errors)
+            if rows:
+                sheets.append((sheet.title, rows))
 
-            if errors:
-                db.session.rollback()
-                raise ValueError('Excel validation errors:\n' + '\n'.join(errors))
+        return sheets, errors
 
-            if not words:
-                db.session.rollback()
-                raise ValueError('No valid words found in Excel file')
+    @staticmethod
+    def _insert_words(module_id, rows, positions):
+        """
+        Bulk insert validated rows (see WordParser) with their position_in_module.
 
-            # Add words to database
-            db.session.add_all(words)
-            db.session.flush()
+        Words go in with one INSERT ... RETURNING id (batched by SQLAlchemy)
+        instead of flushing one ORM object at a time.
+        Returns the new word IDs in row order.
+        """
+        if not rows:
+            return []
+
+        params = [
+            {
+                'module_id': module_id,
+                'word': row['word'],
+                'meaning': row['meaning'],
+                'example_sentence': row['example_sentence'],
+                'inflected_forms': Word.extract_inflected_forms(row['example_sentence']),
+                'position_in_module': position
+            }
+            for row, position in zip(rows, positions)
+        ]
+        return list(db.session.scalars(
+            insert(Word).returning(Word.id, sort_by_parameter_order=True),
+            params
+        ))
 
-            # Create batteries
-            word_ids = [w.id for w in words]
-            batteries = Battery.create_batteries_for_module(module.id, word_ids)
-            db.session.add_all(batteries)
+    @staticmethod
+    def _add_words(module, rows):
+        """Insert the words of a new module and build its batteries. Returns the word IDs."""
+        word_ids = ModuleService._insert_words(module.id, rows, range(1, len(rows) + 1))
 
-            db.session.commit()
+        batteries = Battery.create_batteries_for_module(module.id, word_ids)
+        db.session.add_all(batteries)
+        module.word_count = len(word_ids)
+        module.battery_count = len(batteries)
 
-            return module
+        return word_ids
 
-        except openpyxl.utils.exceptions.InvalidFileException:
-            raise ValueError('Invalid Excel file format. Please upload a valid .xlsx file.')
-        except Exception as e:
-            db.session.rollback()
-            raise e
+    @staticmethod
+    def _create_module(rows, name, difficulty='', is_free=False, level=1):
+        """Add a new module with its words and batteries to the session (caller commits)"""
+        module = Module(
+            name=name,
+            difficulty=difficulty,
+            level=level,
+            is_free=is_free,
+            is_active=True,
+            version=1
+        )
+        db.session.add(module)
+        db.session.flush()
+
+        ModuleService._add_words(module, rows)
+
+        return module
 
     @staticmethod
-    def update_module_from_excel(module_id, filepath):
+    def _match_words(existing, rows):
         """
-        Update an existing module from Excel file
-        This creates a new version - students in progress keep the old version
+        Match incoming rows to existing words of a module.
+
+        Rows claim an unmatched existing word in order of preference: same
+        (word, meaning), same word (meaning edited), same meaning (word edited)
+        and finally the same position.
+        Returns a list with the matched Word (or None) for every row.
         """
-        module = Module.query.get(module_id)
-        if not module:
-            raise ValueError('Module not found')
+        matched = [None] * len(rows)
+        used_ids = set()
+
+        for key in (
+            lambda w, m: (w, m),
+            lambda w, m: w,
+            lambda w, m: m
+        ):
+            by_key = {}
+            for word in existing:
+                if word.id not in used_ids:
+                    by_key.setdefault(key(word.word, word.meaning), []).append(word)
+
+            for i, row in enumerate(rows):
+                if matched[i] is None:
+                    candidates = by_key.get(key(row['word'], row['meaning']))
+                    if candidates:
+                        matched[i] = candidates.pop(0)
+                        used_ids.add(matched[i].id)
+
+        by_position = {i: word for i, word in enumerate(existing) if word.id not in used_ids}
+        for i in range(len(rows)):
+            if matched[i] is None and i in by_position:
+                matched[i] = by_position[i]
+
+        return matched
 
-        # For now, we'll create a new module version
-        # In a full implementation, you'd need to handle versioning more carefully
+    @staticmethod
+    def _update_content(module, rows):
+        """
+        Apply new rows to an existing module as a minimal diff (new version)
+        - Matched words keep their ID and are only updated when a field changed
+        - Only rows without a match are inserted, unmatched words are deleted
+        - Batteries keep their ID; only batteries whose word list changes are rewritten
+        - StudentProgress, BatteryProgress, QuestionProgress and DifficultWord
+          references to deleted words/batteries are cleaned up (voortgang blijft)
+        """
+        existing = Word.query.filter_by(module_id=module.id).order_by(Word.position_in_module, Word.id).all()
+        matched = ModuleService._match_words(existing, rows)
+
+        # Update matched words in place (only changed columns are written)
+        for position, (row, word) in enumerate(zip(rows, matched), start=1):
+            if word is None:
+                continue
+
+            inflected_forms = Word.extract_inflected_forms(row['example_sentence'])
+            for field, value in (
+                ('word', row['word']),
+                ('meaning', row['meaning']),
+                ('example_sentence', row['example_sentence']),
+                ('inflected_forms', inflected_forms),
+                ('position_in_module', position)
+            ):
+                if getattr(word, field) != value:
+                    setattr(word, field, value)
+
+        # Insert new rows
+        new_indexes = [i for i, word in enumerate(matched) if word is None]
+        inserted_ids = ModuleService._insert_words(
+            module.id,
+            [rows[i] for i in new_indexes],
+            [i + 1 for i in new_indexes]
+        )
+        inserted = dict(zip(new_indexes, inserted_ids))
+        word_ids = [word.id if word else inserted[i] for i, word in enumerate(matched)]
+
+        kept_ids = set(word_ids)
+        removed_word_ids = [word.id for word in existing if word.id not in kept_ids]
+
+        # Rebalance batteries against the new word order
+        removed_battery_ids, changed_batteries, added_battery_ids = ModuleService._update_batteries(module, word_ids)
+
+        # Reconcile progress that points at removed words/batteries
+        progress_changed = ModuleService._reconcile_progress(
+            module, removed_word_ids, removed_battery_ids, changed_batteries, added_battery_ids
+        )
+
+        if removed_word_ids:
+            Word.query.filter(Word.id.in_(removed_word_ids)).delete(synchronize_session=False)
+        if removed_battery_ids:
+            Battery.query.filter(Battery.id.in_(removed_battery_ids)).delete(synchronize_session=False)
+
+        module.word_count = len(word_ids)
+        module.battery_count = Battery.query.filter_by(module_id=module.id).count()
         module.version += 1
+        module.updated_at = db.func.now()
 
-        # Delete old words and batteries
-        Word.query.filter_by(module_id=module_id).delete()
-        Battery.query.filter_by(module_id=module_id).delete()
+        # Attempts on removed words/batteries are gone: recount the affected summaries
+        if progress_changed:
+            ProgressService.rebuild_summaries(module_ids=[module.id], commit=False)
 
-        # Re-import from Excel
-        try:
-            workbook = openpyxl.load_workbook(filepath)
-            sheet = workbook.active
+        db.session.commit()
+        ModuleCache.invalidate(module.id)
 
-            words = []
-            errors = []
+        return module
 
-            for row_idx, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-                if not row or not any(row):
-                    continue
+    @staticmethod
+    def _update_batteries(module, word_ids):
+        """
+        Lay out batteries for the new word order, reusing existing Battery rows.
 
-                word_text = row[0] if len(row) > 0 else None
-                meaning = row[1] if len(row) > 1 else None
-                example_sentence = row[2] if len(row) > 2 else None
+        Existing batteries whose word list is unchanged are kept as-is; other
+        existing batteries are rewritten in place (same ID) before new ones are
+        created or surplus ones are removed.
 
-                if not word_text or not meaning or not example_sentence:
-                    errors.append(f'Row {row_idx}: Missing required fields')
-                    continue
+        Returns (removed_battery_ids, changed_batteries, added_battery_ids) where
+        changed_batteries maps battery_id -> (old_word_ids, new_word_ids).
+        """
+        existing = Battery.query.filter_by(module_id=module.id).order_by(Battery.battery_number, Battery.id).all()
+        groups = Battery.split_word_ids(word_ids) if word_ids else []
+
+        unchanged = {}
+        remaining = []
+        by_words = {tuple(b.word_ids or []): b for b in existing}
+        for number, group in enumerate(groups, start=1):
+            battery = by_words.pop(tuple(group), None)
+            if battery:
+                unchanged[number] = battery
+            else:
+                remaining.append((number, group))
+
+        unchanged_ids = {b.id for b in unchanged.values()}
+        reusable = [b for b in existing if b.id not in unchanged_ids]
+        changed_batteries = {}
+        added = []
+
+        for number, battery in unchanged.items():
+            if battery.battery_number != number:
+                battery.battery_number = number
+
+        for number, group in remaining:
+            if reusable:
+                battery = reusable.pop(0)
+                changed_batteries[battery.id] = (list(battery.word_ids or []), group)
+                battery.battery_number = number
+                battery.word_ids = group
+            else:
+                battery = Battery(module_id=module.id, battery_number=number, word_ids=group)
+                db.session.add(battery)
+                added.append(battery)
 
-                word_text = word_text.strip()
-                meaning = meaning.strip()
-                example_sentence = example_sentence.strip()
+        if added:
+            db.session.flush()
 
-                if '*' not in example_sentence or example_sentence.count('*') < 2:
-                    errors.append(f'Row {row_idx}: Example sentence must contain a word marked with asterisks (e.g., *word*)')
-                    continue
+        return [b.id for b in reusable], changed_batteries, [b.id for b in added]
 
-                word = Word(
-                    module_id=module.id,
-                    word=word_text,
-                    meaning=meaning,
-                    example_sentence=example_sentence,
-                    position_in_module=len(words) + 1
-                )
-                words.append(word)
+    @staticmethod
+    def _reconcile_progress(module, removed_word_ids, removed_battery_ids, changed_batteries, added_battery_ids):
+        """
+        Keep progress of a module consistent with changed words/batteries.
 
-            if errors:
-                db.session.rollback()
-                raise ValueError('Excel validation errors:\n' + '\n'.join(errors))
+        - Attempts and difficult words for removed words are deleted
+        - Progress on removed batteries is deleted and the batteries are dropped
+          from battery_order/completed_batteries/current_battery_id
+        - Queues of unfinished batteries follow their new word list
+        - New batteries are appended to every student's battery_order
 
-            db.session.add_all(words)
-            db.session.flush()
+        Returns True if any attempts were deleted (summaries need a recount).
+        """
+        if not (removed_word_ids or removed_battery_ids or changed_batteries or added_battery_ids):
+            return False
+
+        removed_words = set(removed_word_ids)
+        removed_batteries = set(removed_battery_ids)
+        attempts_deleted = False
+
+        if removed_word_ids:
+            DifficultWord.query.filter(DifficultWord.word_id.in_(removed_word_ids)).delete(synchronize_session=False)
+            deleted = QuestionProgress.query.filter(
+                QuestionProgress.word_id.in_(removed_word_ids)
+            ).delete(synchronize_session=False)
+            attempts_deleted = attempts_deleted or deleted > 0
+
+        battery_progress = BatteryProgress.query.join(
+            StudentProgress, StudentProgress.id == BatteryProgress.student_progress_id
+        ).filter(
+            StudentProgress.module_id == module.id
+        ).all()
+
+        removed_battery_progress_ids = []
+        for bp in battery_progress:
+            if bp.battery_id in removed_batteries:
+                removed_battery_progress_ids.append(bp.id)
+                continue
+
+            queue = [word_id for word_id in (bp.current_question_queue or []) if word_id not in removed_words]
+            if bp.battery_id in changed_batteries and not bp.is_completed:
+                old_word_ids, new_word_ids = changed_batteries[bp.battery_id]
+                queue = [word_id for word_id in queue if word_id in new_word_ids]
+                queue += [word_id for word_id in new_word_ids if word_id not in old_word_ids and word_id not in queue]
+
+            if queue != (bp.current_question_queue or []):
+                bp.current_question_queue = queue
+
+        if removed_battery_progress_ids:
+            deleted = QuestionProgress.query.filter(
+                QuestionProgress.battery_progress_id.in_(removed_battery_progress_ids)
+            ).delete(synchronize_session=False)
+            attempts_deleted = attempts_deleted or deleted > 0
+            BatteryProgress.query.filter(
+                BatteryProgress.id.in_(removed_battery_progress_ids)
+            ).delete(synchronize_session=False)
+
+        for progress in StudentProgress.query.filter_by(module_id=module.id).all():
+            battery_order = [b for b in (progress.battery_order or []) if b not in removed_batteries]
+            battery_order += [b for b in added_battery_ids if b not in battery_order]
+            completed_batteries = [b for b in (progress.completed_batteries or []) if b not in removed_batteries]
+            final_round_word_ids = [w for w in (progress.final_round_word_ids or []) if w not in removed_words]
+
+            if battery_order != (progress.battery_order or []):
+                progress.battery_order = battery_order
+            if completed_batteries != (progress.completed_batteries or []):
+                progress.completed_batteries = completed_batteries
+            if final_round_word_ids != (progress.final_round_word_ids or []):
+                progress.final_round_word_ids = final_round_word_ids
+
+            if progress.current_battery_id in removed_batteries:
+                pending = [b for b in battery_order if b not in completed_batteries]
+                progress.current_battery_id = pending[0] if pending else None
+
+        # Write progress changes before the referenced words/batteries are deleted
+        db.session.flush()
+
+        return attempts_deleted
 
-            word_ids = [w.id for w in words]
-            batteries = Battery.create_batteries_for_module(module.id, word_ids)
-            db.session.add_all(batteries)
+    @staticmethod
+    def create_module_from_excel(filepath, name, difficulty='', is_free=False, level=1):
+        """
+        Create a module from an Excel file
+        Expected format:
+        - Column A: Word
+        - Column B: Meaning
+        - Column C: Example sentence (with *word* marked)
+        """
+        workbook = ModuleService._open_workbook(filepath)
 
-            module.updated_at = db.func.now()
+        try:
+            rows = WordParser.parse_excel_sheet(workbook.active)
+            module = ModuleService._create_module(rows, name, difficulty, is_free, level)
             db.session.commit()
 
             return module
@@ -183,129 +351,78 @@ class ModuleService:
         except Exception as e:
             db.session.rollback()
             raise e
+        finally:
+            workbook.close()
 
     @staticmethod
-    def create_module_from_csv(csv_data, name, difficulty='', is_free=False, level=1):
+    def create_modules_from_excel(filepath, difficulty='', is_free=False, level=1):
         """
-        Create a module from CSV data string
-        Expected format:
-        word,meaning,example_sentence or word;meaning;example_sentence
+        Create one module per worksheet of an Excel file (named after the sheet).
+
+        Sheets without word rows are skipped. All modules are created in one
+        transaction: any validation error rolls back the whole workbook.
         """
-        try:
-            # Create module
-            module = Module(
-                name=name,
-                difficulty=difficulty,
-                level=level,
-                is_free=is_free,
-                is_active=True,
-                version=1
-            )
-            db.session.add(module)
-            db.session.flush()
+        workbook = ModuleService._open_workbook(filepath)
 
-            # Parse CSV - auto-detect delimiter (comma or semicolon)
-            csv_file = io.StringIO(csv_data)
-            # Use Sniffer to detect the delimiter
-            sample = csv_data[:1024]  # Take first 1KB as sample
-
-            # Only allow common delimiters (comma, semicolon, tab, pipe)
-            valid_delimiters = [',', ';', '\t', '|']
-
-            try:
-                detected = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
-                # Verify it's a valid delimiter
-                if detected in valid_delimiters:
-                    delimiter = detected
-                else:
-                    raise ValueError("Invalid delimiter detected")
-            except:
-                # Fallback: Try semicolon first (common in European CSVs), then comma
-                if ';' in sample and sample.count(';') > sample.count(','):
-                    delimiter = ';'
-                else:
-                    delimiter = ','
-
-            csv_file.seek(0)  # Reset to start
-            reader = csv.reader(csv_file, delimiter=delimiter)
-
-            # Check if first row is header
-            first_row = next(reader, None)
-            if not first_row:
-                raise ValueError('CSV is empty')
-
-            # If first row looks like a header, skip it
-            if first_row[0].lower() in ['word', 'woord'] or 'word' in first_row[0].lower():
-                rows = list(reader)
-            else:
-                # First row is data, include it
-                rows = [first_row] + list(reader)
-
-            words = []
-            errors = []
-
-            for row_idx, row in enumerate(rows, start=2 if first_row else 1):
-                if not row or not any(row):
-                    continue  # Skip empty rows
-
-                word_text = row[0].strip() if len(row) > 0 and row[0] else None
-                meaning = row[1].strip() if len(row) > 1 and row[1] else None
-                example_sentence = row[2].strip() if len(row) > 2 and row[2] else None
-
-                # Validation
-                if not word_text:
-                    errors.append(f'Row {row_idx}: Word is missing')
-                    continue
-
-                if not meaning:
-                    errors.append(f'Row {row_idx}: Meaning is missing')
-                    continue
-
-                if not example_sentence:
-                    errors.append(f'Row {row_idx}: Example sentence is missing')
-                    continue
-
-                # Check if example sentence contains a word marked with asterisks
-                if '*' not in example_sentence or example_sentence.count('*') < 2:
-                    errors.append(
-                        f'Row {row_idx}: Example sentence must contain a word marked with asterisks (e.g., *word*)'
-                    )
-                    continue
-
-                # Create word
-                word = Word(
-                    module_id=module.id,
-                    word=word_text,
-                    meaning=meaning,
-                    example_sentence=example_sentence,
-                    position_in_module=len(words) + 1
-                )
-                words.append(word)
+        try:
+            sheets, errors = ModuleService._parse_workbook(workbook)
 
             if errors:
-                db.session.rollback()
-                raise ValueError('CSV validation errors:\n' + '\n'.join(errors))
+                raise WordValidationError('Excel validation errors', errors)
 
-            if not words:
-                db.session.rollback()
-                raise ValueError('No valid words found in CSV data')
+            if not sheets:
+                raise ValueError('No valid words found in Excel file')
 
-            # Add words to database
-            db.session.add_all(words)
-            db.session.flush()
+            modules = [
+                ModuleService._create_module(rows, sheet_title, difficulty, is_free, level)
+                for sheet_title, rows in sheets
+            ]
+            db.session.commit()
+
+            return modules
+
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def update_module_from_excel(module_id, filepath):
+        """
+        Update an existing module from Excel file
+        Applies the rows as a diff (see _update_content) and bumps the version
+        """
+        module = Module.query.get(module_id)
+        if not module:
+            raise ValueError('Module not found')
 
-            # Create batteries
-            word_ids = [w.id for w in words]
-            batteries = Battery.create_batteries_for_module(module.id, word_ids)
-            db.session.add_all(batteries)
+        workbook = ModuleService._open_workbook(filepath)
 
+        try:
+            rows = WordParser.parse_excel_sheet(workbook.active)
+            return ModuleService._update_content(module, rows)
+
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def create_module_from_csv(csv_data, name, difficulty='', is_free=False, level=1):
+        """
+        Create a module from CSV data string
+        Expected format:
+        word,meaning,example_sentence or word;meaning;example_sentence
+        """
+        try:
+            rows = WordParser.parse_csv(csv_data)
+            module = ModuleService._create_module(rows, name, difficulty, is_free, level)
             db.session.commit()
 
             return module
 
-        except csv.Error as e:
-            db.session.rollback()
-            raise ValueError(f'CSV parse error: {str(e)}')
         except Exception as e:
             db.session.rollback()
             raise e
@@ -314,123 +431,127 @@ class ModuleService:
     def update_module_from_csv(module_id, csv_data):
         """
         Update an existing module from CSV data
-        - Deletes old words and batteries
-        - Creates new words and batteries
-        - Preserves StudentProgress (voortgang blijft)
-        - QuestionProgress and BatteryProgress for deleted items are automatically cleaned up
+        Applies the rows as a diff (see _update_content) and bumps the version
         """
         module = Module.query.get(module_id)
         if not module:
             raise ValueError('Module not found')
 
         try:
-            # Delete old words and batteries (this will cascade delete related progress records)
-            Word.query.filter_by(module_id=module_id).delete()
-            Battery.query.filter_by(module_id=module_id).delete()
-
-            # Increment version
-            module.version += 1
-
-            # Parse CSV - auto-detect delimiter (comma or semicolon)
-            csv_file = io.StringIO(csv_data)
-            sample = csv_data[:1024]  # Take first 1KB as sample
-
-            # Only allow common delimiters
-            valid_delimiters = [',', ';', '\t', '|']
-
-            try:
-                detected = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
-                if detected in valid_delimiters:
-                    delimiter = detected
-                else:
-                    raise ValueError("Invalid delimiter detected")
-            except:
-                # Fallback: Try semicolon first, then comma
-                if ';' in sample and sample.count(';') > sample.count(','):
-                    delimiter = ';'
-                else:
-                    delimiter = ','
-
-            csv_file.seek(0)
-            reader = csv.reader(csv_file, delimiter=delimiter)
-
-            # Check if first row is header
-            first_row = next(reader, None)
-            if not first_row:
-                raise ValueError('CSV is empty')
-
-            # If first row looks like a header, skip it
-            if first_row[0].lower() in ['word', 'woord'] or 'word' in first_row[0].lower():
-                rows = list(reader)
-            else:
-                rows = [first_row] + list(reader)
-
-            words = []
-            errors = []
-
-            for row_idx, row in enumerate(rows, start=2 if first_row else 1):
-                if not row or not any(row):
-                    continue
-
-                word_text = row[0].strip() if len(row) > 0 and row[0] else None
-                meaning = row[1].strip() if len(row) > 1 and row[1] else None
-                example_sentence = row[2].strip() if len(row) > 2 and row[2] else None
-
-                # Validation
-                if not word_text:
-                    errors.append(f'Row {row_idx}: Word is missing')
-                    continue
-
-                if not meaning:
-                    errors.append(f'Row {row_idx}: Meaning is missing')
-                    continue
-
-                if not example_sentence:
-                    errors.append(f'Row {row_idx}: Example sentence is missing')
-                    continue
-
-                # Check for asterisks
-                if '*' not in example_sentence or example_sentence.count('*') < 2:
-                    errors.append(
-                        f'Row {row_idx}: Example sentence must contain a word marked with asterisks (e.g., *word*)'
-                    )
-                    continue
-
-                # Create word
-                word = Word(
-                    module_id=module.id,
-                    word=word_text,
-                    meaning=meaning,
-                    example_sentence=example_sentence,
-                    position_in_module=len(words) + 1
-                )
-                words.append(word)
+            rows = WordParser.parse_csv(csv_data)
+            return ModuleService._update_content(module, rows)
 
-            if errors:
-                db.session.rollback()
-                raise ValueError('CSV validation errors:\n' + '\n'.join(errors))
+        except Exception as e:
+            db.session.rollback()
+            raise e
 
-            if not words:
-                db.session.rollback()
-                raise ValueError('No valid words found in CSV data')
+    @staticmethod
+    def validate_csv(csv_data):
+        """
+        Dry-run validation of CSV data (no database access).
+        Reports every error in one pass.
+        """
+        rows, errors = WordParser.collect(WordParser.iter_csv(csv_data))
 
-            # Add words to database
-            db.session.add_all(words)
-            db.session.flush()
+        return {
+            'valid': not errors and bool(rows),
+            'word_count': len(rows),
+            'errors': errors
+        }
 
-            # Create batteries
-            word_ids = [w.id for w in words]
-            batteries = Battery.create_batteries_for_module(module.id, word_ids)
-            db.session.add_all(batteries)
+    @staticmethod
+    def validate_excel(filepath, all_sheets=False):
+        """
+        Dry-run validation of an Excel file (no database access).
+        Checks the active sheet, or every sheet with all_sheets=True.
+        """
+        workbook = ModuleService._open_workbook(filepath)
 
-            module.updated_at = db.func.now()
-            db.session.commit()
+        try:
+            if all_sheets:
+                sheets, errors = ModuleService._parse_workbook(workbook)
+            else:
+                rows, errors = WordParser.collect(WordParser.iter_excel_sheet(workbook.active))
+                sheets = [(workbook.active.title, rows)] if rows else []
+        finally:
+            workbook.close()
+
+        return {
+            'valid': not errors and bool(sheets),
+            'word_count': sum(len(rows) for _, rows in sheets),
+            'sheets': [{'name': title, 'word_count': len(rows)} for title, rows in sheets],
+            'errors': errors
+        }
 
-            return module
+    @staticmethod
+    def delete_module(module_id, progress=None):
+        """
+        Permanently delete a module with all its content and student progress.
 
-        except csv.Error as e:
-            db.session.rollback()
-            raise ValueError(f'CSV parse error: {str(e)}')
-        except Exception as e:
+        Every step is one set-based DELETE ... WHERE ... IN (subquery), so the
+        number of statements does not depend on the number of learners.
+        progress, if given, is called as progress(done_steps, total_steps)
+        after each step (used for background job reporting). Commits.
+        """
+        word_ids = db.session.query(Word.id).filter(Word.module_id == module_id)
+        student_progress_ids = db.session.query(StudentProgress.id).filter(StudentProgress.module_id == module_id)
+        battery_progress_ids = db.session.query(BatteryProgress.id).filter(
+            BatteryProgress.student_progress_id.in_(student_progress_ids)
+        )
+
+        steps = [
+            DifficultWord.query.filter(DifficultWord.word_id.in_(word_ids)),
+            QuestionProgress.query.filter(QuestionProgress.battery_progress_id.in_(battery_progress_ids)),
+            # Attempts on this module's words recorded under other progress (should not exist)
+            QuestionProgress.query.filter(QuestionProgress.word_id.in_(word_ids)),
+            BatteryProgress.query.filter(BatteryProgress.student_progress_id.in_(student_progress_ids)),
+            StudentProgress.query.filter(StudentProgress.module_id == module_id),
+            ProgressSummary.query.filter(ProgressSummary.module_id == module_id),
+            Word.query.filter(Word.module_id == module_id),
+            Battery.query.filter(Battery.module_id == module_id),
+            Module.query.filter(Module.id == module_id)
+        ]
+
+        try:
+            for done, query in enumerate(steps, start=1):
+                query.delete(synchronize_session=False)
+                if progress:
+                    progress(done, len(steps))
+
+            db.session.commit()
+        except Exception:
             db.session.rollback()
-            raise e
+            raise
+
+        ModuleCache.invalidate(module_id)
+
+    @staticmethod
+    def check_counts(fix=False):
+        """
+        Compare the stored word_count/battery_count of every module with the
+        actual number of words and batteries (two grouped queries).
+
+        Returns a list of (module_id, stored, actual) tuples for mismatching
+        modules, where stored/actual are (word_count, battery_count).
+        With fix=True the stored counts are corrected and committed.
+        """
+        word_counts = dict(
+            db.session.query(Word.module_id, db.func.count(Word.id)).group_by(Word.module_id).all()
+        )
+        battery_counts = dict(
+            db.session.query(Battery.module_id, db.func.count(Battery.id)).group_by(Battery.module_id).all()
+        )
+
+        mismatches = []
+        for module in Module.query.order_by(Module.id).all():
+            stored = (module.word_count, module.battery_count)
+            actual = (word_counts.get(module.id, 0), battery_counts.get(module.id, 0))
+            if stored != actual:
+                mismatches.append((module.id, stored, actual))
+                if fix:
+                    module.word_count, module.battery_count = actual
+
+        if fix and mismatches:
+            db.session.commit()
+
+        return mismatches
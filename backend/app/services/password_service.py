@@ -0,0 +1,68 @@
+"""Password hashing with a configurable method, run on a bounded thread pool"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt'
+
+
+class PasswordService:
+    """
+    Hashes and verifies passwords with PASSWORD_HASH_METHOD (any werkzeug
+    method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000').
+
+    Hashes run on a pool of PASSWORD_HASH_WORKERS threads, fewer than the
+    request threads of a worker process. The request thread waits for its
+    hash, but when a whole class logs in together at most that many hashes
+    (32 MiB each for default scrypt) run at once and the remaining request
+    threads keep serving other requests instead of all hashing.
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+    _method_prefixes = {}
+
+    @classmethod
+    def hash(cls, password):
+        method = cls._method()
+        return cls._run(generate_password_hash, password, method=method)
+
+    @classmethod
+    def verify(cls, password_hash, password):
+        return cls._run(check_password_hash, password_hash, password)
+
+    @classmethod
+    def needs_rehash(cls, password_hash):
+        """Whether a stored hash was made with other parameters than PASSWORD_HASH_METHOD"""
+        return password_hash.split('$', 1)[0] != cls._method_prefix(cls._method())
+
+    @classmethod
+    def _method_prefix(cls, method):
+        # werkzeug expands defaults ('scrypt' -> 'scrypt:32768:8:1'); hash once to learn the stored form
+        if method not in cls._method_prefixes:
+            cls._method_prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+        return cls._method_prefixes[method]
+
+    @staticmethod
+    def _method():
+        if has_app_context():
+            return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        return DEFAULT_METHOD
+
+    @classmethod
+    def _run(cls, func, *args, **kwargs):
+        # Scripts without an app context hash inline
+        if not has_app_context():
+            return func(*args, **kwargs)
+        return cls._get_executor().submit(func, *args, **kwargs).result()
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+                    thread_name_prefix='octovoc-password'
+                )
+            return cls._executor
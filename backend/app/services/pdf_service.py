@@ -1,16 +1,246 @@
 """Service for generating PDF quotes from Word templates"""
+import atexit
+import hashlib
 import os
+import queue
+import shutil
+import socket
+import subprocess
 import tempfile
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
 from docx import Document
-from docx2pdf import convert
+from flask import current_app
+
+try:
+    # LibreOffice's Python bindings (e.g. Debian python3-uno)
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+
+class _Listener:
+    """
+    One long-lived headless LibreOffice with its own user profile, accepting
+    UNO connections on a local port. Started on first use and restarted if
+    it exits; used by one conversion at a time.
+    """
+
+    def __init__(self):
+        self.profile = tempfile.mkdtemp(prefix='octovoc-lo-profile-')
+        self.port = None
+        self.process = None
+        self.desktop = None
+        atexit.register(self.stop)
+        atexit.register(shutil.rmtree, self.profile, ignore_errors=True)
+
+    def convert(self, input_path, output_path, timeout):
+        """Convert with the running LibreOffice; kills it if the conversion exceeds timeout"""
+        desktop = self._connect(timeout)
+
+        # A hung LibreOffice is killed, which makes the pending UNO call fail
+        watchdog = threading.Timer(timeout, self.stop)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            document = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(input_path), '_blank', 0, (_property('Hidden', True),)
+            )
+            try:
+                document.storeToURL(
+                    uno.systemPathToFileUrl(output_path), (_property('FilterName', 'writer_pdf_Export'),)
+                )
+            finally:
+                document.close(True)
+        except Exception:
+            # Start a fresh LibreOffice for the next conversion
+            self.stop()
+            raise
+        finally:
+            watchdog.cancel()
+
+    def stop(self):
+        # Also called by the watchdog thread
+        process, self.process, self.desktop = self.process, None, None
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def _connect(self, timeout):
+        if self.desktop is not None and self.process is not None and self.process.poll() is None:
+            return self.desktop
+
+        self.stop()
+        self.port = _free_port()
+        try:
+            self.process = subprocess.Popen([
+                'libreoffice',
+                f'-env:UserInstallation={Path(self.profile).as_uri()}',
+                '--headless',
+                '--invisible',
+                '--nologo',
+                '--norestore',
+                f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise Exception("LibreOffice not installed - PDF conversion not available")
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context
+        )
+
+        # The first start creates the profile, later starts reuse it
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    f'uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+                )
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise Exception("PDF conversion failed: LibreOffice did not start")
+                time.sleep(0.25)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+        return self.desktop
+
+
+def _property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class QuoteRenderer:
+    """
+    docx -> PDF conversion with headless LibreOffice.
+
+    Each process keeps QUOTE_RENDER_WORKERS LibreOffice listeners running
+    (one profile each) and converts through them over UNO, so only the first
+    conversion of a listener pays the LibreOffice start. A listener is used
+    by one conversion at a time, which bounds concurrent conversions.
+    Without the uno module every conversion starts LibreOffice with
+    --convert-to (a cold start on a reused profile).
+    Rendered PDFs are cached by a hash of the quote parameters.
+    """
+
+    _listeners = None
+    _listeners_lock = threading.Lock()
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def cache_key(cls, template_path, replacements):
+        """Hash of the template version and the values filled into it"""
+        parts = [template_path, str(os.path.getmtime(template_path))]
+        parts += [f'{placeholder}={value}' for placeholder, value in sorted(replacements.items())]
+        return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_cached(cls, key):
+        with cls._cache_lock:
+            pdf = cls._cache.get(key)
+            if pdf is not None:
+                cls._cache.move_to_end(key)
+            return pdf
+
+    @classmethod
+    def store(cls, key, pdf):
+        max_size = current_app.config.get('QUOTE_PDF_CACHE_SIZE', 32)
+        with cls._cache_lock:
+            cls._cache[key] = pdf
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > max_size:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def convert(cls, doc):
+        """Convert a python-docx Document to PDF bytes; no files are left behind"""
+        timeout = current_app.config.get('QUOTE_PDF_TIMEOUT', 60)
+        listeners = cls._get_listeners()
+
+        try:
+            listener = listeners.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception("PDF conversion busy - no renderer available")
+
+        try:
+            with tempfile.TemporaryDirectory(prefix='octovoc-quote-') as temp_dir:
+                word_output = os.path.join(temp_dir, 'offerte.docx')
+                pdf_output = os.path.join(temp_dir, 'offerte.pdf')
+                doc.save(word_output)
+
+                if uno is not None:
+                    try:
+                        listener.convert(word_output, pdf_output, timeout)
+                    except Exception as e:
+                        raise Exception(f"PDF conversion failed: {e}")
+                else:
+                    cls._convert_cold(listener.profile, word_output, temp_dir, timeout)
+
+                with open(pdf_output, 'rb') as pdf_file:
+                    return pdf_file.read()
+        finally:
+            listeners.put(listener)
+
+    @staticmethod
+    def _convert_cold(profile, word_output, output_dir, timeout):
+        """One LibreOffice process per conversion (no uno module)"""
+        try:
+            result = subprocess.run([
+                'libreoffice',
+                f'-env:UserInstallation={Path(profile).as_uri()}',
+                '--headless',
+                '--norestore',
+                '--convert-to',
+                'pdf',
+                '--outdir',
+                output_dir,
+                word_output
+            ], capture_output=True, text=True, timeout=timeout)
+        except FileNotFoundError:
+            raise Exception("LibreOffice not installed - PDF conversion not available")
+
+        if not os.path.exists(os.path.join(output_dir, 'offerte.pdf')):
+            raise Exception(f"PDF conversion failed: {result.stderr}")
+
+    @classmethod
+    def _get_listeners(cls):
+        with cls._listeners_lock:
+            if cls._listeners is None:
+                if uno is None:
+                    print("Warning: uno module not available, quote PDFs start LibreOffice per conversion")
+                workers = max(current_app.config.get('QUOTE_RENDER_WORKERS', 1), 1)
+                cls._listeners = queue.Queue()
+                for _ in range(workers):
+                    cls._listeners.put(_Listener())
+            return cls._listeners
+
+
+def _replace_placeholders(paragraph, replacements):
+    for placeholder, value in replacements.items():
+        if placeholder in paragraph.text:
+            paragraph.text = paragraph.text.replace(placeholder, value)
 
 
 def generate_quote_pdf(name, school_name, billing_address, num_classrooms, num_students, num_teacher_accounts):
     """
     Generate a PDF quote from the Word template
 
-    Returns: path to generated PDF file
+    Returns: (filename, PDF bytes)
     """
     # Get template path
     template_path = os.path.join(
@@ -28,71 +258,37 @@ def generate_quote_pdf(name, school_name, billing_address, num_classrooms, num_s
     # Format billing address or use school name if not provided
     formatted_address = billing_address if billing_address else school_name
 
+    replacements = {
+        '[aantal klascodes]': str(num_classrooms),
+        '[aantal leerlingen]': str(num_students),
+        '[aantal lerarencodes]': str(num_teacher_accounts),
+        '[facturatie-adres]': formatted_address,
+        '[totaal]': f"€ {total_price:.2f}"
+    }
+
+    filename = f'Offerte_Octovoc_{school_name.replace(" ", "_")}.pdf'
+
+    # Identical quotes (e.g. a resubmitted order form) reuse the rendered PDF
+    key = QuoteRenderer.cache_key(template_path, replacements)
+    pdf = QuoteRenderer.get_cached(key)
+    if pdf is not None:
+        return filename, pdf
+
     # Load template
     doc = Document(template_path)
 
     # Replace placeholders in all paragraphs
     for paragraph in doc.paragraphs:
-        if '[aantal klascodes]' in paragraph.text:
-            paragraph.text = paragraph.text.replace('[aantal klascodes]', str(num_classrooms))
-        if '[aantal leerlingen]' in paragraph.text:
-            paragraph.text = paragraph.text.replace('[aantal leerlingen]', str(num_students))
-        if '[aantal lerarencodes]' in paragraph.text:
-            paragraph.text = paragraph.text.replace('[aantal lerarencodes]', str(num_teacher_accounts))
-        if '[facturatie-adres]' in paragraph.text:
-            paragraph.text = paragraph.text.replace('[facturatie-adres]', formatted_address)
-        if '[totaal]' in paragraph.text:
-            paragraph.text = paragraph.text.replace('[totaal]', f"€ {total_price:.2f}")
+        _replace_placeholders(paragraph, replacements)
 
     # Replace placeholders in all tables
     for table in doc.tables:
         for row in table.rows:
             for cell in row.cells:
                 for paragraph in cell.paragraphs:
-                    if '[aantal klascodes]' in paragraph.text:
-                        paragraph.text = paragraph.text.replace('[aantal klascodes]', str(num_classrooms))
-                    if '[aantal leerlingen]' in paragraph.text:
-                        paragraph.text = paragraph.text.replace('[aantal leerlingen]', str(num_students))
-                    if '[aantal lerarencodes]' in paragraph.text:
-                        paragraph.text = paragraph.text.replace('[aantal lerarencodes]', str(num_teacher_accounts))
-                    if '[facturatie-adres]' in paragraph.text:
-                        paragraph.text = paragraph.text.replace('[facturatie-adres]', formatted_address)
-                    if '[totaal]' in paragraph.text:
-                        paragraph.text = paragraph.text.replace('[totaal]', f"€ {total_price:.2f}")
-
-    # Create temporary directory for output
-    temp_dir = tempfile.mkdtemp()
-
-    # Save modified Word document
-    word_output = os.path.join(temp_dir, 'offerte.docx')
-    doc.save(word_output)
-
-    # Convert to PDF
-    pdf_output = os.path.join(temp_dir, f'Offerte_Octovoc_{school_name.replace(" ", "_")}.pdf')
-
-    try:
-        # Use LibreOffice for conversion (installed on most Linux systems)
-        import subprocess
-        result = subprocess.run([
-            'libreoffice',
-            '--headless',
-            '--convert-to',
-            'pdf',
-            '--outdir',
-            temp_dir,
-            word_output
-        ], capture_output=True, text=True, timeout=30)
-
-        # Rename output file to desired name
-        generated_pdf = os.path.join(temp_dir, 'offerte.pdf')
-        if os.path.exists(generated_pdf):
-            os.rename(generated_pdf, pdf_output)
-
-        if not os.path.exists(pdf_output):
-            raise Exception(f"PDF conversion failed: {result.stderr}")
+                    _replace_placeholders(paragraph, replacements)
 
-    except FileNotFoundError:
-        # LibreOffice not found, try alternative method
-        raise Exception("LibreOffice not installed - PDF conversion not available")
+    pdf = QuoteRenderer.convert(doc)
+    QuoteRenderer.store(key, pdf)
 
-    return pdf_output
+    return filename, pdf
@@ -0,0 +1,353 @@
+from datetime import datetime
+from sqlalchemy import func, case, and_, cast, exists, literal_column, select
+from sqlalchemy.dialects.postgresql import JSONB
+from app import db
+from app.models.user import User
+from app.models.module import Module
+from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress, ProgressSummary
+from app.utils.upsert import conflict_insert
+
+EMPTY_LIST = literal_column("'[]'")
+
+
+class ProgressService:
+    @staticmethod
+    def get_summary(user_id, module_id):
+        """
+        Get the ProgressSummary of a student for a module.
+
+        When the student has progress on the module but no summary yet (rows
+        that predate the summary table), the summary is computed from
+        QuestionProgress without storing it; rebuild_progress_summaries.py
+        stores missing summaries. Returns None if the student never started
+        the module.
+        """
+        summary = ProgressSummary.query.filter_by(user_id=user_id, module_id=module_id).first()
+        if summary:
+            return summary
+
+        return ProgressService.compute_summaries(user_ids=[int(user_id)], module_ids=[module_id]).get(
+            (int(user_id), module_id)
+        )
+
+    @staticmethod
+    def ensure_summary(user_id, module_id):
+        """
+        Add an empty ProgressSummary for a student and module unless one exists.
+        An INSERT ... ON CONFLICT DO NOTHING, so concurrent requests cannot
+        both insert. Returns the summary ID. Does not commit.
+        """
+        user_id = int(user_id)
+        row = {
+            'user_id': user_id,
+            'module_id': module_id,
+            'answered_word_ids': [],
+            'answered_words': 0,
+            'correct_questions': 0,
+            'total_questions': 0
+        }
+
+        statement = conflict_insert(ProgressSummary)
+        if statement is not None:
+            db.session.execute(statement.on_conflict_do_nothing(index_elements=['user_id', 'module_id']), [row])
+        elif not ProgressSummary.query.filter_by(user_id=user_id, module_id=module_id).first():
+            db.session.add(ProgressSummary(**row))
+            db.session.flush()
+
+        return db.session.query(ProgressSummary.id).filter_by(user_id=user_id, module_id=module_id).scalar()
+
+    @staticmethod
+    def record_answer(user_id, module_id, word_id, is_correct):
+        """
+        Update the summary for one new QuestionProgress row.
+
+        Must be called in the same transaction that adds the QuestionProgress,
+        so the summary never drifts from the attempt history. One INSERT ...
+        ON CONFLICT DO UPDATE (PostgreSQL and SQLite) creates the summary or
+        increments its counters and appends a newly answered word in SQL, so
+        concurrent answers never overwrite each other.
+        """
+        user_id = int(user_id)
+        now = datetime.utcnow()
+
+        statement = conflict_insert(ProgressSummary)
+        if statement is None:
+            # Other databases: read-modify-write
+            summary = ProgressSummary.query.filter_by(user_id=user_id, module_id=module_id).first()
+            if not summary:
+                summary = ProgressSummary(user_id=user_id, module_id=module_id, answered_word_ids=[],
+                                          answered_words=0, correct_questions=0, total_questions=0)
+                db.session.add(summary)
+            if word_id not in (summary.answered_word_ids or []):
+                summary.answered_word_ids = (summary.answered_word_ids or []) + [word_id]
+                summary.answered_words = (summary.answered_words or 0) + 1
+            summary.total_questions = (summary.total_questions or 0) + 1
+            summary.correct_questions = (summary.correct_questions or 0) + (1 if is_correct else 0)
+            return
+
+        answered, appended = ProgressService._answered_word_expressions(word_id)
+        statement = statement.values(
+            user_id=user_id,
+            module_id=module_id,
+            answered_word_ids=[word_id],
+            answered_words=1,
+            correct_questions=1 if is_correct else 0,
+            total_questions=1,
+            updated_at=now
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['user_id', 'module_id'],
+            set_={
+                'answered_word_ids': case((answered, ProgressSummary.answered_word_ids), else_=appended),
+                'answered_words': func.coalesce(ProgressSummary.answered_words, 0) + case((answered, 0), else_=1),
+                'correct_questions': func.coalesce(ProgressSummary.correct_questions, 0)
+                                     + statement.excluded.correct_questions,
+                'total_questions': func.coalesce(ProgressSummary.total_questions, 0) + 1,
+                'updated_at': now
+            }
+        ))
+
+    @staticmethod
+    def _answered_word_expressions(word_id):
+        """(word already in answered_word_ids, answered_word_ids with the word appended) as SQL"""
+        # Anything but a JSON array (SQL NULL, JSON null) counts as an empty list
+        if db.session.get_bind().dialect.name == 'postgresql':
+            stored = cast(ProgressSummary.answered_word_ids, JSONB)
+            current = case((func.jsonb_typeof(stored) == 'array', stored), else_=cast(EMPTY_LIST, JSONB))
+            word = cast([word_id], JSONB)
+            return current.contains(word), cast(current.op('||')(word), db.JSON)
+
+        # SQLite JSON1
+        stored = ProgressSummary.answered_word_ids
+        current = case((func.json_type(stored) == 'array', stored), else_=EMPTY_LIST)
+        answered = exists(
+            select(1).select_from(func.json_each(current).table_valued('value'))
+            .where(literal_column('value') == word_id)
+        )
+        return answered, func.json_insert(current, '$[#]', word_id)
+
+    @staticmethod
+    def missing_summaries(student_filter):
+        """
+        Summaries of the modules that students matching student_filter (e.g.
+        User.classroom_id == 5) started but that have no ProgressSummary row
+        yet, keyed by (user_id, module_id). Computed from QuestionProgress and
+        not stored: rebuild_progress_summaries.py --missing-only stores them.
+        """
+        missing = {tuple(row) for row in db.session.query(
+            StudentProgress.user_id,
+            StudentProgress.module_id
+        ).join(
+            User, User.id == StudentProgress.user_id
+        ).outerjoin(
+            ProgressSummary, and_(
+                ProgressSummary.user_id == StudentProgress.user_id,
+                ProgressSummary.module_id == StudentProgress.module_id
+            )
+        ).filter(
+            student_filter,
+            ProgressSummary.id.is_(None)
+        )}
+        if not missing:
+            return {}
+
+        computed = ProgressService.compute_summaries(
+            user_ids={user_id for user_id, _ in missing},
+            module_ids={module_id for _, module_id in missing}
+        )
+        return {key: summary for key, summary in computed.items() if key in missing}
+
+    @staticmethod
+    def get_question_progress(student_progress_id):
+        """Serialized QuestionProgress rows of a StudentProgress (single joined query)"""
+        questions = QuestionProgress.query.join(
+            BatteryProgress, BatteryProgress.id == QuestionProgress.battery_progress_id
+        ).filter(
+            BatteryProgress.student_progress_id == student_progress_id
+        ).order_by(
+            BatteryProgress.id, QuestionProgress.id
+        ).all()
+
+        return [q.to_dict() for q in questions]
+
+    @staticmethod
+    def compute_summaries(user_ids=None, module_ids=None):
+        """
+        Compute summaries from StudentProgress/QuestionProgress without storing
+        them: unsaved ProgressSummary objects keyed by (user_id, module_id).
+
+        Uses two grouped queries for the whole selection instead of walking
+        batteries per student.
+        """
+        def scoped(query):
+            if user_ids is not None:
+                query = query.filter(StudentProgress.user_id.in_(user_ids))
+            if module_ids is not None:
+                query = query.filter(StudentProgress.module_id.in_(module_ids))
+            return query
+
+        # Question counts per (student, module); outer joins keep started modules without answers
+        totals = scoped(db.session.query(
+            StudentProgress.user_id,
+            StudentProgress.module_id,
+            func.count(QuestionProgress.id),
+            func.sum(case((QuestionProgress.is_correct == True, 1), else_=0))
+        ).outerjoin(
+            BatteryProgress, BatteryProgress.student_progress_id == StudentProgress.id
+        ).outerjoin(
+            QuestionProgress, QuestionProgress.battery_progress_id == BatteryProgress.id
+        )).group_by(
+            StudentProgress.user_id, StudentProgress.module_id
+        ).all()
+
+        # Unique answered words per (student, module), in first-answered order
+        answered = {}
+        word_rows = scoped(db.session.query(
+            StudentProgress.user_id,
+            StudentProgress.module_id,
+            QuestionProgress.word_id
+        ).join(
+            BatteryProgress, BatteryProgress.student_progress_id == StudentProgress.id
+        ).join(
+            QuestionProgress, QuestionProgress.battery_progress_id == BatteryProgress.id
+        ).filter(
+            QuestionProgress.word_id.isnot(None)
+        )).group_by(
+            StudentProgress.user_id, StudentProgress.module_id, QuestionProgress.word_id
+        ).order_by(
+            func.min(QuestionProgress.id)
+        ).all()
+
+        for user_id, module_id, word_id in word_rows:
+            answered.setdefault((user_id, module_id), []).append(word_id)
+
+        summaries = {}
+        for user_id, module_id, total_questions, correct_questions in totals:
+            answered_word_ids = answered.get((user_id, module_id), [])
+            summaries[(user_id, module_id)] = ProgressSummary(
+                user_id=user_id,
+                module_id=module_id,
+                answered_word_ids=answered_word_ids,
+                answered_words=len(answered_word_ids),
+                total_questions=total_questions or 0,
+                correct_questions=int(correct_questions or 0)
+            )
+        return summaries
+
+    @staticmethod
+    def rebuild_summaries(user_ids=None, module_ids=None, missing_only=False, commit=True):
+        """
+        Recompute ProgressSummary rows from StudentProgress/QuestionProgress
+        (see compute_summaries). With missing_only=True, existing summaries
+        are left untouched and only absent ones are created.
+
+        Returns the number of summaries created or updated. Commits unless
+        commit=False (e.g. when part of a larger transaction).
+        """
+        computed = ProgressService.compute_summaries(user_ids=user_ids, module_ids=module_ids)
+
+        existing_query = ProgressSummary.query
+        if user_ids is not None:
+            existing_query = existing_query.filter(ProgressSummary.user_id.in_(user_ids))
+        if module_ids is not None:
+            existing_query = existing_query.filter(ProgressSummary.module_id.in_(module_ids))
+        existing = {(s.user_id, s.module_id): s for s in existing_query.all()}
+
+        updated = 0
+        for key, values in computed.items():
+            summary = existing.get(key)
+            if summary and missing_only:
+                continue
+
+            if not summary:
+                db.session.add(values)
+            else:
+                summary.answered_word_ids = values.answered_word_ids
+                summary.answered_words = values.answered_words
+                summary.total_questions = values.total_questions
+                summary.correct_questions = values.correct_questions
+            updated += 1
+
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+        return updated
+
+    @staticmethod
+    def get_classroom_matrix(classroom_id):
+        """
+        Build the student x module progress matrix for a classroom.
+
+        Uses a fixed number of queries regardless of attempt history:
+        students, active modules and the ProgressSummary rows of the
+        classroom (plus computing missing summaries, if any).
+        """
+        # Get all students in classroom (sorted alphabetically by email)
+        students = User.query.filter_by(classroom_id=classroom_id).order_by(User.email).all()
+
+        # Get all active modules (sorted by display_order)
+        modules = Module.query.filter_by(is_active=True).order_by(Module.display_order).all()
+        module_ids = [m.id for m in modules]
+
+        # Stored word counts of the listed modules
+        module_word_counts = {m.id: m.word_count or 0 for m in modules}
+
+        # Unique answered words per (student, module), read from the materialized summaries
+        answered_lookup = {}
+        if students and module_ids:
+            rows = db.session.query(
+                ProgressSummary.user_id,
+                ProgressSummary.module_id,
+                ProgressSummary.answered_words
+            ).join(
+                User, User.id == ProgressSummary.user_id
+            ).filter(
+                User.classroom_id == classroom_id,
+                ProgressSummary.module_id.in_(module_ids)
+            ).all()
+
+            for user_id, module_id, answered_words in rows:
+                answered_lookup.setdefault(user_id, {})[module_id] = answered_words or 0
+
+            # Progress that predates the summary table
+            for (user_id, module_id), summary in ProgressService.missing_summaries(
+                User.classroom_id == classroom_id
+            ).items():
+                if module_id in module_word_counts:
+                    answered_lookup.setdefault(user_id, {})[module_id] = summary.answered_words
+
+        # Build matrix data structure
+        matrix = []
+        for student in students:
+            student_row = {
+                'student_id': student.id,
+                'student_email': student.email,
+                'student_first_name': student.first_name,
+                'student_last_name': student.last_name,
+                'modules': {}
+            }
+
+            student_answered = answered_lookup.get(student.id, {})
+
+            for module in modules:
+                if module.id in student_answered:
+                    answered_words = student_answered[module.id]
+                    total_words = module_word_counts.get(module.id, 0)
+
+                    # Calculate completion percentage
+                    completion_percentage = (answered_words / total_words * 100) if total_words > 0 else 0
+
+                    student_row['modules'][module.id] = {
+                        'completion_percentage': round(completion_percentage, 1),
+                        'answered_words': answered_words,
+                        'total_words': total_words
+                    }
+                # If module not started, modules[module.id] will not exist (empty cell)
+
+            matrix.append(student_row)
+
+        return {
+            'students': matrix,
+            'modules': [{'id': m.id, 'name': m.name} for m in modules]
+        }
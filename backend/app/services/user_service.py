@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.user import User
+
+
+class UserService:
+    @staticmethod
+    def touch_activity(user):
+        """
+        Record user activity, but only when last_activity is older than
+        ACTIVITY_UPDATE_MINUTES, so repeated logins do not write the users row.
+        Returns whether last_activity changed (the caller commits).
+        """
+        now = datetime.utcnow()
+        interval = timedelta(minutes=current_app.config.get('ACTIVITY_UPDATE_MINUTES', 15))
+
+        if user.last_activity and now - user.last_activity < interval:
+            return False
+
+        user.last_activity = now
+        return True
+
+    @staticmethod
+    def delete_users(users, progress=None):
+        """
+        Delete users with all their progress (ORM cascades). Commits.
+
+        progress, if given, is called as progress(done, total) while deleting.
+        Returns the number of deleted users.
+        """
+        total = len(users)
+
+        for done, user in enumerate(users, start=1):
+            db.session.delete(user)
+            if progress and (done % 50 == 0 or done == total):
+                db.session.flush()
+                progress(done, total)
+
+        db.session.commit()
+        return total
+
+    @staticmethod
+    def delete_inactive_users(days=730, progress=None):
+        """Delete non-admin users inactive for the given number of days (default 2 years)"""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+
+        inactive_users = User.query.filter(
+            User.last_activity < cutoff_date,
+            User.role != 'admin'
+        ).all()
+
+        return UserService.delete_users(inactive_users, progress=progress)
+
+    @staticmethod
+    def bulk_delete_users(user_ids, progress=None):
+        """Delete the given users (admins are never deleted)"""
+        users = User.query.filter(User.id.in_(user_ids), User.role != 'admin').all()
+        return UserService.delete_users(users, progress=progress)
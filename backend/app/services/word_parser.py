@@ -0,0 +1,164 @@
+import csv
+import io
+
+
+class WordValidationError(ValueError):
+    """Raised when uploaded word rows fail validation; .errors holds the structured errors"""
+
+    def __init__(self, title, errors):
+        self.errors = errors
+        super().__init__(title + ':\n' + '\n'.join(WordParser.format_error(e) for e in errors))
+
+
+class WordParser:
+    """
+    Shared row pipeline for module uploads (CSV paste and Excel sheets).
+
+    Sources yield raw (row_number, values) pairs, validate() turns them into
+    validated rows or structured errors in a single pass. Nothing here
+    touches the database, so the same pipeline backs the dry-run endpoint.
+
+    Validated row: {'row': 2, 'word': ..., 'meaning': ..., 'example_sentence': ...}
+    Error:         {'row': 2, 'sheet': None, 'field': 'meaning', 'message': 'Meaning is missing'}
+    """
+
+    # Only allow common delimiters (comma, semicolon, tab, pipe)
+    VALID_DELIMITERS = [',', ';', '\t', '|']
+
+    @staticmethod
+    def detect_delimiter(csv_data):
+        """Auto-detect the CSV delimiter from the first 1KB"""
+        sample = csv_data[:1024]
+
+        try:
+            detected = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+            if detected in WordParser.VALID_DELIMITERS:
+                return detected
+        except csv.Error:
+            pass
+
+        # Fallback: Try semicolon first (common in European CSVs), then comma
+        if ';' in sample and sample.count(';') > sample.count(','):
+            return ';'
+        return ','
+
+    @staticmethod
+    def is_header(values):
+        """Whether a first row is a header row (e.g. "Word;Meaning;Sentence" or "Woord;...")"""
+        first = str(values[0]).strip().lower() if values and values[0] is not None else ''
+        return first in ['word', 'woord'] or 'word' in first
+
+    @staticmethod
+    def iter_csv(csv_data):
+        """Yield (row_number, values) for the data rows of a CSV string, skipping a header row"""
+        reader = csv.reader(io.StringIO(csv_data), delimiter=WordParser.detect_delimiter(csv_data))
+
+        for row_number, values in enumerate(reader, start=1):
+            if row_number == 1 and WordParser.is_header(values):
+                continue
+            yield row_number, values
+
+    @staticmethod
+    def iter_excel_sheet(sheet):
+        """Yield (row_number, values) for a worksheet; row 1 is the header (works on read-only sheets)"""
+        for row_number, values in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+            yield row_number, values
+
+    @staticmethod
+    def validate(raw_rows, sheet=None):
+        """
+        Validate raw (row_number, values) pairs.
+
+        Yields ('row', validated_row) or ('error', error) tuples; empty rows are skipped.
+        """
+        for row_number, values in raw_rows:
+            if not values or not any(values):
+                continue  # Skip empty rows
+
+            word_text, meaning, example_sentence = (
+                str(value).strip() if value is not None else ''
+                for value in (tuple(values) + (None, None, None))[:3]
+            )
+
+            if not word_text:
+                yield 'error', WordParser._error(row_number, sheet, 'word', 'Word is missing')
+            elif not meaning:
+                yield 'error', WordParser._error(row_number, sheet, 'meaning', 'Meaning is missing')
+            elif not example_sentence:
+                yield 'error', WordParser._error(row_number, sheet, 'example_sentence', 'Example sentence is missing')
+            elif example_sentence.count('*') < 2:
+                # The sentence must mark a word (or an inflected form) with asterisks,
+                # e.g. "Ambivalent" with "*ambivalente*" in the sentence
+                yield 'error', WordParser._error(
+                    row_number, sheet, 'example_sentence',
+                    'Example sentence must contain a word marked with asterisks (e.g., *word*)'
+                )
+            else:
+                yield 'row', {
+                    'row': row_number,
+                    'word': word_text,
+                    'meaning': meaning,
+                    'example_sentence': example_sentence
+                }
+
+    @staticmethod
+    def collect(raw_rows, sheet=None):
+        """
+        Run the pipeline to completion and return (rows, errors).
+
+        CSV syntax errors raised while reading are reported as a ValueError.
+        """
+        rows = []
+        errors = []
+
+        try:
+            for kind, item in WordParser.validate(raw_rows, sheet=sheet):
+                if kind == 'row':
+                    rows.append(item)
+                else:
+                    errors.append(item)
+        except csv.Error as e:
+            raise ValueError(f'CSV parse error: {str(e)}')
+
+        return rows, errors
+
+    @staticmethod
+    def parse_csv(csv_data):
+        """Validated rows of a CSV string; raises WordValidationError/ValueError if invalid or empty"""
+        rows, errors = WordParser.collect(WordParser.iter_csv(csv_data))
+
+        if errors:
+            raise WordValidationError('CSV validation errors', errors)
+        if not rows:
+            raise ValueError('No valid words found in CSV data')
+
+        return rows
+
+    @staticmethod
+    def parse_excel_sheet(sheet):
+        """Validated rows of a worksheet; raises WordValidationError/ValueError if invalid or empty"""
+        rows, errors = WordParser.collect(WordParser.iter_excel_sheet(sheet))
+
+        if errors:
+            raise WordValidationError('Excel validation errors', errors)
+        if not rows:
+            raise ValueError('No valid words found in Excel file')
+
+        return rows
+
+    @staticmethod
+    def format_error(error):
+        """Human readable error line, e.g. 'Sheet "Week 1": Row 4: Meaning is missing'"""
+        message = f"Row {error['row']}: {error['message']}"
+        if error.get('sheet'):
+            message = f'Sheet "{error["sheet"]}": {message}'
+        return message
+
+    @staticmethod
+    def _error(row_number, sheet, field, message):
+        return {
+            'row': row_number,
+            'sheet': sheet,
+            'field': field,
+            'message': message
+        }
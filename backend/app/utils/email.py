@@ -1,41 +1,18 @@
 from flask import current_app
 from flask_mail import Message
-from app import mail
-import os
-import threading
-import socket
-
-def _send_async_email(app, msg, to_email):
-    """Send email in background thread with timeout"""
-    # Set socket timeout to 30 seconds to prevent hanging
-    default_timeout = socket.getdefaulttimeout()
-    socket.setdefaulttimeout(30)
-
-    try:
-        with app.app_context():
-            mail.send(msg)
-            print(f"Password reset email sent successfully to {to_email}")
-    except Exception as e:
-        print(f"Failed to send email: {str(e)}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        # Restore default timeout
-        socket.setdefaulttimeout(default_timeout)
+from app.services.mail_dispatcher import MailDispatcher
 
 def send_verification_email(to_email, verification_token, frontend_url, first_name):
-    """Send email verification link via Flask-Mail in background thread"""
+    """Queue an email verification link in the outbox"""
 
     try:
-        app = current_app._get_current_object()
-
         verification_url = f"{frontend_url}/verify-email?token={verification_token}"
 
         # Create email message
         msg = Message(
             subject="Activeer je Octovoc account",
             recipients=[to_email],
-            sender=app.config.get('MAIL_DEFAULT_SENDER')
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER')
         )
 
         # Plain text version
@@ -91,40 +68,32 @@ Het Octovoc Team
 </html>
 """
 
-        # Send email in background thread
-        print(f"Starting background verification email send to {to_email}")
-        thread = threading.Thread(
-            target=_send_async_email,
-            args=(app, msg, to_email),
-            daemon=True
-        )
-        thread.start()
+        # Sent by the mail dispatcher (retried if the SMTP server is unavailable)
+        MailDispatcher.enqueue(msg)
 
-        print(f"Background verification email thread started for {to_email}")
+        print(f"Verification email queued for {to_email}")
         return True
 
     except Exception as e:
-        print(f"Failed to start verification email thread: {str(e)}")
+        print(f"Failed to queue verification email: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
 
 
 def send_password_reset_email(to_email, reset_token):
-    """Send password reset email via Flask-Mail in background thread"""
+    """Queue a password reset email in the outbox"""
 
     try:
-        app = current_app._get_current_object()
-
         # Get the frontend URL from config
-        frontend_url = app.config.get('FRONTEND_URL', 'https://www.octovoc.be')
+        frontend_url = current_app.config.get('FRONTEND_URL', 'https://www.octovoc.be')
         reset_url = f"{frontend_url}/reset-password?token={reset_token}"
 
         # Create email message
         msg = Message(
             subject="wachtwoord resetten",
             recipients=[to_email],
-            sender=app.config.get('MAIL_DEFAULT_SENDER')
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER')
         )
 
         # Plain text version
@@ -184,21 +153,14 @@ Het Octovoc Team
 </html>
 """
 
-        # Send email in background thread with daemon=True so it doesn't block shutdown
-        print(f"Starting background email send to {to_email}")
-        thread = threading.Thread(
-            target=_send_async_email,
-            args=(app, msg, to_email),
-            daemon=True
-        )
-        thread.start()
+        # Sent by the mail dispatcher; return immediately
+        MailDispatcher.enqueue(msg)
 
-        # Return immediately without waiting for email to send
-        print(f"Background email thread started for {to_email}")
+        print(f"Password reset email queued for {to_email}")
         return True
 
     except Exception as e:
-        print(f"Failed to start email thread: {str(e)}")
+        print(f"Failed to queue password reset email: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
@@ -206,19 +168,15 @@ Het Octovoc Team
 
 def send_order_email(name, email, phone, school_name, billing_address, num_classrooms, num_students, num_teacher_accounts):
     """Send quote PDF to customer and notification to admin"""
-    import os
-    import tempfile
     from app.services.pdf_service import generate_quote_pdf
 
     try:
-        app = current_app._get_current_object()
-
         # Calculate price (€0.95 per student)
         total_price = num_students * 0.95
 
         # Generate PDF quote
         try:
-            pdf_path = generate_quote_pdf(
+            pdf_filename, pdf_data = generate_quote_pdf(
                 name=name,
                 school_name=school_name,
                 billing_address=billing_address,
@@ -229,7 +187,7 @@ def send_order_email(name, email, phone, school_name, billing_address, num_class
         except Exception as e:
             print(f"Error generating PDF: {str(e)}")
             # Continue without PDF attachment
-            pdf_path = None
+            pdf_filename, pdf_data = None, None
 
         # Get first name for personalization
         first_name = name.split()[0] if name else 'daar'
@@ -238,7 +196,7 @@ def send_order_email(name, email, phone, school_name, billing_address, num_class
         customer_msg = Message(
             subject=f"Offerte Octovoc - {school_name}",
             recipients=[email],
-            sender=app.config.get('MAIL_DEFAULT_SENDER')
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER')
         )
 
         # Customer email body
@@ -257,19 +215,18 @@ Brabançonnestraat 73
 BE0643.557.881"""
 
         # Attach PDF if generated
-        if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, 'rb') as pdf_file:
-                customer_msg.attach(
-                    filename=os.path.basename(pdf_path),
-                    content_type='application/pdf',
-                    data=pdf_file.read()
-                )
+        if pdf_data:
+            customer_msg.attach(
+                filename=pdf_filename,
+                content_type='application/pdf',
+                data=pdf_data
+            )
 
         # === 2. Send notification to admin ===
         admin_msg = Message(
             subject=f"Offerte verzonden - {school_name}",
             recipients=['octovoc@katern.be'],
-            sender=app.config.get('MAIL_DEFAULT_SENDER'),
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER'),
             reply_to=email
         )
 
@@ -302,54 +259,21 @@ Bestelling:
 - Totaalprijs: € {total_price:.2f}"""
 
         # Attach PDF to admin email too
-        if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, 'rb') as pdf_file:
-                admin_msg.attach(
-                    filename=os.path.basename(pdf_path),
-                    content_type='application/pdf',
-                    data=pdf_file.read()
-                )
-
-        # Send both emails in background threads
-        print(f"Sending quote to customer: {email}")
-        customer_thread = threading.Thread(
-            target=_send_async_email,
-            args=(app, customer_msg, email),
-            daemon=True
-        )
-        customer_thread.start()
+        if pdf_data:
+            admin_msg.attach(
+                filename=pdf_filename,
+                content_type='application/pdf',
+                data=pdf_data
+            )
 
-        print(f"Sending notification to admin about order from {email}")
-        admin_thread = threading.Thread(
-            target=_send_async_email,
-            args=(app, admin_msg, 'octovoc@katern.be'),
-            daemon=True
-        )
-        admin_thread.start()
-
-        # Cleanup temp PDF file after a delay
-        if pdf_path:
-            def cleanup_pdf():
-                import time
-                time.sleep(60)  # Wait for emails to send
-                try:
-                    if os.path.exists(pdf_path):
-                        os.remove(pdf_path)
-                        temp_dir = os.path.dirname(pdf_path)
-                        if os.path.exists(temp_dir):
-                            import shutil
-                            shutil.rmtree(temp_dir, ignore_errors=True)
-                except:
-                    pass
-
-            cleanup_thread = threading.Thread(target=cleanup_pdf, daemon=True)
-            cleanup_thread.start()
+        # Quote to the customer and notification to the admin, sent by the mail dispatcher
+        MailDispatcher.enqueue_many([customer_msg, admin_msg])
 
         print(f"Quote emails queued for {email}")
         return True
 
     except Exception as e:
-        print(f"Failed to start order email thread: {str(e)}")
+        print(f"Failed to queue order emails: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
@@ -0,0 +1,38 @@
+"""Conditional GET helpers (ETag / If-None-Match / Cache-Control)"""
+import hashlib
+from flask import request, jsonify, current_app
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from the parts that determine a response"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_json(etag, build, public=True):
+    """
+    Return 304 Not Modified if the client already has this ETag, otherwise
+    jsonify(build()) with the ETag attached.
+
+    build is only called on a cache miss, so the response body is never
+    serialized for a matching If-None-Match.
+
+    public=True: anonymous data, cacheable by browsers and CDNs for
+    HTTP_CACHE_MAX_AGE seconds. public=False: per-user data, the client
+    may store it but has to revalidate on every use.
+    """
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+
+    response.set_etag(etag)
+
+    if public:
+        max_age = current_app.config.get('HTTP_CACHE_MAX_AGE', 60)
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+        # Authenticated requests to the same URL get per-user data
+        response.vary.add('Authorization')
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+
+    return response
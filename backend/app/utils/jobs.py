@@ -0,0 +1,21 @@
+"""Helpers for endpoints that can run as background jobs (?async=true)"""
+from flask import request, jsonify
+
+
+def async_requested():
+    """Whether the client asked to run this request as a background job"""
+    return request.args.get('async', 'false').lower() in ('1', 'true', 'yes')
+
+
+def job_accepted(job):
+    """202 Accepted response pointing the client at the job status endpoint"""
+    status_url = f'/api/jobs/{job.id}'
+    response = jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'result_url': f'{status_url}/result'
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
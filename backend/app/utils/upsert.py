@@ -0,0 +1,17 @@
+"""INSERT ... ON CONFLICT for the connected database"""
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+
+def conflict_insert(model):
+    """
+    INSERT construct of the connected database that supports
+    on_conflict_do_nothing / on_conflict_do_update (PostgreSQL and SQLite),
+    or None on other databases (callers fall back to a lookup first).
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    return None
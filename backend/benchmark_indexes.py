@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Benchmark the progress indexes (migration 011) on generated data.
+
+Builds a scratch database with about a million question_progress rows and
+prints the query plan and timing of the hot lookups, first without and
+then with the indexes.
+
+Usage:
+    python benchmark_indexes.py                                # scratch SQLite file
+    python benchmark_indexes.py postgresql://localhost/scratch # an empty scratch database
+    python benchmark_indexes.py --rows 200000                  # fewer question_progress rows
+
+All tables in the given database are dropped first: never point this at a
+real database.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from app import db
+from app.models.user import User
+from app.models.school import School
+from app.models.classroom import Classroom
+from app.models.code import ClassCode, TeacherCode  # Referenced by users/classrooms foreign keys
+from app.models.module import Module, Word, Battery, DifficultWord
+from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress
+
+INDEX_NAMES = [
+    'ix_student_progress_user_module',
+    'ix_battery_progress_student_progress_battery',
+    'ix_question_progress_battery_progress_id',
+    'ix_question_progress_word_correct_answered',
+    'ix_words_module_position',
+    'ix_users_classroom_id',
+]
+
+MODULES = 20
+WORDS_PER_MODULE = 100
+BATTERY_SIZE = 20
+MODULES_PER_STUDENT = 4
+QUESTIONS_PER_BATTERY = 10
+STUDENTS_PER_CLASSROOM = 25
+CHUNK_SIZE = 10000
+
+QUERIES = [
+    ('student progress for a module',
+     'SELECT * FROM student_progress WHERE user_id = :user_id AND module_id = :module_id'),
+    ('battery progress',
+     'SELECT * FROM battery_progress WHERE student_progress_id = :student_progress_id AND battery_id = :battery_id'),
+    ('answers of a battery',
+     'SELECT * FROM question_progress WHERE battery_progress_id = :battery_progress_id'),
+    ('incorrect answers per word (teacher statistics)',
+     'SELECT words.id, COUNT(question_progress.id) FROM words '
+     'JOIN question_progress ON question_progress.word_id = words.id '
+     'WHERE words.module_id = :module_id AND question_progress.is_correct = :incorrect '
+     'AND question_progress.answered_at >= :since GROUP BY words.id'),
+    ('difficult word of a student',
+     'SELECT * FROM difficult_words WHERE user_id = :user_id AND word_id = :word_id'),
+    ('words of a module in order',
+     'SELECT * FROM words WHERE module_id = :module_id ORDER BY position_in_module'),
+    ('students of a classroom',
+     'SELECT * FROM users WHERE classroom_id = :classroom_id'),
+]
+
+
+def _insert(conn, table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        conn.execute(table.insert(), rows[start:start + CHUNK_SIZE])
+
+
+def generate_data(engine, question_rows):
+    """Fill the scratch database; returns the parameters used by the queries"""
+    students = max(question_rows // (MODULES_PER_STUDENT * (WORDS_PER_MODULE // BATTERY_SIZE) * QUESTIONS_PER_BATTERY), 1)
+    classrooms = max(students // STUDENTS_PER_CLASSROOM, 1)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        _insert(conn, School.__table__, [{'id': 1, 'school_code': 'BNCH', 'school_name': 'Benchmark'}])
+        _insert(conn, User.__table__, [{'id': 1, 'email': 'teacher@benchmark', 'password_hash': 'x', 'role': 'teacher'}])
+        _insert(conn, Classroom.__table__, [
+            {'id': i, 'name': f'Klas {i}', 'teacher_id': 1, 'school_id': 1} for i in range(1, classrooms + 1)
+        ])
+        _insert(conn, User.__table__, [
+            {'id': i + 2, 'email': f'student{i}@benchmark', 'password_hash': 'x', 'role': 'student',
+             'classroom_id': i % classrooms + 1}
+            for i in range(students)
+        ])
+        _insert(conn, Module.__table__, [
+            {'id': i, 'name': f'Module {i}', 'level': 1, 'word_count': WORDS_PER_MODULE,
+             'battery_count': WORDS_PER_MODULE // BATTERY_SIZE}
+            for i in range(1, MODULES + 1)
+        ])
+
+        words = {}
+        word_rows = []
+        battery_rows = []
+        for module_id in range(1, MODULES + 1):
+            word_ids = list(range((module_id - 1) * WORDS_PER_MODULE + 1, module_id * WORDS_PER_MODULE + 1))
+            word_rows += [
+                {'id': word_id, 'module_id': module_id, 'word': f'woord{word_id}', 'meaning': '-',
+                 'example_sentence': '-', 'position_in_module': position}
+                for position, word_id in enumerate(word_ids, start=1)
+            ]
+            for number, start in enumerate(range(0, WORDS_PER_MODULE, BATTERY_SIZE), start=1):
+                battery_id = len(battery_rows) + 1
+                battery_rows.append({'id': battery_id, 'module_id': module_id, 'battery_number': number,
+                                     'word_ids': word_ids[start:start + BATTERY_SIZE]})
+                words[battery_id] = word_ids[start:start + BATTERY_SIZE]
+        _insert(conn, Word.__table__, word_rows)
+        _insert(conn, Battery.__table__, battery_rows)
+
+        batteries_by_module = {}
+        for battery in battery_rows:
+            batteries_by_module.setdefault(battery['module_id'], []).append(battery['id'])
+
+        student_rows, battery_progress_rows, difficult_rows = [], [], []
+        for user_id in range(2, students + 2):
+            for module_id in random.sample(range(1, MODULES + 1), MODULES_PER_STUDENT):
+                student_progress_id = len(student_rows) + 1
+                student_rows.append({'id': student_progress_id, 'user_id': user_id, 'module_id': module_id})
+                battery_progress_rows += [
+                    {'id': len(battery_progress_rows) + i, 'student_progress_id': student_progress_id,
+                     'battery_id': battery_id}
+                    for i, battery_id in enumerate(batteries_by_module[module_id], start=1)
+                ]
+                difficult_rows += [{'user_id': user_id, 'word_id': word_id}
+                                   for word_id in random.sample(words[batteries_by_module[module_id][0]], 3)]
+        _insert(conn, StudentProgress.__table__, student_rows)
+        _insert(conn, BatteryProgress.__table__, battery_progress_rows)
+        _insert(conn, DifficultWord.__table__, difficult_rows)
+
+        # Written in chunks to keep memory bounded
+        question_rows_buffer = []
+        question_id = 0
+        for battery_progress in battery_progress_rows:
+            for _ in range(QUESTIONS_PER_BATTERY):
+                question_id += 1
+                question_rows_buffer.append({
+                    'id': question_id,
+                    'battery_progress_id': battery_progress['id'],
+                    'word_id': random.choice(words[battery_progress['battery_id']]),
+                    'phase': random.randint(1, 3),
+                    'user_answer': '-',
+                    'is_correct': random.random() < 0.7,
+                    'answered_at': now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+                })
+
+            if len(question_rows_buffer) >= CHUNK_SIZE * 10:
+                _insert(conn, QuestionProgress.__table__, question_rows_buffer)
+                question_rows_buffer = []
+                print(f"   {question_id} question_progress rows", end='\r', flush=True)
+
+        _insert(conn, QuestionProgress.__table__, question_rows_buffer)
+        print(f"   {question_id} question_progress rows")
+
+    sample_progress = random.choice(student_rows)
+    sample_battery = random.choice(battery_progress_rows)
+    sample_difficult = random.choice(difficult_rows)
+    return {
+        'user_id': sample_progress['user_id'],
+        'module_id': sample_progress['module_id'],
+        'student_progress_id': sample_battery['student_progress_id'],
+        'battery_id': sample_battery['battery_id'],
+        'battery_progress_id': sample_battery['id'],
+        'incorrect': False,
+        'since': now - timedelta(days=30),
+        'word_id': sample_difficult['word_id'],
+        'classroom_id': random.randint(1, classrooms),
+    }
+
+
+def explain(conn, sql, params):
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)]
+    return [row[0] for row in conn.execute(text(f'EXPLAIN {sql}'), params)]
+
+
+def run_queries(engine, params, repeat=20):
+    with engine.connect() as conn:
+        conn.execute(text('ANALYZE'))
+        for label, sql in QUERIES:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).fetchall()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+
+            print(f"\n{label}: {elapsed:.2f} ms")
+            for line in explain(conn, sql, params):
+                print(f"   {line}")
+        conn.commit()
+
+
+def benchmark_indexes(database_url, question_rows):
+    engine = create_engine(database_url)
+    indexes = [index for table in db.metadata.tables.values() for index in table.indexes
+               if index.name in INDEX_NAMES]
+
+    print(f"📦 Creating scratch schema in {engine.url.render_as_string(hide_password=True)}")
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    for index in indexes:
+        index.drop(bind=engine)
+
+    print(f"🎲 Generating {question_rows} question_progress rows...")
+    params = generate_data(engine, question_rows)
+
+    print("\n=== Without indexes ===")
+    run_queries(engine, params)
+
+    print("\n🔨 Creating indexes...")
+    start = time.perf_counter()
+    for index in indexes:
+        index.create(bind=engine)
+    print(f"   {len(indexes)} indexes in {time.perf_counter() - start:.1f} s")
+
+    print("\n=== With indexes ===")
+    run_queries(engine, params)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    rows = 1000000
+    if '--rows' in args:
+        position = args.index('--rows')
+        rows = int(args[position + 1])
+        del args[position:position + 2]
+
+    url = args[0] if args else 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'octovoc_index_benchmark.db')
+    benchmark_indexes(url, rows)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Check the stored word/battery counts of all modules against the actual rows.
+
+Usage:
+    python check_module_counts.py        # report mismatches (exit code 1 if any)
+    python check_module_counts.py --fix  # report and correct mismatches
+"""
+import sys
+from app import create_app
+from app.services.module_service import ModuleService
+
+def check_module_counts(fix=False):
+    """Report (and optionally fix) modules whose stored counts are out of date"""
+    app = create_app()
+
+    with app.app_context():
+        mismatches = ModuleService.check_counts(fix=fix)
+
+        if not mismatches:
+            print("✓ All module counts are consistent")
+            return True
+
+        for module_id, stored, actual in mismatches:
+            print(f"✗ Module {module_id}: stored words/batteries {stored[0]}/{stored[1]}, "
+                  f"actual {actual[0]}/{actual[1]}")
+
+        if fix:
+            print(f"✓ Fixed {len(mismatches)} modules")
+            return True
+
+        return False
+
+if __name__ == '__main__':
+    if not check_module_counts(fix='--fix' in sys.argv[1:]):
+        sys.exit(1)
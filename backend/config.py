@@ -39,3 +39,53 @@ class Config:
     # Upload Configuration
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+
+    # Module content cache (seconds between version checks per cached module)
+    MODULE_CACHE_CHECK_SECONDS = int(os.getenv('MODULE_CACHE_CHECK_SECONDS', 5))
+
+    # Lifetime of the signed session token of anonymous (free module) play, in seconds
+    EXERCISE_SESSION_MAX_AGE = int(os.getenv('EXERCISE_SESSION_MAX_AGE', 86400))
+
+    # HTTP caching of anonymous catalog responses (seconds browsers/CDNs may reuse them)
+    HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 60))
+
+    # Active quote ID cache (seconds before a worker reloads the list)
+    QUOTE_CACHE_SECONDS = int(os.getenv('QUOTE_CACHE_SECONDS', 300))
+
+    # Background jobs: 'thread' runs them in the web process, 'worker' leaves them to run_jobs.py
+    JOB_RUNNER = os.getenv('JOB_RUNNER', 'thread')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_POLL_SECONDS = int(os.getenv('JOB_POLL_SECONDS', 2))
+    JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+    # Jobs still 'running' after this many minutes belong to a stopped process and are failed;
+    # the thread runner checks for those and for orphaned queued jobs every JOB_RECOVERY_SECONDS
+    JOB_STALE_MINUTES = int(os.getenv('JOB_STALE_MINUTES', 60))
+    JOB_RECOVERY_SECONDS = int(os.getenv('JOB_RECOVERY_SECONDS', 60))
+
+    # PDF report rendering: worker processes (reportlab is CPU-bound), 0 renders in the web process
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 1))
+
+    # Quote PDFs (LibreOffice): long-lived LibreOffice listeners per process (one conversion each at a time,
+    # needs LibreOffice's uno module), cached PDFs, conversion timeout (seconds)
+    QUOTE_RENDER_WORKERS = int(os.getenv('QUOTE_RENDER_WORKERS', 1))
+    QUOTE_PDF_CACHE_SIZE = int(os.getenv('QUOTE_PDF_CACHE_SIZE', 32))
+    QUOTE_PDF_TIMEOUT = int(os.getenv('QUOTE_PDF_TIMEOUT', 60))
+
+    # Email outbox dispatcher: sender threads per process, emails per SMTP connection,
+    # SMTP socket timeout, retries with exponential backoff, idle poll interval (seconds)
+    MAIL_DISPATCH_WORKERS = int(os.getenv('MAIL_DISPATCH_WORKERS', 1))
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+    MAIL_TIMEOUT = int(os.getenv('MAIL_TIMEOUT', 30))
+    MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+    MAIL_RETRY_BASE_SECONDS = int(os.getenv('MAIL_RETRY_BASE_SECONDS', 60))
+    MAIL_DISPATCH_POLL_SECONDS = int(os.getenv('MAIL_DISPATCH_POLL_SECONDS', 10))
+
+    # Password hashing: werkzeug method string (changing it re-hashes passwords on the next login)
+    # and the number of hashes computed at the same time, kept below the gunicorn request threads
+    # (GUNICORN_THREADS, see entrypoint.py) so logins never occupy every thread
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+    PASSWORD_HASH_WORKERS = max(min(int(os.getenv('PASSWORD_HASH_WORKERS', 2)), GUNICORN_THREADS - 1), 1)
+
+    # Minimum minutes between last_activity writes for the same user
+    ACTIVITY_UPDATE_MINUTES = int(os.getenv('ACTIVITY_UPDATE_MINUTES', 15))
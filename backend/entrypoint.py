@@ -55,6 +55,13 @@ def main():
     ):
         print("WARNING: Column fix failed, but continuing...")
 
+    # Backfill progress summaries for progress that predates them
+    if not run_command(
+        '/opt/venv/bin/python rebuild_progress_summaries.py --missing-only',
+        'Backfilling progress summaries'
+    ):
+        print("WARNING: Progress summary backfill failed, but continuing...")
+
     # Seed admin user
     if not run_command(
         '/opt/venv/bin/python seed_admin.py',
@@ -81,7 +88,9 @@ def main():
         '--bind', f'0.0.0.0:{port}',
         '--access-logfile', '-',
         '--error-logfile', '-',
-        '--workers', '2'
+        '--workers', '2',
+        # Threads keep serving requests while others wait on password hashing or exports
+        '--threads', os.getenv('GUNICORN_THREADS', '4')
     ])
 
 if __name__ == '__main__':
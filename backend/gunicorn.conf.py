@@ -0,0 +1,10 @@
+"""
+Gunicorn settings shared by every start command (gunicorn reads
+./gunicorn.conf.py by default).
+"""
+
+
+def post_worker_init(worker):
+    """Start the outbox and job threads in each worker once it has loaded the app"""
+    from run import start_background_threads
+    start_background_threads(worker.wsgi)
@@ -0,0 +1,48 @@
+"""Store inflected forms on words
+
+Revision ID: 005_add_inflected_forms_to_words
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def extract_inflected_forms(example_sentence):
+    """Same extraction as Word.extract_inflected_forms (kept here so the migration is self-contained)"""
+    forms = []
+    for match in re.findall(r'\*([^*]+)\*', example_sentence or ''):
+        if match not in forms:
+            forms.append(match)
+    return forms
+
+
+def upgrade():
+    # Add inflected_forms column to words (JSON array of marked forms)
+    with op.batch_alter_table('words', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('inflected_forms', sa.JSON(), nullable=True))
+
+    # Backfill existing words from their example sentences
+    connection = op.get_bind()
+    rows = connection.execute(sa.text('SELECT id, example_sentence FROM words')).fetchall()
+
+    for word_id, example_sentence in rows:
+        connection.execute(
+            sa.text('UPDATE words SET inflected_forms = :forms WHERE id = :id'),
+            {'forms': json.dumps(extract_inflected_forms(example_sentence)), 'id': word_id}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('words', schema=None) as batch_op:
+        batch_op.drop_column('inflected_forms')
@@ -0,0 +1,38 @@
+"""Add materialized progress summaries
+
+Revision ID: 006_add_progress_summaries
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows are filled by rebuild_progress_summaries.py (run from entrypoint.py)
+    op.create_table('progress_summaries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('answered_word_ids', sa.JSON(), nullable=True),
+        sa.Column('answered_words', sa.Integer(), nullable=True),
+        sa.Column('correct_questions', sa.Integer(), nullable=True),
+        sa.Column('total_questions', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'module_id', name='uq_progress_summaries_user_module')
+    )
+
+
+def downgrade():
+    op.drop_table('progress_summaries')
@@ -0,0 +1,36 @@
+"""Store word and battery counts on modules
+
+Revision ID: 007_add_counts_to_modules
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('modules', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('battery_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill counts for existing modules
+    connection = op.get_bind()
+    connection.execute(sa.text(
+        "UPDATE modules SET "
+        "word_count = (SELECT COUNT(*) FROM words WHERE words.module_id = modules.id), "
+        "battery_count = (SELECT COUNT(*) FROM batteries WHERE batteries.module_id = modules.id)"
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('modules', schema=None) as batch_op:
+        batch_op.drop_column('battery_count')
+        batch_op.drop_column('word_count')
@@ -0,0 +1,30 @@
+"""Add updated_at to quotes
+
+Revision ID: 008_add_updated_at_to_quotes
+Revises: 007
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quotes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing quotes were last changed when they were created (as far as we know)
+    connection = op.get_bind()
+    connection.execute(sa.text("UPDATE quotes SET updated_at = created_at"))
+
+
+def downgrade():
+    with op.batch_alter_table('quotes', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
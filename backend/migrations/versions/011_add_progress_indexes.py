@@ -0,0 +1,71 @@
+"""Add composite indexes for progress lookups
+
+Revision ID: 011_add_progress_indexes
+Revises: 010
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, unique) - unique where the code does filter_by(...).first(), as in the models
+INDEXES = [
+    ('ix_student_progress_user_module', 'student_progress', ['user_id', 'module_id'], True),
+    ('ix_battery_progress_student_progress_battery', 'battery_progress', ['student_progress_id', 'battery_id'], True),
+    ('ix_question_progress_battery_progress_id', 'question_progress', ['battery_progress_id'], False),
+    ('ix_question_progress_word_correct_answered', 'question_progress', ['word_id', 'is_correct', 'answered_at'], False),
+    ('ix_difficult_words_user_word', 'difficult_words', ['user_id', 'word_id'], False),
+    ('ix_words_module_position', 'words', ['module_id', 'position_in_module'], False),
+    ('ix_users_classroom_id', 'users', ['classroom_id'], False),
+]
+
+
+def _count_duplicates(table, columns):
+    column_list = ', '.join(columns)
+    return op.get_bind().execute(sa.text(
+        f'SELECT COUNT(*) FROM (SELECT 1 FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1) AS duplicates'
+    )).scalar()
+
+
+def upgrade():
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+
+    # Check existing rows first: a unique index over duplicates would fail halfway.
+    # Duplicated progress rows have their own answers, so they are not merged automatically.
+    problems = []
+    for name, table, columns, unique in INDEXES:
+        duplicates = unique and _count_duplicates(table, columns)
+        if duplicates:
+            column_list = ', '.join(columns)
+            problems.append(
+                f"{table}: {duplicates} duplicated ({column_list}) combinations, see "
+                f"SELECT {column_list}, COUNT(*) FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1"
+            )
+    if problems:
+        raise RuntimeError(
+            "Cannot create the unique progress indexes, merge or delete the duplicate rows first:\n"
+            + '\n'.join(problems)
+        )
+
+    if not is_postgresql:
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique)
+        return
+
+    # question_progress is large: build concurrently so answers keep being written
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade():
+    for name, table, columns, unique in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
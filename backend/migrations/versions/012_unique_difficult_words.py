@@ -0,0 +1,35 @@
+"""Make difficult words unique per student
+
+Revision ID: 012_unique_difficult_words
+Revises: 011
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the oldest row of every (user_id, word_id) pair
+    op.execute(
+        'DELETE FROM difficult_words WHERE id NOT IN '
+        '(SELECT MIN(id) FROM difficult_words GROUP BY user_id, word_id)'
+    )
+
+    # The unique constraint's index replaces the plain one from 011
+    op.drop_index('ix_difficult_words_user_word', table_name='difficult_words')
+    with op.batch_alter_table('difficult_words', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_difficult_words_user_word', ['user_id', 'word_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('difficult_words', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_difficult_words_user_word', type_='unique')
+    op.create_index('ix_difficult_words_user_word', 'difficult_words', ['user_id', 'word_id'], unique=False)
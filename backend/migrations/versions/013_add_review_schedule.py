@@ -0,0 +1,45 @@
+"""Add review schedule to difficult words
+
+Revision ID: 013_add_review_schedule
+Revises: 012
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('difficult_words', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ease', sa.Float(), nullable=False, server_default='2.5'))
+        batch_op.add_column(sa.Column('interval_days', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('repetitions', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('lapses', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('due_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_reviewed_at', sa.DateTime(), nullable=True))
+
+    # Existing words are due right away
+    op.execute('UPDATE difficult_words SET due_at = COALESCE(added_at, CURRENT_TIMESTAMP)')
+
+    with op.batch_alter_table('difficult_words', schema=None) as batch_op:
+        batch_op.alter_column('due_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index('ix_difficult_words_user_due', 'difficult_words', ['user_id', 'due_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_difficult_words_user_due', table_name='difficult_words')
+    with op.batch_alter_table('difficult_words', schema=None) as batch_op:
+        batch_op.drop_column('last_reviewed_at')
+        batch_op.drop_column('due_at')
+        batch_op.drop_column('lapses')
+        batch_op.drop_column('repetitions')
+        batch_op.drop_column('interval_days')
+        batch_op.drop_column('ease')
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+"""
+Rebuild the materialized progress summaries from the question history.
+
+Usage:
+    python rebuild_progress_summaries.py                 # recompute all summaries
+    python rebuild_progress_summaries.py --missing-only  # only create absent summaries
+"""
+import sys
+from app import create_app
+from app.services.progress_service import ProgressService
+
+def rebuild_progress_summaries(missing_only=False):
+    """Recompute ProgressSummary rows for every StudentProgress"""
+    app = create_app()
+
+    with app.app_context():
+        updated = ProgressService.rebuild_summaries(missing_only=missing_only)
+        print(f"✓ Rebuilt {updated} progress summaries")
+
+if __name__ == '__main__':
+    rebuild_progress_summaries(missing_only='--missing-only' in sys.argv[1:])
@@ -1,7 +1,23 @@
 from app import create_app, db
+from app.services.job_service import JobService
+from app.services.mail_dispatcher import MailDispatcher
 
 app = create_app()
 
+
+def start_background_threads(app):
+    """
+    Start the background threads of a serving process. Called by gunicorn
+    after a worker booted (gunicorn.conf.py) and by the dev server below;
+    never on import, so CLI commands such as 'flask db upgrade' start none.
+    """
+    # Send queued outbox emails (including ones left over from a previous run)
+    MailDispatcher.start(app)
+
+    # Pick up background jobs a previous run left queued or running (JOB_RUNNER=thread)
+    JobService.start(app)
+
+
 @app.route('/health')
 def health_check():
     """Health check endpoint with database stats"""
@@ -51,4 +67,8 @@ def make_shell_context():
     }
 
 if __name__ == '__main__':
+    import os
+    # Only in the reloader's child process, which serves the requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_threads(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Background job worker: runs queued jobs from the jobs table.
+
+Only needed with JOB_RUNNER=worker; with the default JOB_RUNNER=thread the
+web process runs jobs itself. Both can run at the same time, a job is
+only ever claimed once.
+
+Usage:
+    python run_jobs.py          # poll for jobs until stopped
+    python run_jobs.py --once   # run the queued jobs and exit (e.g. from cron)
+"""
+import sys
+import time
+from app import create_app
+from app.services.job_service import JobService
+
+def run_jobs(once=False):
+    """Run queued jobs, polling every JOB_POLL_SECONDS unless once=True"""
+    app = create_app()
+
+    with app.app_context():
+        stale = JobService.fail_stale(app.config.get('JOB_STALE_MINUTES', 60))
+        if stale:
+            print(f"✗ Marked {stale} stale jobs as failed")
+
+        poll_seconds = app.config.get('JOB_POLL_SECONDS', 2)
+        print(f"Job worker started (poll every {poll_seconds}s)")
+
+        while True:
+            count = JobService.run_pending()
+            if count:
+                print(f"✓ Ran {count} jobs")
+
+            if once:
+                JobService.purge_finished()
+                return
+
+            if not count:
+                time.sleep(poll_seconds)
+
+if __name__ == '__main__':
+    try:
+        run_jobs(once='--once' in sys.argv[1:])
+    except KeyboardInterrupt:
+        print("Job worker stopped")
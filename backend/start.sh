@@ -22,6 +22,10 @@ cd /app
     /opt/venv/bin/flask db upgrade || echo "Migration upgrade failed"
 }
 
+# Backfill progress summaries for progress that predates them
+echo "Backfilling progress summaries..."
+/opt/venv/bin/python rebuild_progress_summaries.py --missing-only || echo "Progress summary backfill failed"
+
 # Seed admin user if not exists
 echo "Seeding admin user..."
 /opt/venv/bin/python seed_admin.py || echo "Admin seeding skipped or failed"
@@ -30,4 +34,4 @@ echo "========================================="
 echo "Starting Gunicorn Server..."
 echo "========================================="
 # Start the application
-exec /opt/venv/bin/gunicorn run:app --bind 0.0.0.0:$PORT --access-logfile - --error-logfile -
+exec /opt/venv/bin/gunicorn run:app --bind 0.0.0.0:$PORT --threads 4 --access-logfile - --error-logfile -
@@ -0,0 +1,195 @@
+"""
+Behavior test for difficult words (DifficultWord.add and the student routes).
+
+Checks that adding a word is a single INSERT ... ON CONFLICT without a
+lookup first, and that adding a word twice, or twice in one call, keeps one
+row with its schedule unchanged. Also checks the review schedule: a miss on
+a word already there is one lapse per day, correct reviews move the word
+1, 6 and then interval * ease days ahead, and only due words are served.
+
+Usage:
+    python test_difficult_words.py
+"""
+from datetime import datetime, timedelta
+from app import db
+from app.models.module import Word, DifficultWord
+from test_support import create_test_app, add_user, add_module, auth_headers, count_statements
+
+
+def word_ids(module_id):
+    return [w.id for w in Word.query.filter_by(module_id=module_id).order_by(Word.position_in_module)]
+
+
+def test_add_is_one_statement(app):
+    with app.app_context():
+        user_id = add_user('een@test').id
+        ids = word_ids(add_module('Een insert', word_count=3).id)
+
+        with count_statements() as statements:
+            DifficultWord.add(user_id, ids)
+        assert len(statements) == 1
+        assert 'ON CONFLICT' in statements[0].upper()
+        db.session.commit()
+
+        assert DifficultWord.query.filter_by(user_id=user_id).count() == 3
+
+
+def test_duplicates_keep_one_row(app):
+    with app.app_context():
+        user_id = add_user('dubbel@test').id
+        ids = word_ids(add_module('Dubbel', word_count=3).id)
+
+        DifficultWord.add(user_id, [ids[0], ids[0], ids[1]])
+        db.session.commit()
+        first = DifficultWord.query.filter_by(user_id=user_id, word_id=ids[0]).one()
+        first.ease = 2.1
+        db.session.commit()
+
+        # Adding again (as another request would) skips the existing words
+        DifficultWord.add(str(user_id), ids[0])
+        DifficultWord.add(user_id, ids)
+        db.session.commit()
+        db.session.expire_all()
+
+        rows = DifficultWord.query.filter_by(user_id=user_id).order_by(DifficultWord.word_id).all()
+        assert [row.word_id for row in rows] == ids
+        assert rows[0].ease == 2.1
+        assert rows[0].lapses == 0
+
+
+def test_list_route(app):
+    with app.app_context():
+        user_id = add_user('lijst@test').id
+        module = add_module('Lijst', word_count=3)
+        module.case_sensitive = True
+        db.session.commit()
+        ids = word_ids(module.id)
+        other_ids = word_ids(add_module('Andere lijst', word_count=2, prefix='ander').id)
+        DifficultWord.add(user_id, ids + other_ids)
+        db.session.commit()
+        headers = auth_headers(user_id)
+
+    client = app.test_client()
+    response = client.get('/api/student/difficult-words', headers=headers)
+    assert response.status_code == 200
+    assert [row['word_id'] for row in response.get_json()] == ids + other_ids
+    assert response.get_json()[0]['word']['case_sensitive'] is True
+
+    response = client.get('/api/student/difficult-words?page=1&per_page=2', headers=headers)
+    assert len(response.get_json()) == 2
+    assert response.headers['X-Total-Count'] == '5'
+
+    with app.app_context():
+        other_module_id = db.session.get(Word, other_ids[0]).module_id
+    response = client.get(f'/api/student/difficult-words?module_id={other_module_id}', headers=headers)
+    assert [row['word_id'] for row in response.get_json()] == other_ids
+
+
+def add_seen(user_id, word_id, days_ago):
+    """Difficult word last added or reviewed days_ago days ago"""
+    DifficultWord.add(user_id, word_id)
+    db.session.commit()
+    seen_at = datetime.utcnow() - timedelta(days=days_ago)
+    DifficultWord.query.filter_by(user_id=user_id, word_id=word_id).update({'added_at': seen_at, 'due_at': seen_at})
+    db.session.commit()
+
+
+def schedule(user_id, word_id):
+    db.session.expire_all()
+    difficult_word = DifficultWord.query.filter_by(user_id=user_id, word_id=word_id).one()
+    return round(difficult_word.ease, 2), difficult_word.lapses, difficult_word.interval_days
+
+
+def test_one_lapse_per_day(app):
+    with app.app_context():
+        user_id = add_user('misser@test').id
+        word_id = word_ids(add_module('Lapses', word_count=2).id)[0]
+        add_seen(user_id, word_id, days_ago=3)
+
+        DifficultWord.add(user_id, word_id, lapse=True)
+        db.session.commit()
+        assert schedule(user_id, word_id) == (2.3, 1, 0)
+
+        # Another miss the same day changes nothing
+        DifficultWord.add(user_id, [word_id], lapse=True)
+        db.session.commit()
+        assert schedule(user_id, word_id) == (2.3, 1, 0)
+
+        # The next day it is a lapse again
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        DifficultWord.query.filter_by(user_id=user_id, word_id=word_id).update({'last_reviewed_at': yesterday})
+        db.session.commit()
+        DifficultWord.add(user_id, word_id, lapse=True)
+        db.session.commit()
+        assert schedule(user_id, word_id) == (2.1, 2, 0)
+
+
+def test_no_lapse_for_word_added_today(app):
+    with app.app_context():
+        user_id = add_user('nieuw@test').id
+        new_id, old_id = word_ids(add_module('Vandaag', word_count=2).id)
+        add_seen(user_id, old_id, days_ago=2)
+
+        # The miss that added the word is not counted again as a lapse
+        DifficultWord.add(user_id, [new_id, old_id], lapse=True)
+        db.session.commit()
+        assert schedule(user_id, new_id) == (2.5, 0, 0)
+        assert schedule(user_id, old_id) == (2.3, 1, 0)
+
+
+def test_review_intervals(app):
+    with app.app_context():
+        difficult_word = DifficultWord(ease=2.5, interval_days=0, repetitions=0, lapses=0)
+        now = datetime(2024, 1, 1)
+
+        intervals = []
+        for _ in range(4):
+            difficult_word.record_review(True, now)
+            intervals.append(difficult_word.interval_days)
+        assert intervals == [1, 6, 15, 38]
+        assert difficult_word.due_at == now + timedelta(days=38)
+
+        difficult_word.record_review(False, now)
+        assert (difficult_word.interval_days, difficult_word.repetitions, difficult_word.lapses) == (0, 0, 1)
+        assert difficult_word.due_at == now
+
+        # Ease never drops below the minimum
+        for _ in range(10):
+            difficult_word.record_review(False, now)
+        assert difficult_word.ease == DifficultWord.MIN_EASE
+
+
+def test_due_route(app):
+    with app.app_context():
+        user_id = add_user('herhalen@test').id
+        ids = word_ids(add_module('Herhalen', word_count=3).id)
+        add_seen(user_id, ids[0], days_ago=1)
+        add_seen(user_id, ids[1], days_ago=5)
+        DifficultWord.add(user_id, ids[2])
+        DifficultWord.query.filter_by(user_id=user_id, word_id=ids[2]).update(
+            {'due_at': datetime.utcnow() + timedelta(days=1)}
+        )
+        db.session.commit()
+        headers = auth_headers(user_id)
+
+    client = app.test_client()
+    response = client.get('/api/student/difficult-words/due', headers=headers)
+    assert response.status_code == 200
+    assert [row['word_id'] for row in response.get_json()] == [ids[1], ids[0]]  # Most overdue first
+    assert response.headers['X-Total-Count'] == '2'
+
+    response = client.post(f'/api/student/difficult-words/{ids[1]}/review', json={'answer': 'woordje2'}, headers=headers)
+    assert response.get_json()['is_correct']
+    assert response.get_json()['interval_days'] == 1
+
+    response = client.get('/api/student/difficult-words/due', headers=headers)
+    assert [row['word_id'] for row in response.get_json()] == [ids[0]]
+
+
+if __name__ == '__main__':
+    app = create_test_app()
+    for test in [test_add_is_one_statement, test_duplicates_keep_one_row, test_list_route,
+                 test_one_lapse_per_day, test_no_lapse_for_word_added_today, test_review_intervals, test_due_route]:
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
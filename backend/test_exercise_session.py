@@ -0,0 +1,124 @@
+"""
+Behavior test for the signed anonymous exercise sessions (ExerciseSession).
+
+Checks that tokens that were tampered with, signed with another key or
+salt, or expired are rejected, that a module content change invalidates
+running sessions, and that the anonymous routes refuse invalid tokens and
+answers that are not next in the queue.
+
+Usage:
+    python test_exercise_session.py
+"""
+import time
+from itsdangerous import URLSafeTimedSerializer
+from app import db
+from app.services.exercise_session import ExerciseSession
+from app.services.module_cache import ModuleCache
+from app.services.module_service import ModuleService
+from test_support import create_test_app, add_module
+
+
+def test_round_trip_and_tampering(app):
+    with app.app_context():
+        content = ModuleCache.get_module(add_module('Token', word_count=8, is_free=True).id)
+        session = ExerciseSession.start(content)
+        session.start_battery(content)
+        token = session.to_token()
+
+        loaded = ExerciseSession.from_token(token)
+        assert loaded.matches(content)
+        assert (loaded.battery_order, loaded.phase, loaded.queue) == (session.battery_order, 1, session.queue)
+
+        # Changing any character of the payload or signature breaks it
+        payload, timestamp, signature = token.rsplit('.', 2)
+        flipped = 'A' if payload[1] != 'A' else 'B'
+        assert ExerciseSession.from_token(payload[0] + flipped + payload[2:] + f'.{timestamp}.{signature}') is None
+        assert ExerciseSession.from_token(f'{payload}.{timestamp}.{signature[::-1]}') is None
+        assert ExerciseSession.from_token(None) is None
+        assert ExerciseSession.from_token('not-a-token') is None
+
+        # A valid signature with the wrong key or salt is rejected too
+        state = [content.id, content.version, session.battery_order, 0, 3, []]
+        other_key = URLSafeTimedSerializer('another-key', salt=ExerciseSession.SALT).dumps(state)
+        other_salt = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='other-salt').dumps(state)
+        assert ExerciseSession.from_token(other_key) is None
+        assert ExerciseSession.from_token(other_salt) is None
+
+        # A well-signed token with the wrong shape is rejected instead of raising
+        malformed = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=ExerciseSession.SALT).dumps({'phase': 3})
+        assert ExerciseSession.from_token(malformed) is None
+
+
+def test_expired_token(app):
+    with app.app_context():
+        content = ModuleCache.get_module(add_module('Verlopen', word_count=3, is_free=True).id)
+        token = ExerciseSession.start(content).to_token()
+
+        app.config['EXERCISE_SESSION_MAX_AGE'] = 1
+        try:
+            assert ExerciseSession.from_token(token) is not None
+            time.sleep(2.1)
+            assert ExerciseSession.from_token(token) is None
+        finally:
+            app.config.pop('EXERCISE_SESSION_MAX_AGE')
+
+
+def test_module_change_invalidates_session(app):
+    with app.app_context():
+        module_id = add_module('Gewijzigd', word_count=3, is_free=True).id
+        session = ExerciseSession.start(ModuleCache.get_module(module_id))
+
+        ModuleService.update_module_from_csv(module_id, 'woord1;nieuwe betekenis;Een *woordje1* hier.')
+
+        assert not session.matches(ModuleCache.get_module(module_id))
+        assert not session.matches(None)
+
+
+def test_anonymous_routes_check_token(app):
+    with app.app_context():
+        module_id = add_module('Anoniem', word_count=3, is_free=True).id
+        paid_id = add_module('Betaald', word_count=3).id
+        db.session.remove()
+
+    client = app.test_client()
+    assert client.post(f'/api/student/module/{paid_id}/start').status_code == 401
+
+    started = client.post(f'/api/student/module/{module_id}/start').get_json()
+    battery_id = started['current_battery_id']
+    token = started['session_token']
+
+    # Starting a battery needs a valid token for that battery
+    assert client.post(f'/api/student/battery/{battery_id}/start', json={}).status_code == 400
+    assert client.post(f'/api/student/battery/{battery_id}/start',
+                       json={'session_token': token + 'x'}).status_code == 400
+
+    battery = client.post(f'/api/student/battery/{battery_id}/start', json={'session_token': token}).get_json()
+    token = battery['session_token']
+    queue = battery['battery_progress']['current_question_queue']
+
+    # Only the word at the front of the queue, in the current phase, can be answered
+    answer = {'word_id': queue[0], 'phase': 1, 'answer': 'fout', 'session_token': token}
+    assert client.post('/api/student/question/answer', json={**answer, 'session_token': token[:-2]}).status_code == 400
+    assert client.post('/api/student/question/answer', json={**answer, 'phase': 3}).status_code == 400
+    if len(queue) > 1:
+        assert client.post('/api/student/question/answer', json={**answer, 'word_id': queue[1]}).status_code == 400
+
+    response = client.post('/api/student/question/answer', json=answer)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert not result['is_correct']
+    assert result['anonymous']
+
+    # The wrong word moved to the back of the queue kept in the new token
+    with app.app_context():
+        session = ExerciseSession.from_token(result['session_token'])
+    assert session.queue == queue[1:] + queue[:1]
+
+
+if __name__ == '__main__':
+    app = create_test_app()
+    for test in [test_round_trip_and_tampering, test_expired_token, test_module_change_invalidates_session,
+                 test_anonymous_routes_check_token]:
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
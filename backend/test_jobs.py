@@ -0,0 +1,152 @@
+"""
+Behavior test for the background jobs (JobService and the /api/jobs routes).
+
+Checks that a job is claimed by one runner only, that failures and stale
+running jobs end up 'failed', that recovery only picks up queued jobs that
+nobody started, and that job status and results are only shown to the
+user who created the job and to admins.
+
+Usage:
+    python test_jobs.py
+"""
+from datetime import datetime, timedelta
+from app import db
+from app.models.job import Job
+from app.services.job_service import JobService
+from test_support import create_test_app, add_user, auth_headers
+
+runs = []
+
+
+@JobService.handler('test_count')
+def _count(job, progress):
+    runs.append(job.id)
+    progress(1, 1)
+    return {'runs': len(runs)}
+
+
+@JobService.handler('test_file')
+def _file(job, progress):
+    job.set_result_file(b'inhoud', 'resultaat.txt', 'text/plain')
+    return None
+
+
+@JobService.handler('test_fail')
+def _fail(job, progress):
+    raise RuntimeError('kapot')
+
+
+class RecordingExecutor:
+    """Stands in for the job thread pool: records the jobs handed to it"""
+
+    def __init__(self):
+        self.job_ids = []
+
+    def submit(self, func, app, job_id):
+        self.job_ids.append(job_id)
+
+
+def test_job_runs_once(app):
+    with app.app_context():
+        job_id = JobService.submit('test_count').id
+        runs.clear()
+
+        assert JobService.run_job(job_id)
+        assert not JobService.run_job(job_id)  # Already claimed
+        assert JobService.run_pending() == 0
+        assert runs == [job_id]
+
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.progress, job.result) == ('succeeded', 100, {'runs': 1})
+        assert job.started_at and job.finished_at
+
+
+def test_claim_is_conditional(app):
+    with app.app_context():
+        job_id = JobService.submit('test_count').id
+
+        # Two runners see the job queued, only the first claim wins
+        assert JobService._claim(job_id)
+        assert not JobService._claim(job_id)
+        assert db.session.get(Job, job_id).status == 'running'
+
+
+def test_failed_and_stale_jobs(app):
+    with app.app_context():
+        failing_id = JobService.submit('test_fail', input_data=b'upload').id
+        JobService.run_pending()
+        job = db.session.get(Job, failing_id)
+        assert (job.status, job.error, job.input_data) == ('failed', 'kapot', None)
+
+        stale_id = JobService.submit('test_count').id
+        JobService._claim(stale_id)
+        assert JobService.fail_stale(minutes=60) == 0
+
+        Job.query.filter_by(id=stale_id).update({'started_at': datetime.utcnow() - timedelta(hours=2)})
+        db.session.commit()
+        assert JobService.fail_stale(minutes=60) == 1
+        db.session.expire_all()
+        assert db.session.get(Job, stale_id).status == 'failed'
+
+
+def test_recover_hands_old_queued_jobs_to_executor(app):
+    with app.app_context():
+        Job.query.delete()
+        db.session.commit()
+        old_id = JobService.submit('test_count').id
+        recent_id = JobService.submit('test_count').id
+        Job.query.filter_by(id=old_id).update({'created_at': datetime.utcnow() - timedelta(minutes=5)})
+        db.session.commit()
+
+        executor = RecordingExecutor()
+        original = JobService._get_executor
+        JobService._get_executor = classmethod(lambda cls, app: executor)
+        try:
+            assert JobService.recover(app) == (0, 1)
+        finally:
+            JobService._get_executor = original
+
+        # Jobs submitted moments ago are left to the executor they were sent to
+        assert executor.job_ids == [old_id]
+        assert recent_id not in executor.job_ids
+
+
+def test_job_routes_access(app):
+    with app.app_context():
+        owner_id = add_user('eigenaar@test', role='teacher').id
+        other_id = add_user('ander@test', role='teacher').id
+        admin_id = add_user('beheer@test', role='admin').id
+
+        file_job_id = JobService.submit('test_file', user_id=owner_id).id
+        queued_job_id = JobService.submit('test_count', user_id=owner_id).id
+        JobService.run_job(file_job_id)
+
+        owner, other, admin = auth_headers(owner_id), auth_headers(other_id), auth_headers(admin_id)
+
+    client = app.test_client()
+    assert client.get(f'/api/jobs/{file_job_id}').status_code == 401
+    assert client.get(f'/api/jobs/{file_job_id}', headers=other).status_code == 404
+    assert client.get(f'/api/jobs/{file_job_id}/result', headers=other).status_code == 404
+    assert client.get('/api/jobs/unknown', headers=owner).status_code == 404
+
+    status = client.get(f'/api/jobs/{file_job_id}', headers=owner).get_json()
+    assert (status['status'], status['has_file']) == ('succeeded', True)
+
+    for headers in (owner, admin):
+        response = client.get(f'/api/jobs/{file_job_id}/result', headers=headers)
+        assert response.status_code == 200
+        assert response.data == b'inhoud'
+        assert 'resultaat.txt' in response.headers['Content-Disposition']
+
+    response = client.get(f'/api/jobs/{queued_job_id}/result', headers=owner)
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'queued'
+
+
+if __name__ == '__main__':
+    app = create_test_app()
+    for test in [test_job_runs_once, test_claim_is_conditional, test_failed_and_stale_jobs,
+                 test_recover_hands_old_queued_jobs_to_executor, test_job_routes_access]:
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
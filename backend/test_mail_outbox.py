@@ -0,0 +1,167 @@
+"""
+Behavior test for the email outbox (MailDispatcher).
+
+Checks that emails are claimed one at a time with a lease covering one
+send, that emails under a valid lease are left alone while expired leases
+are requeued, and that failed sends are retried with exponential backoff
+until MAIL_MAX_ATTEMPTS, except for refused recipients which fail at once.
+SMTP is replaced by a fake connection; the dispatcher threads are not
+started, the tests run the batches themselves.
+
+Usage:
+    python test_mail_outbox.py
+"""
+import smtplib
+from datetime import datetime, timedelta
+from flask_mail import Message
+from app import db
+from app.models.outbox import OutboxEmail
+from app.services.mail_dispatcher import MailDispatcher
+from test_support import create_test_app
+
+
+class FakeSMTP:
+    """Records sent messages; errors queued in `failures` are raised by the next sends"""
+
+    def __init__(self):
+        self.sent = []
+        self.failures = []
+        self.connections = 0
+        self.on_send = None
+
+    def connect(self):
+        self.connections += 1
+        return self
+
+    def sendmail(self, sender, recipients, data, mail_options=(), rcpt_options=()):
+        if self.on_send:
+            self.on_send(recipients)
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(recipients)
+
+    def quit(self):
+        pass
+
+
+smtp = FakeSMTP()
+
+
+def enqueue(*recipients):
+    """Queue one email per recipient; returns their ids"""
+    return [
+        MailDispatcher.enqueue(
+            Message(subject='Test', recipients=[recipient], body='Hallo', sender='octovoc@test')
+        ).id
+        for recipient in recipients
+    ]
+
+
+def reset(app):
+    OutboxEmail.query.delete()
+    db.session.commit()
+    smtp.__init__()
+    app.extensions['mail'].suppress = False
+
+
+def make_due(email_id):
+    OutboxEmail.query.filter_by(id=email_id).update({'next_attempt_at': datetime.utcnow()})
+    db.session.commit()
+
+
+def test_claims_one_email_at_a_time(app):
+    with app.app_context():
+        reset(app)
+        ids = enqueue('een@test', 'twee@test', 'drie@test')
+        lease = timedelta(seconds=4 * app.config['MAIL_TIMEOUT'] + MailDispatcher.LEASE_MARGIN_SECONDS)
+        seen = []
+
+        def check_claims(recipients):
+            statuses = dict(db.session.query(OutboxEmail.id, OutboxEmail.status).filter(OutboxEmail.id.in_(ids)))
+            sending = [email_id for email_id, status in statuses.items() if status == 'sending']
+            email = db.session.get(OutboxEmail, sending[0])
+            seen.append((len(sending), email.next_attempt_at - datetime.utcnow()))
+
+        smtp.on_send = check_claims
+        assert MailDispatcher.dispatch_batch() == 3
+
+        # While sending, only the email being sent was claimed, with a lease covering one send
+        assert [count for count, _ in seen] == [1, 1, 1]
+        assert all(lease - timedelta(seconds=5) < remaining <= lease for _, remaining in seen)
+        assert smtp.sent == [['een@test'], ['twee@test'], ['drie@test']]
+        assert smtp.connections == 1  # One connection for the batch
+        assert {email.status for email in OutboxEmail.query} == {'sent'}
+        assert MailDispatcher.dispatch_batch() == 0
+
+
+def test_lease_is_respected(app):
+    with app.app_context():
+        reset(app)
+        leased_id, expired_id = enqueue('bezig@test', 'verlopen@test')
+        OutboxEmail.query.filter_by(id=leased_id).update(
+            {'status': 'sending', 'next_attempt_at': datetime.utcnow() + timedelta(minutes=5)}
+        )
+        OutboxEmail.query.filter_by(id=expired_id).update(
+            {'status': 'sending', 'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.session.commit()
+
+        # Another process still holds the first lease; the expired one is sent again
+        assert MailDispatcher.dispatch_batch() == 1
+        assert smtp.sent == [['verlopen@test']]
+        db.session.expire_all()
+        assert db.session.get(OutboxEmail, leased_id).status == 'sending'
+        assert db.session.get(OutboxEmail, expired_id).status == 'sent'
+
+
+def test_retry_backoff_until_max_attempts(app):
+    with app.app_context():
+        reset(app)
+        app.config.update(MAIL_MAX_ATTEMPTS=3, MAIL_RETRY_BASE_SECONDS=60)
+        (email_id,) = enqueue('later@test')
+
+        delays = []
+        for attempt in range(1, 4):
+            smtp.failures.append(smtplib.SMTPServerDisconnected('verbinding weg'))
+            assert MailDispatcher.dispatch_batch() == 1
+
+            email = db.session.get(OutboxEmail, email_id)
+            assert email.attempts == attempt
+            assert email.last_error == 'verbinding weg'
+            if email.status == 'queued':
+                delays.append((email.next_attempt_at - datetime.utcnow()).total_seconds())
+                assert MailDispatcher.dispatch_batch() == 0  # Not due yet
+                make_due(email_id)
+
+        # 60s, then 120s; the third failure is the last attempt
+        assert [round(delay / 10) * 10 for delay in delays] == [60, 120]
+        assert email.status == 'failed'
+        assert smtp.sent == []
+
+
+def test_refused_recipient_fails_at_once(app):
+    with app.app_context():
+        reset(app)
+        refused_id, delivered_id = enqueue('onbekend@test', 'bekend@test')
+        smtp.failures.append(smtplib.SMTPRecipientsRefused({'onbekend@test': (550, b'User unknown')}))
+
+        assert MailDispatcher.dispatch_batch() == 2
+
+        refused = db.session.get(OutboxEmail, refused_id)
+        assert (refused.status, refused.attempts) == ('failed', 1)
+        # The failed send closed the connection, the next email was sent on a new one
+        assert db.session.get(OutboxEmail, delivered_id).status == 'sent'
+        assert smtp.sent == [['bekend@test']]
+        assert smtp.connections == 2
+
+
+if __name__ == '__main__':
+    app = create_test_app(MAIL_TIMEOUT=30)
+    MailDispatcher._connect = classmethod(lambda cls: smtp.connect())
+    MailDispatcher.start = classmethod(lambda cls, app: None)
+
+    for test in [test_claims_one_email_at_a_time, test_lease_is_respected,
+                 test_retry_backoff_until_max_attempts, test_refused_recipient_fails_at_once]:
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
@@ -0,0 +1,96 @@
+"""
+Behavior test for the module cache and the stored inflected forms.
+
+Checks that grading uses the inflected forms stored on the words, that
+updating a module through ModuleService invalidates the cache, and that a
+version bump made by another worker is picked up only after
+MODULE_CACHE_CHECK_SECONDS.
+
+Usage:
+    python test_module_cache.py
+"""
+from app import db
+from app.models.module import Module, Word
+from app.services.module_cache import ModuleCache
+from app.services.module_service import ModuleService
+from test_support import create_test_app, add_module, count_statements
+
+
+def test_grading_uses_stored_inflected_forms(app):
+    with app.app_context():
+        module = add_module('Vormen', word_count=3)
+        word = Word.query.filter_by(module_id=module.id, word='woord1').one()
+        assert word.inflected_forms == ['woordje1']
+
+        content = ModuleCache.get_module(module.id)
+        assert content.check_answer(word.id, 3, 'woordje1')
+        assert content.check_answer(word.id, 3, 'WOORD1')  # Not case sensitive
+        assert not content.check_answer(word.id, 3, 'woordje2')
+        assert content.check_answer(word.id, 1, ' betekenis 1 ')
+        assert content.correct_answer(word.id, 2) == 'woord1'
+
+
+def test_update_invalidates_cache(app):
+    with app.app_context():
+        module = add_module('Bijwerken', word_count=3)
+        before = ModuleCache.get_module(module.id)
+        word_id = Word.query.filter_by(module_id=module.id, word='woord1').one().id
+
+        ModuleService.update_module_from_csv(
+            module.id, 'woord1;nieuwe betekenis;Een *woordje1* hier.\nwoord2;betekenis 2;Dit is een *woordje2* in een zin.'
+        )
+
+        after = ModuleCache.get_module(module.id)
+        assert after is not before
+        assert after.version == before.version + 1
+        assert after.check_answer(word_id, 1, 'nieuwe betekenis')
+        assert len(after.words) == 2
+
+
+def test_version_recheck_interval(app):
+    with app.app_context():
+        module_id = add_module('Andere worker', word_count=3).id
+        cached = ModuleCache.get_module(module_id)
+
+        # Another worker changes the content and bumps the version
+        Module.query.filter_by(id=module_id).update({'version': Module.version + 1, 'case_sensitive': True})
+        db.session.commit()
+
+        # Within the check interval the snapshot is served without any query
+        with count_statements() as statements:
+            assert ModuleCache.get_module(module_id) is cached
+        assert statements == []
+
+        # Once the interval passed, the version is re-checked and the module reloaded
+        cached.checked_at -= app.config['MODULE_CACHE_CHECK_SECONDS'] + 1
+        reloaded = ModuleCache.get_module(module_id)
+        assert reloaded is not cached
+        assert reloaded.case_sensitive
+
+        # Unchanged version: only the version query, the snapshot is kept
+        reloaded.checked_at -= app.config['MODULE_CACHE_CHECK_SECONDS'] + 1
+        with count_statements() as statements:
+            assert ModuleCache.get_module(module_id) is reloaded
+        assert len(statements) == 1
+
+
+def test_deleted_module_leaves_cache(app):
+    with app.app_context():
+        module_id = add_module('Weg', word_count=3).id
+        word_id = Word.query.filter_by(module_id=module_id).first().id
+        assert ModuleCache.get_module_for_word(word_id) is not None
+
+        ModuleService.delete_module(module_id)
+
+        assert ModuleCache.get_module(module_id) is None
+        assert ModuleCache.get_module_for_word(word_id) is None
+
+
+if __name__ == '__main__':
+    app = create_test_app(MODULE_CACHE_CHECK_SECONDS=60)
+    for test in [test_grading_uses_stored_inflected_forms, test_update_invalidates_cache,
+                 test_version_recheck_interval, test_deleted_module_leaves_cache]:
+        ModuleCache.clear()
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
@@ -0,0 +1,128 @@
+"""
+Behavior test for deleting a module with set-based DELETEs (ModuleService.delete_module).
+
+Checks that every row depending on the module is removed, that other modules
+keep their content and progress, that the number of statements does not grow
+with the number of learners, and that progress is reported per step.
+
+Usage:
+    python test_module_delete.py
+"""
+from app import db
+from app.models.module import Module, Word, Battery, DifficultWord
+from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress, ProgressSummary
+from app.services.module_service import ModuleService
+from app.services.progress_service import ProgressService
+from test_support import create_test_app, add_user, add_module, count_statements
+
+
+def add_learners(module_id, count, prefix):
+    """count students with one attempt and one difficult word in the module"""
+    battery = Battery.query.filter_by(module_id=module_id).order_by(Battery.battery_number).first()
+    word_id = battery.word_ids[0]
+
+    for i in range(count):
+        user_id = add_user(f'{prefix}{i}@test').id
+        progress = StudentProgress(
+            user_id=user_id,
+            module_id=module_id,
+            battery_order=[battery.id],
+            completed_batteries=[],
+            current_battery_id=battery.id,
+            final_round_word_ids=[]
+        )
+        db.session.add(progress)
+        db.session.flush()
+
+        battery_progress = BatteryProgress(
+            student_progress_id=progress.id,
+            battery_id=battery.id,
+            current_phase=1,
+            current_question_queue=list(battery.word_ids)
+        )
+        db.session.add(battery_progress)
+        db.session.flush()
+
+        db.session.add(QuestionProgress(
+            battery_progress_id=battery_progress.id,
+            word_id=word_id,
+            phase=1,
+            user_answer='-',
+            is_correct=False
+        ))
+        DifficultWord.add(user_id, word_id)
+
+    db.session.commit()
+    ProgressService.rebuild_summaries(module_ids=[module_id])
+
+
+def rows_for(module_id):
+    """Number of rows per table that belong to the module"""
+    word_ids = db.session.query(Word.id).filter(Word.module_id == module_id)
+    progress_ids = db.session.query(StudentProgress.id).filter(StudentProgress.module_id == module_id)
+    battery_progress_ids = db.session.query(BatteryProgress.id).filter(
+        BatteryProgress.student_progress_id.in_(progress_ids)
+    )
+    return {
+        'modules': Module.query.filter_by(id=module_id).count(),
+        'words': Word.query.filter_by(module_id=module_id).count(),
+        'batteries': Battery.query.filter_by(module_id=module_id).count(),
+        'student_progress': progress_ids.count(),
+        'battery_progress': battery_progress_ids.count(),
+        'question_progress': QuestionProgress.query.filter(QuestionProgress.word_id.in_(word_ids)).count(),
+        'difficult_words': DifficultWord.query.filter(DifficultWord.word_id.in_(word_ids)).count(),
+        'summaries': ProgressSummary.query.filter_by(module_id=module_id).count()
+    }
+
+
+def deleted_statements(module_id):
+    with count_statements() as statements:
+        ModuleService.delete_module(module_id)
+    return [s for s in statements if s.lstrip().upper().startswith('DELETE')]
+
+
+def test_delete_removes_dependents_only(app):
+    with app.app_context():
+        deleted_id = add_module('Weg', word_count=8).id
+        kept_id = add_module('Blijft', word_count=8).id
+        add_learners(deleted_id, 2, 'weg')
+        add_learners(kept_id, 2, 'blijft')
+        kept_before = rows_for(kept_id)
+        assert all(kept_before.values())
+
+        ModuleService.delete_module(deleted_id)
+        db.session.expire_all()
+
+        assert not any(rows_for(deleted_id).values())
+        assert rows_for(kept_id) == kept_before
+
+
+def test_statement_count_independent_of_learners(app):
+    with app.app_context():
+        few_id = add_module('Weinig', word_count=8).id
+        many_id = add_module('Veel', word_count=8).id
+        add_learners(few_id, 1, 'weinig')
+        add_learners(many_id, 6, 'veel')
+
+        few = deleted_statements(few_id)
+        many = deleted_statements(many_id)
+        assert len(few) == len(many) == 9
+
+
+def test_progress_reported_per_step(app):
+    with app.app_context():
+        module_id = add_module('Stappen', word_count=3).id
+        reported = []
+
+        ModuleService.delete_module(module_id, progress=lambda done, total: reported.append((done, total)))
+
+        assert reported == [(step, 9) for step in range(1, 10)]
+
+
+if __name__ == '__main__':
+    app = create_test_app()
+    for test in [test_delete_removes_dependents_only, test_statement_count_independent_of_learners,
+                 test_progress_reported_per_step]:
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
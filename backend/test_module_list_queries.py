@@ -0,0 +1,98 @@
+"""
+Regression test: the module list must use a fixed number of queries.
+
+Lists 1 and then 10 modules, logged in and anonymous, on a scratch SQLite
+database and checks the number of SQL statements does not grow with the
+number of modules.
+
+Usage:
+    python test_module_list_queries.py
+"""
+import os
+import tempfile
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from config import Config
+from app import create_app, db
+from app.models.user import User
+from app.models.school import School
+from app.models.classroom import Classroom
+from app.models.code import ClassCode, TeacherCode  # Referenced by users/classrooms foreign keys
+from app.models.module import Module
+from app.models.progress import StudentProgress
+
+
+class TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'octovoc_test_uploads')
+    TESTING = True
+
+
+def create_student():
+    school = School(school_code='TEST', school_name='Test')
+    teacher = User(email='teacher@test', password_hash='x', role='teacher')
+    db.session.add_all([school, teacher])
+    db.session.flush()
+
+    classroom = Classroom(name='Klas 1', teacher_id=teacher.id, school_id=school.id)
+    db.session.add(classroom)
+    db.session.flush()
+
+    student = User(email='student@test', password_hash='x', role='student', classroom_id=classroom.id)
+    db.session.add(student)
+    db.session.commit()
+    return student.id
+
+
+def add_modules(student_id, count):
+    """Add modules the student has started, up to count modules in total"""
+    for number in range(Module.query.count() + 1, count + 1):
+        module = Module(name=f'Module {number}', level=1, display_order=number)
+        db.session.add(module)
+        db.session.flush()
+        db.session.add(StudentProgress(user_id=student_id, module_id=module.id, battery_order=[], completed_batteries=[]))
+    db.session.commit()
+
+
+def count_queries(client, headers):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        db.session.remove()
+        response = client.get('/api/student/modules', headers=headers)
+        assert response.status_code == 200, response.get_json()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return len(statements), len(response.get_json())
+
+
+def test_module_list_queries():
+    app = create_app(TestConfig)
+
+    with app.app_context():
+        db.create_all()
+        student_id = create_student()
+        client = app.test_client()
+        logged_in = {'Authorization': f'Bearer {create_access_token(identity=str(student_id))}'}
+
+        add_modules(student_id, 1)
+        single = {'logged in': count_queries(client, logged_in), 'anonymous': count_queries(client, {})}
+
+        add_modules(student_id, 10)
+        many = {'logged in': count_queries(client, logged_in), 'anonymous': count_queries(client, {})}
+
+        for label in single:
+            (single_queries, single_modules), (many_queries, many_modules) = single[label], many[label]
+            print(f"{label}: {single_queries} queries for {single_modules} module, "
+                  f"{many_queries} queries for {many_modules} modules")
+            assert (single_modules, many_modules) == (1, 10)
+            assert single_queries == many_queries, f"{label}: query count grows with the number of modules"
+
+
+if __name__ == '__main__':
+    test_module_list_queries()
+    print("OK")
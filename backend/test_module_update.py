@@ -0,0 +1,138 @@
+"""
+Behavior test for updating module content as a diff (ModuleService._update_content).
+
+Checks that edits keep word and battery IDs, that removing a word cleans up
+the attempts, difficult words and queues that pointed at it while keeping
+the other progress, and that added batteries join every student's order.
+
+Usage:
+    python test_module_update.py
+"""
+from app import db
+from app.models.module import Word, Battery, DifficultWord
+from app.models.progress import StudentProgress, BatteryProgress, QuestionProgress, ProgressSummary
+from app.services.module_service import ModuleService
+from app.services.progress_service import ProgressService
+from test_support import create_test_app, add_user, add_module
+
+
+def csv_rows(numbers, meanings=None):
+    meanings = meanings or {}
+    return '\n'.join(
+        f'woord{i};{meanings.get(i, f"betekenis {i}")};Dit is een *woordje{i}* in een zin.' for i in numbers
+    )
+
+
+def word_ids_by_text(module_id):
+    return {w.word: w.id for w in Word.query.filter_by(module_id=module_id)}
+
+
+def battery_layout(module_id):
+    return [(b.id, b.word_ids) for b in Battery.query.filter_by(module_id=module_id).order_by(Battery.battery_number)]
+
+
+def start_progress(user_id, module_id, answers):
+    """Progress on the first battery with the given (word, is_correct) answers"""
+    batteries = Battery.query.filter_by(module_id=module_id).order_by(Battery.battery_number).all()
+    progress = StudentProgress(
+        user_id=user_id,
+        module_id=module_id,
+        battery_order=[b.id for b in batteries],
+        completed_batteries=[],
+        current_battery_id=batteries[0].id,
+        final_round_word_ids=[]
+    )
+    db.session.add(progress)
+    db.session.flush()
+
+    battery_progress = BatteryProgress(
+        student_progress_id=progress.id,
+        battery_id=batteries[0].id,
+        current_phase=1,
+        current_question_queue=list(batteries[0].word_ids)
+    )
+    db.session.add(battery_progress)
+    db.session.flush()
+
+    word_ids = word_ids_by_text(module_id)
+    for word, is_correct in answers:
+        db.session.add(QuestionProgress(
+            battery_progress_id=battery_progress.id,
+            word_id=word_ids[word],
+            phase=1,
+            user_answer='-',
+            is_correct=is_correct
+        ))
+    db.session.commit()
+    ProgressService.rebuild_summaries()
+    return progress.id, battery_progress.id
+
+
+def test_edit_keeps_ids(app):
+    with app.app_context():
+        module_id = add_module('Bewerken', word_count=10).id
+        ids_before = word_ids_by_text(module_id)
+        batteries_before = battery_layout(module_id)
+
+        ModuleService.update_module_from_csv(module_id, csv_rows(range(1, 11), {3: 'nieuwe betekenis'}))
+
+        assert word_ids_by_text(module_id) == ids_before
+        assert battery_layout(module_id) == batteries_before
+        assert db.session.get(Word, ids_before['woord3']).meaning == 'nieuwe betekenis'
+        assert ModuleService.update_module_from_csv(module_id, csv_rows(range(1, 11))).version == 3
+
+
+def test_removed_word_cleans_progress(app):
+    with app.app_context():
+        student_id = add_user('verwijderd@test').id
+        module_id = add_module('Verwijderen', word_count=10).id
+        ids_before = word_ids_by_text(module_id)
+        _, battery_progress_id = start_progress(student_id, module_id, [('woord1', True), ('woord2', False)])
+        DifficultWord.add(student_id, ids_before['woord2'])
+        db.session.commit()
+
+        ModuleService.update_module_from_csv(module_id, csv_rows([1] + list(range(3, 11))))
+
+        ids_after = word_ids_by_text(module_id)
+        assert 'woord2' not in ids_after
+        assert all(ids_after[word] == ids_before[word] for word in ids_after)
+
+        # Attempts and difficult words of the removed word are gone, the rest stays
+        attempts = QuestionProgress.query.filter_by(battery_progress_id=battery_progress_id).all()
+        assert [a.word_id for a in attempts] == [ids_before['woord1']]
+        assert DifficultWord.query.filter_by(user_id=student_id).count() == 0
+
+        summary = ProgressSummary.query.filter_by(user_id=student_id, module_id=module_id).one()
+        assert (summary.total_questions, summary.correct_questions, summary.answered_words) == (1, 1, 1)
+
+        battery_progress = db.session.get(BatteryProgress, battery_progress_id)
+        assert ids_before['woord2'] not in battery_progress.current_question_queue
+        battery = db.session.get(Battery, battery_progress.battery_id)
+        assert set(battery_progress.current_question_queue) <= set(battery.word_ids)
+
+
+def test_added_batteries_join_order(app):
+    with app.app_context():
+        student_id = add_user('toegevoegd@test').id
+        module_id = add_module('Toevoegen', word_count=10).id
+        ids_before = word_ids_by_text(module_id)
+        progress_id, battery_progress_id = start_progress(student_id, module_id, [('woord1', True)])
+
+        ModuleService.update_module_from_csv(module_id, csv_rows(range(1, 14)))
+
+        ids_after = word_ids_by_text(module_id)
+        assert all(ids_after[word] == ids_before[word] for word in ids_before)
+        assert len(ids_after) == 13
+
+        battery_ids = [battery_id for battery_id, _ in battery_layout(module_id)]
+        progress = db.session.get(StudentProgress, progress_id)
+        assert sorted(progress.battery_order) == sorted(battery_ids)
+        assert QuestionProgress.query.filter_by(battery_progress_id=battery_progress_id).count() == 1
+
+
+if __name__ == '__main__':
+    app = create_test_app()
+    for test in [test_edit_keeps_ids, test_removed_word_cleans_progress, test_added_batteries_join_order]:
+        test(app)
+        print(f"✓ {test.__name__}")
+    print("OK")
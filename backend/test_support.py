@@ -0,0 +1,67 @@
+"""
+Shared setup for the test_*.py scripts: an app on an in-memory SQLite
+database plus a few helpers to add users and modules.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from config import Config
+from app import create_app, db
+from app.models.user import User
+from app.models.code import ClassCode, TeacherCode  # Referenced by users/classrooms foreign keys
+from app.services.module_service import ModuleService
+
+
+class TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'octovoc_test_uploads')
+    TESTING = True
+    MAIL_SUPPRESS_SEND = True
+    JOB_RUNNER = 'worker'  # Tests run jobs themselves, no background threads
+    PDF_RENDER_WORKERS = 0
+
+
+def create_test_app(**config):
+    """App with an empty schema; extra config values override TestConfig"""
+    app = create_app(TestConfig)
+    app.config.update(config)
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def add_user(email, role='student', **fields):
+    user = User(email=email, password_hash='x', role=role, **fields)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def add_module(name, word_count=13, prefix='woord', **fields):
+    """Module of word_count words named <prefix>1, <prefix>2, ... (batteries of five)"""
+    csv_data = '\n'.join(
+        f'{prefix}{i};betekenis {i};Dit is een *{prefix}je{i}* in een zin.' for i in range(1, word_count + 1)
+    )
+    return ModuleService.create_module_from_csv(csv_data, name=name, **fields)
+
+
+def auth_headers(user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+
+@contextmanager
+def count_statements():
+    """Collect the SQL statements executed inside the block"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react'
 import api from '../services/api'
+import { runJob, downloadJobResult } from '../services/jobs'
 import { logout } from '../utils/auth'
 import './Teacher.css'
 
@@ -319,10 +320,10 @@ export default function AdminDashboard({ user }) {
     if (!confirm(`Weet je zeker dat je ${selectedUsers.length} gebruiker(s) definitief wilt verwijderen?`)) return
 
     try {
-      await api.post('/admin/users/bulk-delete', {
+      const job = await runJob('post', '/admin/users/bulk-delete', {
         user_ids: selectedUsers
       })
-      alert(`${selectedUsers.length} gebruiker(s) verwijderd`)
+      alert(`${job.result.count} gebruiker(s) verwijderd`)
       setSelectedUsers([])
       loadUsers()
     } catch (err) {
@@ -584,7 +585,7 @@ export default function AdminDashboard({ user }) {
     if (!confirm('Weet je zeker dat je deze module DEFINITIEF wilt verwijderen? Dit kan niet ongedaan worden gemaakt.')) return
 
     try {
-      await api.delete(`/admin/module/${moduleId}`)
+      await runJob('delete', `/admin/module/${moduleId}`)
       loadModules()
       alert('Module verwijderd')
     } catch (err) {
@@ -895,17 +896,7 @@ export default function AdminDashboard({ user }) {
 
   const exportClassroomExcel = async (classroomId) => {
     try {
-      const res = await api.get(`/admin/classroom/${classroomId}/export/excel`, {
-        responseType: 'blob'
-      })
-
-      const url = window.URL.createObjectURL(new Blob([res.data]))
-      const link = document.createElement('a')
-      link.href = url
-      link.setAttribute('download', `classroom_${classroomId}_progress.xlsx`)
-      document.body.appendChild(link)
-      link.click()
-      link.remove()
+      await downloadJobResult(`/admin/classroom/${classroomId}/export/excel`, `classroom_${classroomId}_progress.xlsx`)
     } catch (err) {
       console.error(err)
       alert('Fout bij exporteren naar Excel')
@@ -914,17 +905,7 @@ export default function AdminDashboard({ user }) {
 
   const exportStudentPDF = async (studentId) => {
     try {
-      const res = await api.get(`/admin/student/${studentId}/export/pdf`, {
-        responseType: 'blob'
-      })
-
-      const url = window.URL.createObjectURL(new Blob([res.data]))
-      const link = document.createElement('a')
-      link.href = url
-      link.setAttribute('download', `student_${studentId}_report.pdf`)
-      document.body.appendChild(link)
-      link.click()
-      link.remove()
+      await downloadJobResult(`/admin/student/${studentId}/export/pdf`, `student_${studentId}_report.pdf`)
     } catch (err) {
       console.error(err)
       alert('Fout bij exporteren naar PDF')
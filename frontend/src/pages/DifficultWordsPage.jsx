@@ -10,6 +10,8 @@ export default function DifficultWordsPage({ user }) {
   const navigate = useNavigate()
   const [loading, setLoading] = useState(true)
   const [difficultWords, setDifficultWords] = useState([])
+  const [dueWords, setDueWords] = useState([]) // Words due for review today, most overdue first
+  const [dueCount, setDueCount] = useState(0)
   const [currentWordIndex, setCurrentWordIndex] = useState(0)
   const [answer, setAnswer] = useState('')
   const [feedback, setFeedback] = useState(null)
@@ -22,8 +24,13 @@ export default function DifficultWordsPage({ user }) {
 
   const fetchDifficultWords = async () => {
     try {
-      const res = await api.get('/student/difficult-words')
+      const [res, dueRes] = await Promise.all([
+        api.get('/student/difficult-words'),
+        api.get('/student/difficult-words/due', { params: { limit: 50 } })
+      ])
       setDifficultWords(res.data)
+      setDueWords(dueRes.data)
+      setDueCount(parseInt(dueRes.headers['x-total-count'] || dueRes.data.length, 10))
       setLoading(false)
     } catch (err) {
       console.error(err)
@@ -39,6 +46,10 @@ export default function DifficultWordsPage({ user }) {
     try {
       await api.delete(`/student/difficult-words/${wordId}`)
       setDifficultWords(difficultWords.filter(dw => dw.word_id !== wordId))
+      if (dueWords.some(dw => dw.word_id === wordId)) {
+        setDueWords(dueWords.filter(dw => dw.word_id !== wordId))
+        setDueCount(count => count - 1)
+      }
     } catch (err) {
       console.error(err)
       alert('Fout bij verwijderen van woord')
@@ -46,7 +57,7 @@ export default function DifficultWordsPage({ user }) {
   }
 
   const startPractice = () => {
-    if (difficultWords.length === 0) return
+    if (dueWords.length === 0) return
     setPracticing(true)
     setCurrentWordIndex(0)
     setAnswer('')
@@ -58,8 +69,8 @@ export default function DifficultWordsPage({ user }) {
     const value = e.target.value
     setAnswer(value)
 
-    if (!feedback && difficultWords[currentWordIndex] && value.length > 0) {
-      const currentWordData = difficultWords[currentWordIndex].word
+    if (!feedback && dueWords[currentWordIndex] && value.length > 0) {
+      const currentWordData = dueWords[currentWordIndex].word
       const currentWord = currentWordData.word
       const caseSensitive = currentWordData.case_sensitive || false
 
@@ -100,7 +111,7 @@ export default function DifficultWordsPage({ user }) {
   const handleAnswer = async (selectedAnswer) => {
     if (feedback) return
 
-    const currentWordData = difficultWords[currentWordIndex].word
+    const currentWordData = dueWords[currentWordIndex].word
     const wordId = currentWordData.id
     const caseSensitive = currentWordData.case_sensitive || false
     const isCorrect = caseSensitive
@@ -111,26 +122,31 @@ export default function DifficultWordsPage({ user }) {
     // Mark this word as attempted
     setAttemptedWords(prev => new Set(prev).add(wordId))
 
+    // Only the first attempt of a session schedules the next review
+    if (isFirstAttempt) {
+      api.post(`/student/difficult-words/${wordId}/review`, { answer: selectedAnswer })
+        .catch(err => console.error(err))
+    }
+
     setFeedback({
       is_correct: isCorrect,
       correct_answer: currentWordData.word
     })
 
     setTimeout(() => {
-      if (isCorrect && isFirstAttempt) {
-        // Only remove if correct on FIRST attempt
-        api.delete(`/student/difficult-words/${wordId}`)
-          .catch(err => console.error(err))
-
-        // Remove from local state
-        const newDifficultWords = difficultWords.filter((_, idx) => idx !== currentWordIndex)
-        setDifficultWords(newDifficultWords)
+      if (isCorrect) {
+        // Done for this session (the next review is scheduled on the server)
+        const newDueWords = dueWords.filter((_, idx) => idx !== currentWordIndex)
+        setDueWords(newDueWords)
+        if (isFirstAttempt) {
+          setDueCount(count => count - 1)
+        }
 
-        if (newDifficultWords.length === 0) {
+        if (newDueWords.length === 0) {
           // No more words
           setPracticing(false)
           navigate('/')
-        } else if (currentWordIndex >= newDifficultWords.length) {
+        } else if (currentWordIndex >= newDueWords.length) {
           // Was last word, go to first
           setCurrentWordIndex(0)
           setAnswer('')
@@ -141,9 +157,8 @@ export default function DifficultWordsPage({ user }) {
           setFeedback(null)
         }
       } else {
-        // If correct but NOT first attempt, or if incorrect: move to next word
-        // The word stays in the list
-        if (currentWordIndex + 1 < difficultWords.length) {
+        // Incorrect: move to next word, the word stays in the session
+        if (currentWordIndex + 1 < dueWords.length) {
           setCurrentWordIndex(currentWordIndex + 1)
         } else {
           setCurrentWordIndex(0)
@@ -250,12 +265,17 @@ export default function DifficultWordsPage({ user }) {
                 letterSpacing: '0.02em',
                 marginBottom: '20px'
               }}>
-                je hebt {difficultWords.length} {difficultWords.length === 1 ? 'woord' : 'woorden'} om te oefenen
+                je hebt {difficultWords.length} {difficultWords.length === 1 ? 'moeilijk woord' : 'moeilijke woorden'}
+                {dueCount > 0
+                  ? `, waarvan ${dueCount} om vandaag te herhalen`
+                  : '. vandaag hoef je niets te herhalen!'}
               </p>
 
-              <button onClick={startPractice} className="dashboard-btn" style={{ marginBottom: '30px', padding: '12px 24px' }}>
-                start oefenen
-              </button>
+              {dueWords.length > 0 && (
+                <button onClick={startPractice} className="dashboard-btn" style={{ marginBottom: '30px', padding: '12px 24px' }}>
+                  start oefenen
+                </button>
+              )}
 
               <ul className="module-list">
                 {difficultWords.map((dw) => (
@@ -297,7 +317,7 @@ export default function DifficultWordsPage({ user }) {
   }
 
   // Practice mode
-  const currentWord = difficultWords[currentWordIndex].word
+  const currentWord = dueWords[currentWordIndex].word
 
   return (
     <div className="exercise-stage">
@@ -312,7 +332,7 @@ export default function DifficultWordsPage({ user }) {
       <div className="exercise-progress-bar">
         <div className="exercise-module-name">moeilijke woorden - oefenen</div>
         <div style={{ fontSize: 'clamp(12px, 1vw, 14px)', opacity: 0.85 }}>
-          nog {difficultWords.length} {difficultWords.length === 1 ? 'woord' : 'woorden'}
+          nog {dueWords.length} {dueWords.length === 1 ? 'woord' : 'woorden'}
         </div>
       </div>
 
@@ -21,7 +21,7 @@ export default function ExercisePage({ user }) {
   const [progressHistory, setProgressHistory] = useState([])
   const [progressWordMap, setProgressWordMap] = useState({})
   const [isAnonymous, setIsAnonymous] = useState(false)
-  const [questionQueue, setQuestionQueue] = useState([])
+  const [sessionToken, setSessionToken] = useState(null) // Signed anonymous progress, sent back with every step
   const [batteryOrder, setBatteryOrder] = useState([])
   const [currentBatteryIndex, setCurrentBatteryIndex] = useState(0)
   const [showVideo, setShowVideo] = useState(false)
@@ -91,8 +91,9 @@ export default function ExercisePage({ user }) {
       if (progress.anonymous) {
         setIsAnonymous(true)
         setBatteryOrder(progress.battery_order)
+        setSessionToken(progress.session_token)
         if (progress.current_battery_id) {
-          startBattery(progress.current_battery_id, true)
+          startBattery(progress.current_battery_id, true, progress.session_token)
         }
       } else {
         setIsAnonymous(false)
@@ -112,17 +113,20 @@ export default function ExercisePage({ user }) {
     }
   }
 
-  const startBattery = async (batteryId, anonymous = false) => {
+  const startBattery = async (batteryId, anonymous = false, token = sessionToken) => {
     try {
-      const res = await api.post(`/student/battery/${batteryId}/start`)
+      const res = await api.post(
+        `/student/battery/${batteryId}/start`,
+        anonymous ? { session_token: token } : undefined
+      )
 
       if (res.data.anonymous) {
-        // Anonymous mode - manage progress locally
+        // Anonymous mode - progress travels in the signed session token
         setIsAnonymous(true)
         setCurrentWord(res.data.current_word)
         setBatteryWords(res.data.battery_words)
         setPhase(1)
-        setQuestionQueue(res.data.battery_progress.current_question_queue)
+        setSessionToken(res.data.session_token)
         setBatteryProgress(res.data.battery_progress)
       } else {
         // Authenticated mode - server manages progress
@@ -164,7 +168,8 @@ export default function ExercisePage({ user }) {
         battery_progress_id: batteryProgress.id,
         word_id: currentWord.id,
         answer: selectedAnswer,
-        phase: currentPhase
+        phase: currentPhase,
+        ...(isAnonymous && { session_token: sessionToken })
       })
 
       setFeedback(res.data)
@@ -207,7 +212,7 @@ export default function ExercisePage({ user }) {
         // For phase 3 incorrect answers, show answer for 3 seconds
         const delay = currentPhase === 3 && !res.data.is_correct ? 3000 : (currentPhase === 3 ? 800 : 1500)
         setTimeout(() => {
-          handleAnonymousProgress(res.data.is_correct)
+          handleAnonymousProgress(res.data)
         }, delay)
       } else {
         // Authenticated mode
@@ -244,61 +249,41 @@ export default function ExercisePage({ user }) {
     }
   }
 
-  const handleAnonymousProgress = (isCorrect) => {
-    let newQueue = [...questionQueue]
+  const handleAnonymousProgress = (data) => {
+    // The server keeps the queue in the signed session token and picks the next word
+    setSessionToken(data.session_token)
 
-    if (isCorrect) {
-      // Remove from queue
-      newQueue.shift()
-    } else {
-      // Move to end
-      const word = newQueue.shift()
-      newQueue.push(word)
-    }
+    if (data.battery_complete) {
+      // Battery complete
+      selectRandomQuote() // Change quote for new battery
+      const nextBatteryIndex = currentBatteryIndex + 1
 
-    setQuestionQueue(newQueue)
-
-    // Check if phase complete
-    if (newQueue.length === 0) {
-      if (phase < 3) {
-        // Next phase
-        setPhase(phase + 1)
-        // Reset queue with all battery words
-        const allWordIds = batteryWords.map(w => w.id)
-        const shuffled = [...allWordIds].sort(() => Math.random() - 0.5)
-        setQuestionQueue(shuffled)
-        setCurrentWord(batteryWords.find(w => w.id === shuffled[0]))
-        setProgressHistory(Array(batteryWords.length).fill(null))
-        setProgressWordMap({})
-      } else {
-        // Battery complete
-        selectRandomQuote() // Change quote for new battery
-        const nextBatteryIndex = currentBatteryIndex + 1
-
-        // Update mastered words for anonymous mode (completed batteries / total batteries)
-        if (totalWordsInModule > 0 && batteryOrder.length > 0) {
-          const newMasteredWords = Math.round((totalWordsInModule * nextBatteryIndex) / batteryOrder.length)
-          setMasteredWords(newMasteredWords)
-        }
+      // Update mastered words for anonymous mode (completed batteries / total batteries)
+      if (totalWordsInModule > 0 && batteryOrder.length > 0) {
+        const newMasteredWords = Math.round((totalWordsInModule * nextBatteryIndex) / batteryOrder.length)
+        setMasteredWords(newMasteredWords)
+      }
 
-        if (nextBatteryIndex < batteryOrder.length) {
-          setCurrentBatteryIndex(nextBatteryIndex)
-          startBattery(batteryOrder[nextBatteryIndex], true)
-        } else {
-          // All batteries done - for anonymous users, show quote
-          showCompletionQuote()
-        }
+      if (data.next_battery_id) {
+        setCurrentBatteryIndex(nextBatteryIndex)
+        startBattery(data.next_battery_id, true, data.session_token)
+      } else {
+        // All batteries done - for anonymous users, show quote
+        showCompletionQuote()
       }
-      setAnswer('')
-      setFeedback(null)
+    } else if (data.phase_complete) {
+      // Next phase with all battery words
+      setPhase(data.phase)
+      setCurrentWord(data.next_word)
+      setProgressHistory(Array(batteryWords.length).fill(null))
+      setProgressWordMap({})
     } else {
       // Next question in same phase
-      const nextWordId = newQueue[0]
-      const nextWord = batteryWords.find(w => w.id === nextWordId)
-      setCurrentWord(nextWord)
-      setAnswer('')
-      setFeedback(null)
+      setCurrentWord(data.next_word)
     }
+
+    setAnswer('')
+    setFeedback(null)
   }
 
   const showCompletionQuote = async () => {
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { logout } from '../utils/auth'
 import api from '../services/api'
+import { downloadJobResult } from '../services/jobs'
 import './Teacher.css'
 
 export default function TeacherDashboard({ user }) {
@@ -141,17 +142,16 @@ export default function TeacherDashboard({ user }) {
 
   const exportClassroomExcel = async (classroomId) => {
     try {
-      const res = await api.get(`/teacher/classroom/${classroomId}/export/excel`, {
-        responseType: 'blob'
-      })
+      await downloadJobResult(`/teacher/classroom/${classroomId}/export/excel`, `classroom_${classroomId}_progress.xlsx`)
+    } catch (err) {
+      console.error(err)
+      alert('Fout bij exporteren naar Excel')
+    }
+  }
 
-      const url = window.URL.createObjectURL(new Blob([res.data]))
-      const link = document.createElement('a')
-      link.href = url
-      link.setAttribute('download', `classroom_${classroomId}_progress.xlsx`)
-      document.body.appendChild(link)
-      link.click()
-      link.remove()
+  const exportAllClassrooms = async () => {
+    try {
+      await downloadJobResult('/teacher/classrooms/export', 'classrooms_progress.xlsx')
     } catch (err) {
       console.error(err)
       alert('Fout bij exporteren naar Excel')
@@ -212,6 +212,15 @@ export default function TeacherDashboard({ user }) {
             >
               moeilijkste woorden (alle klassen)
             </button>
+            {classrooms.length > 0 && (
+              <button
+                onClick={exportAllClassrooms}
+                className="teacher-btn"
+                style={{ marginLeft: '10px' }}
+              >
+                export alle klassen naar excel
+              </button>
+            )}
           </div>
 
           {classrooms.length === 0 ? (
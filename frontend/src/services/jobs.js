@@ -0,0 +1,59 @@
+import api from './api'
+
+const POLL_INTERVAL_MS = 1000
+const MAX_WAIT_MS = 10 * 60 * 1000 // Give up polling after 10 minutes
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+/**
+ * Run a long backend operation as a background job (?async=true).
+ * The endpoint answers 202 with a job id; poll the job until it is finished.
+ * @param {string} method - HTTP method of the endpoint ('get', 'post', 'delete')
+ * @param {string} url - Endpoint URL (relative to the API base URL)
+ * @param {object} [data] - Request body for post requests
+ * @param {function} [onProgress] - Called with the job progress (0-100) while polling
+ * @param {number} [maxWaitMs] - Reject when the job is not finished after this long
+ * @returns {Promise<object>} - The finished job
+ */
+export const runJob = async (method, url, data, onProgress, maxWaitMs = MAX_WAIT_MS) => {
+  const separator = url.includes('?') ? '&' : '?'
+  const res = await api.request({ method, url: `${url}${separator}async=true`, data })
+  const jobId = res.data.job_id
+  const deadline = Date.now() + maxWaitMs
+
+  while (Date.now() < deadline) {
+    await sleep(POLL_INTERVAL_MS)
+    const { data: job } = await api.get(`/jobs/${jobId}`)
+
+    if (onProgress) {
+      onProgress(job.progress)
+    }
+    if (job.status === 'succeeded') {
+      return job
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Job failed')
+    }
+  }
+
+  throw new Error('De taak duurt te lang. Probeer het later opnieuw.')
+}
+
+/**
+ * Run an export as a background job and download the generated file
+ * @param {string} url - Export endpoint URL
+ * @param {string} filename - Fallback download name
+ */
+export const downloadJobResult = async (url, filename) => {
+  const job = await runJob('get', url)
+  const res = await api.get(`/jobs/${job.id}/result`, { responseType: 'blob' })
+
+  const blobUrl = window.URL.createObjectURL(new Blob([res.data]))
+  const link = document.createElement('a')
+  link.href = blobUrl
+  link.setAttribute('download', job.result_filename || filename)
+  document.body.appendChild(link)
+  link.click()
+  link.remove()
+  window.URL.revokeObjectURL(blobUrl)
+}